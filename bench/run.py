@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Benchmark do Mission Control: bridge + proxy local contra um openclaw falso.
+
+Arranca openclaw-bridge.py e local/server.py com bench/bin no PATH, corre
+cada endpoint /api/v1/* (direto ao bridge e através do proxy) e páginas
+estáticas com a concorrência pedida, e escreve os resultados em JSON:
+latência p50/p95/p99, pedidos/s, invocações do CLI por pedido e RSS.
+
+Uso:
+    python3 bench/run.py                              # resumo no stderr, JSON no stdout
+    python3 bench/run.py -c 1,8,32 -n 500 -o bench-v2.1.json --label v2.1
+    python3 bench/run.py --cli-delay 300 --sessions 2000 --bridge-args="--poll"
+    python3 bench/run.py --compare bench-v2.1.json    # diferenças face a um run anterior
+
+As portas são as de sempre (18791 bridge, 8888 proxy) e têm de estar livres.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_BIN = os.path.join(ROOT, 'bench', 'bin')
+BRIDGE_PORT = 18791
+SERVER_PORT = 8888
+STARTUP_TIMEOUT = 10  # Segundos à espera que cada servidor aceite ligações
+REQUEST_TIMEOUT = 30  # Segundos por pedido
+
+API_ENDPOINTS = (
+    '/api/v1/status',
+    '/api/v1/gateway/status',
+    '/api/v1/cron/list',
+    '/api/v1/sessions/list',
+    '/api/v1/agents/list',
+    '/api/v1/dashboard',
+)
+
+
+def static_pages():
+    """index.html da versão atual e de cada versão congelada do versions.json"""
+    pages = ['/index.html', '/agents.html', '/cron.html']
+    try:
+        with open(os.path.join(ROOT, 'versions.json')) as f:
+            versions = json.load(f).get('versions', [])
+    except (OSError, ValueError):
+        versions = []
+    for version in versions:
+        path = version.get('path', '').lstrip('.').strip('/')
+        if path:
+            pages.append(f'/{path}/index.html')
+    return pages
+
+
+def percentile(values, pct):
+    """Percentil por nearest-rank (values já ordenados)"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def read_rss(pid):
+    """(RSS, pico de RSS) em KB do processo, via /proc ou ps"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['VmRSS'].split()[0]), int(fields['VmHWM'].split()[0])
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        rss = int(subprocess.check_output(['ps', '-o', 'rss=', '-p', str(pid)], text=True).strip())
+        return rss, None
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None, None
+
+
+def count_lines(path):
+    try:
+        with open(path) as f:
+            return sum(1 for _ in f)
+    except OSError:
+        return 0
+
+
+class Target:
+    """Processo servidor arrancado pelo bench"""
+
+    def __init__(self, name, script, port, args, env, log_dir):
+        self.name = name
+        self.port = port
+        self.log_path = os.path.join(log_dir, f'{name}.log')
+        self.log = open(self.log_path, 'w')
+        self.process = subprocess.Popen(
+            [sys.executable, script] + args,
+            cwd=ROOT, env=env, stdout=self.log, stderr=subprocess.STDOUT
+        )
+
+    def wait_ready(self):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=1)
+                conn.request('HEAD', '/')
+                conn.getresponse().read()
+                conn.close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        self.stop()
+        with open(self.log_path) as f:
+            output = f.read()[-2000:]
+        raise SystemExit(f"❌ {self.name} não arrancou na porta {self.port}:\n{output}")
+
+    def rss(self):
+        rss, peak = read_rss(self.process.pid)
+        return {"rssKb": rss, "peakRssKb": peak}
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.log.close()
+
+
+def run_scenario(port, path, concurrency, total, accept_encoding):
+    """Corre `total` pedidos GET em `concurrency` ligações keep-alive"""
+    latencies = []
+    statuses = {}
+    errors = []
+    lock = threading.Lock()
+    remaining = [total]
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+
+    def worker():
+        conn = None
+        local_latencies = []
+        local_statuses = {}
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=REQUEST_TIMEOUT)
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException) as e:
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            local_latencies.append((time.perf_counter() - started) * 1000)
+            local_statuses[response.status] = local_statuses.get(response.status, 0) + 1
+        if conn is not None:
+            conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "completed": len(latencies),
+        "errors": len(errors),
+        "errorSamples": errors[:3],
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latencyMs": {
+            "p50": round(percentile(latencies, 50), 2) if latencies else None,
+            "p95": round(percentile(latencies, 95), 2) if latencies else None,
+            "p99": round(percentile(latencies, 99), 2) if latencies else None,
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "max": round(latencies[-1], 2) if latencies else None
+        }
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def current_version():
+    try:
+        with open(os.path.join(ROOT, 'versions.json')) as f:
+            return json.load(f).get('current')
+    except (OSError, ValueError):
+        return None
+
+
+def scenario_key(result):
+    return (result['target'], result['path'], result['concurrency'])
+
+
+def print_summary(report, baseline=None):
+    previous = {scenario_key(r): r for r in (baseline or {}).get('results', [])}
+    out = sys.stderr
+    print(f"\n{'target':<7} {'path':<26} {'c':>3} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'cli/req':>8} {'err':>4}", file=out)
+    for r in report['results']:
+        lat = r['latencyMs']
+        line = (f"{r['target']:<7} {r['path']:<26} {r['concurrency']:>3} {r['rps'] or 0:>9.1f} "
+                f"{lat['p50'] or 0:>8.2f} {lat['p95'] or 0:>8.2f} {lat['p99'] or 0:>8.2f} "
+                f"{r['cliPerRequest']:>8.3f} {r['errors']:>4}")
+        before = previous.get(scenario_key(r))
+        if before and before.get('rps') and r['rps'] and before['latencyMs'].get('p95'):
+            rps_delta = (r['rps'] - before['rps']) / before['rps'] * 100
+            p95_delta = (lat['p95'] - before['latencyMs']['p95']) / before['latencyMs']['p95'] * 100
+            line += f"   rps {rps_delta:+.0f}%  p95 {p95_delta:+.0f}%"
+        print(line, file=out)
+    for name, rss in report['rss'].items():
+        print(f"{name}: RSS {rss['rssKb']} KB (pico {rss['peakRssKb']} KB)", file=out)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark do bridge e do proxy local")
+    parser.add_argument('-c', '--concurrency', default='1,8,32',
+                        help="níveis de concorrência separados por vírgulas (default: 1,8,32)")
+    parser.add_argument('-n', '--requests', type=int, default=200,
+                        help="pedidos por endpoint e nível de concorrência (default: 200)")
+    parser.add_argument('--targets', default='bridge,proxy,static',
+                        help="bridge (API direta), proxy (API via local/server.py), static (páginas)")
+    parser.add_argument('--endpoints', default=','.join(API_ENDPOINTS),
+                        help="endpoints API a medir, separados por vírgulas")
+    parser.add_argument('--accept-encoding', default='gzip',
+                        help="Accept-Encoding enviado ('' para nenhum; default: gzip)")
+    parser.add_argument('--cli-delay', type=float, default=50, metavar='MS',
+                        help="latência do openclaw falso (default: 50)")
+    parser.add_argument('--sessions', type=int, default=50, help="sessões geradas pelo openclaw falso")
+    parser.add_argument('--jobs', type=int, default=10, help="cron jobs gerados pelo openclaw falso")
+    parser.add_argument('--agents', type=int, default=5, help="agentes gerados pelo openclaw falso")
+    parser.add_argument('--bridge-args', default='', help="argumentos extra para openclaw-bridge.py")
+    parser.add_argument('--server-args', default='', help="argumentos extra para local/server.py")
+    parser.add_argument('--label', help="etiqueta do run (ex.: a versão do versions.json)")
+    parser.add_argument('-o', '--output', help="ficheiro JSON de saída (default: stdout)")
+    parser.add_argument('--compare', metavar='JSON', help="run anterior para mostrar diferenças")
+    options = parser.parse_args()
+
+    concurrency_levels = [int(c) for c in options.concurrency.split(',') if c]
+    targets = [t for t in options.targets.split(',') if t]
+    endpoints = [e for e in options.endpoints.split(',') if e]
+
+    log_dir = tempfile.mkdtemp(prefix='openclaw-bench-')
+    cli_log = os.path.join(log_dir, 'cli.log')
+    env = dict(os.environ)
+    env.update({
+        'PATH': FAKE_BIN + os.pathsep + env.get('PATH', ''),
+        'BENCH_CLI_LOG': cli_log,
+        'BENCH_CLI_DELAY': str(options.cli_delay),
+        'BENCH_SESSIONS': str(options.sessions),
+        'BENCH_JOBS': str(options.jobs),
+        'BENCH_AGENTS': str(options.agents),
+        'PYTHONUNBUFFERED': '1',
+    })
+
+    bridge = Target('bridge', 'openclaw-bridge.py', BRIDGE_PORT, shlex.split(options.bridge_args), env, log_dir)
+    server = None
+    try:
+        bridge.wait_ready()
+        server = Target('server', os.path.join('local', 'server.py'), SERVER_PORT,
+                        shlex.split(options.server_args), env, log_dir)
+        server.wait_ready()
+
+        scenarios = []
+        for target in targets:
+            if target == 'static':
+                scenarios += [(target, SERVER_PORT, path) for path in static_pages()]
+            else:
+                port = BRIDGE_PORT if target == 'bridge' else SERVER_PORT
+                scenarios += [(target, port, path) for path in endpoints]
+
+        results = []
+        for target, port, path in scenarios:
+            for concurrency in concurrency_levels:
+                # Aquecimento: conta o primeiro snapshot fora da medição
+                run_scenario(port, path, 1, 1, options.accept_encoding)
+                before = count_lines(cli_log)
+                result = run_scenario(port, path, concurrency, options.requests, options.accept_encoding)
+                cli_calls = count_lines(cli_log) - before
+                result.update({
+                    "target": target,
+                    "path": path,
+                    "concurrency": concurrency,
+                    "cliCalls": cli_calls,
+                    "cliPerRequest": round(cli_calls / max(result['completed'], 1), 4)
+                })
+                results.append(result)
+                print(f"  {target:<7} {path:<26} c={concurrency:<3} {result['rps']} req/s", file=sys.stderr)
+
+        report = {
+            "meta": {
+                "label": options.label or current_version(),
+                "commit": git_commit(),
+                "version": current_version(),
+                "timestamp": int(time.time()),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "requests": options.requests,
+                "concurrency": concurrency_levels,
+                "acceptEncoding": options.accept_encoding,
+                "cliDelayMs": options.cli_delay,
+                "sessions": options.sessions,
+                "jobs": options.jobs,
+                "agents": options.agents,
+                "bridgeArgs": options.bridge_args,
+                "serverArgs": options.server_args
+            },
+            "results": results,
+            "rss": {"bridge": bridge.rss(), "server": server.rss()}
+        }
+    finally:
+        if server is not None:
+            server.stop()
+        bridge.stop()
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+    print_summary(report, baseline)
+
+    output = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"\n📄 Resultados em {options.output}", file=sys.stderr)
+    else:
+        print(output)
@@ -5,68 +5,684 @@ Mission Control Local Server with OpenClaw Bridge Proxy
 Este servidor:
 1. Serve o Mission Control em http://localhost:8080
 2. Faz proxy dos pedidos /api/* para o OpenClaw Bridge (localhost:18790)
+3. Expõe métricas Prometheus em /metrics (e Server-Timing em cada resposta)
 
 O OpenClaw Bridge é necessário porque o gateway OpenClaw (porta 18789) não expõe API REST.
 O Bridge executa comandos CLI e expõe REST API na porta 18790.
 
 Uso:
     cd ~/.openclaw/workspace/mission-control
-    python3 local/server.py
+    python3 local/server.py --bridge inprocess   # Bridge no mesmo processo
+    python3 local/server.py                      # proxy para o Bridge à parte
 
-Requisitos:
+Requisitos (modo proxy):
     1. OpenClaw Bridge deve estar a correr:
        python3 openclaw-bridge.py
 
     2. Depois abre: http://localhost:8080
 """
 
+import argparse
+import atexit
+import email.utils
+import gzip
+import hashlib
+import http.client
 import http.server
-import socketserver
+import importlib.util
+import threading
+import time
 import urllib.request
 import json
 import os
+import queue
+import selectors
+import shlex
+import socket
 import subprocess
+import sys
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+# mission_core.py (partilhado com o openclaw-bridge.py) está na pasta acima
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mission_core import (
+    LOG_BACKUPS, LOG_MAX_BYTES, LOG_ROTATE_INTERVAL, SERVER_MODES, CountingWriter, Metrics, StructuredLog,
+    accept_encoding_weights, make_server, parse_sample_rates, request_id_from
+)
 
 PORT = 8888  # Porta alternativa (8080 pode estar ocupada)
 BRIDGE_PORT = 18791  # Porta do OpenClaw Bridge
 DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+WORKERS = 16  # Pedidos servidos em simultâneo
+QUEUE_SIZE = 64  # Pedidos em espera antes de responder 503
+BRIDGE_POOL_SIZE = 4  # Ligações keep-alive ao Bridge (abaixo dos workers do Bridge)
+BRIDGE_TIMEOUT = 10  # Segundos
+STREAM_PATHS = ('/api/v1/events',)  # Respostas em stream (SSE), nunca em buffer
+CHUNK_SIZE = 64 * 1024
+SEND_TIMEOUT = 2  # Segundos até desistir de um cliente lento
+STATIC_CACHE_BYTES = 32 * 1024 * 1024  # Memória máxima da cache de ficheiros estáticos
+STATIC_MAX_FILE_SIZE = 4 * 1024 * 1024  # Ficheiros maiores são servidos do disco
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+STATIC_WARM_TYPES = ('text/html', 'text/css', 'text/javascript', 'application/javascript',
+                     'application/json', 'image/svg+xml')  # Carregados no arranque (só na raiz)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+# ==================== METRICS ====================
+
+METRICS = Metrics('mission_control')
+METRICS.describe('http_requests_total', 'counter', "Pedidos HTTP por rota, método e status")
+METRICS.describe('http_request_duration_seconds', 'histogram', "Duração dos pedidos HTTP por rota")
+METRICS.describe('http_requests_in_flight', 'gauge', "Pedidos HTTP em curso")
+METRICS.describe('http_response_bytes_total', 'counter', "Bytes enviados por rota (headers incluídos)")
+METRICS.describe('http_rejected_total', 'counter', "Pedidos recusados com 503 por saturação")
+METRICS.describe('upstream_duration_seconds', 'histogram', "Tempo até aos headers do Bridge, por endpoint")
+METRICS.describe('upstream_failures_total', 'counter', "Pedidos ao Bridge que falharam a ligação")
+
+
+def collect_server_metrics():
+    return [
+        ('static_cache_hits_total', 'counter', "Ficheiros estáticos servidos da memória", (), STATIC_CACHE.hits),
+        ('static_cache_misses_total', 'counter', "Ficheiros estáticos (re)lidos do disco", (), STATIC_CACHE.misses),
+        ('static_cache_bytes', 'gauge', "Memória usada pela cache estática", (), STATIC_CACHE.memory),
+        ('bridge_circuit_open', 'gauge', "1 se o circuit breaker do Bridge está aberto", (),
+         int(BRIDGE_HEALTH.state != BridgeHealth.CLOSED)),
+        ('event_streams', 'gauge', "Streams SSE a ser encaminhados", (), STREAM_RELAY.stream_count()),
+        ('log_dropped_total', 'counter', "Linhas de log descartadas (fila cheia)", (), LOG.dropped),
+        ('log_sampled_out_total', 'counter', "Pedidos não registados pela amostragem", (), LOG.sampled_out),
+    ]
+
+
+METRICS.collectors.append(collect_server_metrics)
+
+
+# ==================== STRUCTURED LOG ====================
+
+LOG_SAMPLE_RATES = {'/metrics': 0.01, 'static': 0.1}  # Rota → fração registada
+LOG = StructuredLog(sample_rates=LOG_SAMPLE_RATES)
+atexit.register(LOG.close)
+
+
+# ==================== BRIDGE CLIENT ====================
+
+# Headers do cliente que seguem para o Bridge
+# (Accept-Encoding: a resposta comprimida do Bridge segue tal como vem)
+FORWARD_REQUEST_HEADERS = ('Content-Type', 'Authorization', 'If-None-Match', 'Accept-Encoding')
+
+# Headers hop-by-hop ou que este servidor já envia por conta própria
+SKIP_RESPONSE_HEADERS = {
+    'transfer-encoding', 'connection', 'keep-alive', 'server', 'date',
+    'access-control-allow-origin', 'access-control-allow-methods', 'access-control-allow-headers',
+    'x-request-id'  # O proxy envia o seu (é o mesmo que passou ao Bridge)
+}
+
+
+class BridgeConnectionPool:
+    """Pool de ligações HTTP/1.1 keep-alive ao OpenClaw Bridge.
+
+    Ligações paradas há mais de `idle_timeout` são descartadas antes de o
+    Bridge as fechar do lado dele (KEEPALIVE_TIMEOUT no openclaw-bridge.py).
+    """
+
+    def __init__(self, host, port, size=BRIDGE_POOL_SIZE, timeout=BRIDGE_TIMEOUT, idle_timeout=4):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = []  # [(ligação, instante em que ficou livre)]
+        self.connections_opened = 0
+        self.requests = 0
+
+    def _acquire(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, released_at = self._idle.pop()
+                if now - released_at < self.idle_timeout:
+                    return conn, True
+                conn.close()
+            self.connections_opened += 1
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def open(self, method, path, body=None, headers=None):
+        """Envia um pedido ao Bridge sem ler o corpo da resposta.
+
+        `body` pode ser bytes ou um iterador de chunks (enviado em chunked
+        se não houver Content-Length). Devolve (ligação, resposta); o
+        chamador lê a resposta e devolve a ligação com `release()`.
+        """
+        conn, reused = self._acquire()
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            # Ligação reutilizada que o Bridge já fechou: repete numa nova
+            if reused and method in ('GET', 'HEAD'):
+                return self.open(method, path, body, headers)
+            raise
+        except Exception:
+            conn.close()
+            raise
+        with self._lock:
+            self.requests += 1
+        return conn, response
+
+    def release(self, conn, response):
+        """Devolve a ligação ao pool se a resposta foi lida até ao fim"""
+        if response.isclosed() and not response.will_close:
+            self._release(conn)
+        else:
+            conn.close()
+
+    def request(self, method, path, body=None, headers=None):
+        """Faz um pedido ao Bridge; devolve (status, headers, corpo)"""
+        conn, response = self.open(method, path, body, headers)
+        try:
+            data = response.read()
+        finally:
+            self.release(conn, response)
+        return response.status, response.getheaders(), data
+
+
+class BridgeHealth:
+    """Circuit breaker com o estado de saúde do Bridge em cache.
+
+    Substitui o HEAD antes de cada pedido: o estado vem do resultado dos
+    pedidos reais. Após `threshold` falhas seguidas o circuito abre e os
+    pedidos recebem logo 503; passado `reset_timeout` deixa passar um pedido
+    de teste (half-open) que volta a fechar o circuito se tiver sucesso.
+
+    Só contam como falha ligações recusadas ou cortadas: um Bridge lento
+    (timeout de leitura) está vivo, e um pedido que acaba sem veredicto
+    (`record_inconclusive`) devolve o teste half-open sem mexer na contagem.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, threshold=2, reset_timeout=3):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_inconclusive(self):
+        """Pedido sem resultado sobre a saúde do Bridge: um teste half-open
+        volta a OPEN e o seguinte chega passado `reset_timeout`"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+BRIDGE_POOL = BridgeConnectionPool('localhost', BRIDGE_PORT)
+BRIDGE_HEALTH = BridgeHealth()
+
+
+class StreamRelay(threading.Thread):
+    """Copia streams do Bridge (SSE) para os clientes à medida que chegam.
+
+    Um só thread serve todos os streams em curso, em vez de prender um
+    worker por viewer; cada chunk é escrito logo, sem buffering.
+    """
+
+    def __init__(self):
+        super().__init__(name='stream-relay', daemon=True)
+        self._selector = selectors.DefaultSelector()
+        self._pending = queue.Queue()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._start_lock = threading.Lock()
+
+    def add(self, upstream, client):
+        with self._start_lock:
+            if not self.is_alive():
+                self.start()
+        self._pending.put((upstream, client))
+        self._wakeup_w.send(b'\0')
+
+    def stream_count(self):
+        return len(self._selector.get_map()) - 1
+
+    def run(self):
+        while True:
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    self._wakeup_r.recv(4096)
+                    while not self._pending.empty():
+                        upstream, client = self._pending.get()
+                        client.settimeout(SEND_TIMEOUT)
+                        self._selector.register(upstream, selectors.EVENT_READ, client)
+                    continue
+                upstream, client = key.fileobj, key.data
+                try:
+                    data = upstream.recv(CHUNK_SIZE)
+                    if data:
+                        client.sendall(data)
+                        continue
+                except OSError:
+                    pass
+                self._close(upstream, client)
+
+    def _close(self, upstream, client):
+        self._selector.unregister(upstream)
+        for sock in (upstream, client):
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+
+STREAM_RELAY = StreamRelay()
+
+
+# ==================== IN-PROCESS BRIDGE ====================
+
+BRIDGE_MODES = ('proxy', 'inprocess')
+BRIDGE_SCRIPT = os.path.join(os.path.dirname(DIRECTORY), 'openclaw-bridge.py')
+BRIDGE = None  # Módulo openclaw-bridge.py carregado com --bridge inprocess
+BRIDGE_HANDLER = None  # Handler do Bridge adaptado a esta ligação (inprocess_handler)
+
+
+def load_bridge(args, path=BRIDGE_SCRIPT):
+    """Carrega o openclaw-bridge.py neste processo e aplica-lhe `args` (as
+    mesmas flags da linha de comando do Bridge; as do servidor HTTP e do log
+    são as deste servidor)"""
+    spec = importlib.util.spec_from_file_location('openclaw_bridge', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.configure(module.build_arg_parser().parse_args(args))
+    # Um só log: eventos e warnings do Bridge vão para o mesmo ficheiro
+    module.LOG = LOG
+    return module
+
+
+def inprocess_handler(bridge):
+    """Handler do Bridge que responde numa ligação deste servidor.
+
+    Usa a versão HTTP deste servidor (HTTP/1.0, a ligação fecha no fim) em
+    vez do HTTP/1.1 keep-alive do Bridge, e junta ao Server-Timing do Bridge
+    o tempo total do pedido neste servidor.
+    """
+    class InProcessBridgeHandler(bridge.OpenClawBridgeHandler):
+        protocol_version = CORSRequestHandler.protocol_version
+        front = None  # CORSRequestHandler da ligação
+
+        def send_header(self, keyword, value):
+            # O Connection é sempre o deste servidor (ver end_headers)
+            if keyword.lower() != 'connection':
+                super().send_header(keyword, value)
+
+        def end_headers(self):
+            super().send_header('Connection', 'close')
+            self.send_header('Server-Timing', self.front.server_timing())
+            super().end_headers()
+
+    return InProcessBridgeHandler
+
+
+def write_ready_file(path):
+    """Sinal de arranque para o start.sh: escrito (atomicamente) depois do bind"""
+    with open(path + '.tmp', 'w') as f:
+        f.write(f"{os.getpid()}\n")
+    os.replace(path + '.tmp', path)
+
+
+# ==================== STATIC FILES ====================
+
+class StaticEntry:
+    """Ficheiro estático em memória, com a variante gzip pré-calculada"""
+    __slots__ = ('body', 'gzip_body', 'etag', 'last_modified', 'content_type', 'mtime_ns', 'size')
+
+    def __init__(self, body, content_type, stat):
+        self.body = body
+        self.content_type = content_type
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        self.last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+        self.gzip_body = None
+        if len(body) >= 1024 and content_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.gzip_body = compressed
+
+    @property
+    def memory(self):
+        return len(self.body) + len(self.gzip_body or b'')
+
+
+class StaticFileCache:
+    """Cache LRU em memória dos ficheiros estáticos, validada por mtime/tamanho.
+
+    Cada pedido custa um stat(); o ficheiro só é relido (e recomprimido)
+    quando muda no disco.
+    """
+
+    def __init__(self, max_bytes=STATIC_CACHE_BYTES, max_file_size=STATIC_MAX_FILE_SIZE):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # caminho → StaticEntry
+
+    def get(self, path, content_type):
+        """StaticEntry atual do ficheiro; None se for grande demais para a cache"""
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        if stat.st_size > self.max_file_size:
+            return None
+
+        with open(path, 'rb') as f:
+            entry = StaticEntry(f.read(), content_type, stat)
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old:
+                self.memory -= old.memory
+            self._entries[path] = entry
+            self.memory += entry.memory
+            while self.memory > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.memory -= evicted.memory
+        return entry
+
+    def warm(self, root, guess_type):
+        """Carrega (e comprime) no arranque as páginas e assets da versão atual.
+
+        Só os ficheiros da raiz do tipo STATIC_WARM_TYPES: fontes, patches e
+        versões congeladas (v1.0/, v1.1/…) entram na cache no primeiro pedido.
+        """
+        with os.scandir(root) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                content_type = guess_type(entry.path)
+                if not content_type.startswith(STATIC_WARM_TYPES):
+                    continue
+                try:
+                    self.get(entry.path, content_type)
+                except OSError:
+                    pass
+                if self.memory >= self.max_bytes:
+                    return
+
+
+def accepts_gzip(accept_encoding):
+    """Se o Accept-Encoding admite gzip (explícito ou por "*") com q > 0"""
+    weights = accept_encoding_weights(accept_encoding)
+    return weights.get('gzip', weights.get('*', 0.0)) > 0
+
+
+def load_immutable_prefixes(root):
+    """Prefixos URL das versões congeladas listadas no versions.json.
+
+    A versão atual ("./") continua a ser revalidada; as restantes nunca
+    mudam e podem ficar em cache no browser indefinidamente.
+    """
+    try:
+        with open(os.path.join(root, 'versions.json')) as f:
+            versions = json.load(f).get('versions', [])
+    except (OSError, ValueError):
+        return ()
+    prefixes = []
+    for version in versions:
+        path = version.get('path', '').lstrip('.').strip('/')
+        if path:
+            prefixes.append(f'/{path}/')
+    return tuple(prefixes)
+
+
+STATIC_CACHE = StaticFileCache()
+IMMUTABLE_PREFIXES = load_immutable_prefixes(os.path.dirname(DIRECTORY))
 
 
 class CORSRequestHandler(http.server.SimpleHTTPRequestHandler):
+    timings = {}  # Fase → segundos, para o Server-Timing
+    request_started = None
+    request_id = None  # X-Request-Id (recebido ou gerado), enviado ao Bridge
+
     def end_headers(self):
         # Add CORS headers for all responses
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS, PATCH')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        if self.request_started is not None:
+            # Soma-se ao Server-Timing do Bridge (que segue no proxy)
+            self.send_header('Server-Timing', self.server_timing())
+        if self.request_id:
+            self.send_header('X-Request-Id', self.request_id)
         super().end_headers()
 
+    def log_message(self, format, *args):
+        # Erros do http.server (send_error, pedidos inválidos) vão para o log estruturado
+        LOG.event('info', format % args, client=self.client_address[0], rid=self.request_id)
+
+    def log_request(self, code='-', size='-'):
+        # A linha de acesso é escrita em record_request, com duração e bytes
+        pass
+
+    # ---- Métricas e Server-Timing ----
+
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+
+    def parse_request(self):
+        self.request_started = time.perf_counter()
+        self.timings = {}
+        self.status_code = None
+        self.wfile.bytes_written = 0
+        METRICS.inc('http_requests_in_flight')
+        self.request_id = None
+        if not super().parse_request():
+            return False
+        # Propagado ao Bridge no X-Request-Id para juntar as linhas dos dois logs
+        self.request_id = request_id_from(self.headers.get('X-Request-Id'))
+        return True
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        finally:
+            if self.request_started is not None:
+                self.record_request()
+
+    def send_response(self, code, message=None):
+        self.status_code = code
+        super().send_response(code, message)
+
+    def add_timing(self, name, started):
+        """Acumula o tempo desde `started` (perf_counter) na fase `name`"""
+        self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - started
+
+    def server_timing(self):
+        parts = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.timings.items()]
+        parts.append(f'proxy;dur={(time.perf_counter() - self.request_started) * 1000:.1f}')
+        return ', '.join(parts)
+
+    def metrics_route(self):
+        """Label da rota: endpoint da API, /metrics ou "static" (cardinalidade limitada)"""
+        path = urlparse(getattr(self, 'path', '')).path
+        if path.startswith('/api/'):
+            return path if self.status_code != 404 else '/api/other'
+        return path if path == '/metrics' else 'static'
+
+    def record_request(self):
+        elapsed = time.perf_counter() - self.request_started
+        self.request_started = None
+        METRICS.inc('http_requests_in_flight', value=-1)
+        route = self.metrics_route()
+        labels = (('route', route),)
+        METRICS.inc('http_requests_total', labels + (('method', self.command or '-'), ('status', str(self.status_code))))
+        METRICS.observe('http_request_duration_seconds', labels, elapsed)
+        METRICS.inc('http_response_bytes_total', labels, self.wfile.bytes_written)
+
+        record = {
+            "ts": time.time(),
+            "rid": self.request_id,
+            "client": self.client_address[0],
+            "method": self.command,
+            "path": urlparse(getattr(self, 'path', '')).path,
+            "status": self.status_code,
+            "ms": round(elapsed * 1000, 1),
+            "bytes": self.wfile.bytes_written
+        }
+        if self.timings:
+            record['timing'] = {phase: round(seconds * 1000, 1) for phase, seconds in self.timings.items()}
+        LOG.access(record, route, self.status_code or 0, elapsed)
+
+    def handle_metrics(self):
+        """Métricas no formato de texto do Prometheus (e as do Bridge, se no mesmo processo)"""
+        text = METRICS.render()
+        if BRIDGE is not None:
+            text += BRIDGE.METRICS.render()
+        body = text.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
     def do_OPTIONS(self):
         self.send_response(200)
         self.end_headers()
 
-    def translate_path(self, path):
-        # Serve files from the parent directory
-        parent_dir = os.path.dirname(DIRECTORY)
-        return os.path.join(parent_dir, path.lstrip('/'))
+    def __init__(self, *args, **kwargs):
+        # Serve files from the parent directory (translate_path normaliza o
+        # caminho, ignora a query string e não sai desta pasta)
+        super().__init__(*args, directory=os.path.dirname(DIRECTORY), **kwargs)
 
     def check_bridge_running(self):
-        """Verifica se o bridge está a correr"""
-        try:
-            # Tenta fazer um pedido simples ao bridge
-            req = urllib.request.Request(f'http://localhost:{BRIDGE_PORT}/', method='HEAD')
-            with urllib.request.urlopen(req, timeout=2) as response:
-                return True
-        except:
-            return False
+        """Verifica se o bridge está a correr (estado em cache do circuit breaker)"""
+        return BRIDGE_HEALTH.allow_request()
 
     def do_GET(self):
+        if BRIDGE is not None and self.path.startswith('/api/'):
+            self.handle_api_inprocess()
+            return
         # Proxy OpenClaw API requests to the Bridge
+        if self.path.split('?')[0] in STREAM_PATHS:
+            self.proxy_stream_to_bridge()
+            return
         if self.path.startswith('/api/'):
             self.proxy_to_bridge('GET')
             return
-        super().do_GET()
+        if self.path.split('?')[0] == '/metrics':
+            self.handle_metrics()
+            return
+        self.serve_static()
+
+    def do_HEAD(self):
+        self.serve_static(head=True)
+
+    def serve_static(self, head=False):
+        """Serve um ficheiro da cache em memória, com ETag/Last-Modified,
+        304 e gzip pré-calculado"""
+        url_path = urlparse(self.path).path
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, 'index.html')
+            if not url_path.endswith('/') or not os.path.isfile(index):
+                # Redirect para "pasta/" ou listagem: comportamento original
+                return super().do_HEAD() if head else super().do_GET()
+            path = index
+
+        started = time.perf_counter()
+        try:
+            entry = STATIC_CACHE.get(path, self.guess_type(path))
+        except OSError:
+            entry = None
+        self.add_timing('static', started)
+        if entry is None:
+            # Inexistente (404) ou grande demais: servido do disco
+            return super().do_HEAD() if head else super().do_GET()
+
+        cache_control = IMMUTABLE_CACHE_CONTROL if url_path.startswith(IMMUTABLE_PREFIXES) else 'no-cache'
+        if self.is_not_modified(entry):
+            self.send_response(304)
+            self.send_header('ETag', entry.etag)
+            self.send_header('Cache-Control', cache_control)
+            self.end_headers()
+            return
+
+        body = entry.body
+        gzipped = entry.gzip_body is not None and accepts_gzip(self.headers.get('Accept-Encoding'))
+        if gzipped:
+            body = entry.gzip_body
+        self.send_response(200)
+        self.send_header('Content-Type', entry.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', entry.etag)
+        self.send_header('Last-Modified', entry.last_modified)
+        self.send_header('Cache-Control', cache_control)
+        if entry.gzip_body is not None:
+            self.send_header('Vary', 'Accept-Encoding')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def is_not_modified(self, entry):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return if_none_match.strip() == '*' or entry.etag in [tag.strip() for tag in if_none_match.split(',')]
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(entry.mtime_ns / 1e9) <= since
+        return False
 
     def do_POST(self):
+        if BRIDGE is not None and self.path.startswith('/api/'):
+            self.handle_api_inprocess()
+            return
         # Proxy OpenClaw API requests to the Bridge
         if self.path.startswith('/api/'):
             self.proxy_to_bridge('POST')
@@ -74,117 +690,327 @@ class CORSRequestHandler(http.server.SimpleHTTPRequestHandler):
         super().do_POST()
 
     def do_PATCH(self):
+        if BRIDGE is not None and self.path.startswith('/api/'):
+            self.handle_api_inprocess()
+            return
         if self.path.startswith('/api/'):
             self.proxy_to_bridge('PATCH')
             return
         self.send_error(405, "Method not allowed")
 
+    def handle_api_inprocess(self):
+        """Pedido /api/* tratado pelo handler do Bridge na mesma ligação.
+
+        O handler do Bridge fica com o estado deste pedido (socket, headers,
+        timings, X-Request-Id) e responde diretamente, sem hop HTTP; a cache,
+        o poller e o scheduler do CLI são os do módulo carregado.
+        """
+        handler = object.__new__(BRIDGE_HANDLER)
+        handler.__dict__.update(self.__dict__)
+        handler.front = self
+        # Métricas, Server-Timing e linha de acesso próprias do Bridge, como
+        # num pedido que chega pelo proxy
+        handler.timings = {}
+        handler.request_started = time.perf_counter()
+        BRIDGE.METRICS.inc('http_requests_in_flight')
+        if urlparse(self.path).path == '/api/':
+            handler.path = '/'  # Documentação da API
+        method = getattr(handler, 'do_' + self.command, None)
+        try:
+            if method is None:
+                handler.send_error(405, "Method not allowed")
+            else:
+                method()
+        finally:
+            self.timings['bridge'] = time.perf_counter() - handler.request_started
+            handler.record_request()
+            self.status_code = handler.status_code
+            self.close_connection = True
+
+    def send_bridge_offline(self):
+        self.send_response(503)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        error_response = json.dumps({
+            "ok": False,
+            "error": "OpenClaw Bridge offline",
+            "message": f"O Bridge não está a correr em localhost:{BRIDGE_PORT}.\n\nPara iniciar:\n1. Abre outro terminal\n2. cd ~/.openclaw/workspace/mission-control\n3. python3 openclaw-bridge.py"
+        })
+        self.wfile.write(error_response.encode())
+
+    def send_proxy_error(self, status, error):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        error_response = json.dumps({
+            "ok": False,
+            "error": error,
+            "message": f"Failed to proxy to Bridge on port {BRIDGE_PORT}"
+        })
+        self.wfile.write(error_response.encode())
+
+    def send_bridge_connection_failed(self):
+        self.send_response(503)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        error_response = json.dumps({
+            "ok": False,
+            "error": "Bridge connection failed",
+            "message": f"Cannot connect to OpenClaw Bridge at localhost:{BRIDGE_PORT}. Is it running?"
+        })
+        self.wfile.write(error_response.encode())
+
+    def proxy_stream_to_bridge(self):
+        """Encaminha um stream SSE do Bridge sem buffering.
+
+        Lê só os headers do Bridge; o corpo é copiado pelo StreamRelay à
+        medida que chega, e a ligação do cliente deixa de ocupar um worker.
+        """
+        if not self.check_bridge_running():
+            self.send_bridge_offline()
+            return
+
+        started = time.perf_counter()
+        try:
+            upstream = socket.create_connection(('localhost', BRIDGE_PORT), timeout=BRIDGE_TIMEOUT)
+            upstream.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            upstream.sendall(
+                f"GET {self.path} HTTP/1.1\r\n"
+                f"Host: localhost:{BRIDGE_PORT}\r\n"
+                f"Accept: text/event-stream\r\n"
+                f"X-Request-Id: {self.request_id}\r\n"
+                f"Connection: close\r\n\r\n".encode()
+            )
+            head = b''
+            while b'\r\n\r\n' not in head:
+                chunk = upstream.recv(CHUNK_SIZE)
+                if not chunk:
+                    raise ConnectionError("Bridge closed the event stream")
+                head += chunk
+        except ConnectionError:
+            METRICS.inc('upstream_failures_total')
+            BRIDGE_HEALTH.record_failure()
+            self.send_bridge_connection_failed()
+            return
+        except OSError:
+            # Timeout: o Bridge aceitou a ligação, não conta para o circuit breaker
+            METRICS.inc('upstream_failures_total')
+            BRIDGE_HEALTH.record_inconclusive()
+            self.send_bridge_connection_failed()
+            return
+        BRIDGE_HEALTH.record_success()
+        self.add_timing('upstream', started)
+
+        head, body = head.split(b'\r\n\r\n', 1)
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        self.send_response(int(status_line.split()[1]))
+        for line in header_lines:
+            header, _, value = line.partition(':')
+            if header.lower() not in SKIP_RESPONSE_HEADERS:
+                self.send_header(header, value.strip())
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+        self.close_connection = True
+        self.server.detach_request(self.request)
+        STREAM_RELAY.add(upstream, self.request)
+
     def proxy_to_bridge(self, method):
-        """Forward request to OpenClaw Bridge"""
+        """Forward request to OpenClaw Bridge.
+
+        Os corpos (pedido e resposta) passam em chunks de CHUNK_SIZE à medida
+        que chegam, sem ficarem inteiros em memória.
+        """
+
+        req_headers = {
+            header: self.headers.get(header)
+            for header in FORWARD_REQUEST_HEADERS
+            if self.headers.get(header)
+        }
+        req_headers['X-Request-Id'] = self.request_id
+        try:
+            body = self.iter_request_body(req_headers)
+        except ValueError:
+            # Antes do circuit breaker: um pedido inválido não é um teste half-open
+            self.close_connection = True
+            self.send_proxy_error(400, "Invalid Content-Length")
+            return
 
         # Verifica se bridge está a correr
         if not self.check_bridge_running():
-            self.send_response(503)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            error_response = json.dumps({
-                "ok": False,
-                "error": "OpenClaw Bridge offline",
-                "message": f"O Bridge não está a correr em localhost:{BRIDGE_PORT}.\n\nPara iniciar:\n1. Abre outro terminal\n2. cd ~/.openclaw/workspace/mission-control\n3. python3 openclaw-bridge.py"
-            })
-            self.wfile.write(error_response.encode())
+            self.send_bridge_offline()
             return
 
+        settled = False
         try:
-            target_url = f"http://localhost:{BRIDGE_PORT}{self.path}"
-
-            # Read request body if present
-            body = None
-            content_length = self.headers.get('Content-Length')
-            if content_length:
-                body = self.rfile.read(int(content_length))
-
-            # Create request
-            req_headers = {}
-            if self.headers.get('Content-Type'):
-                req_headers['Content-Type'] = self.headers.get('Content-Type')
-            if self.headers.get('Authorization'):
-                req_headers['Authorization'] = self.headers.get('Authorization')
-
-            req = urllib.request.Request(
-                target_url,
-                data=body,
-                method=method,
-                headers=req_headers
-            )
+            # Send request to Bridge (ligação keep-alive do pool)
+            started = time.perf_counter()
+            conn, response = BRIDGE_POOL.open(method, self.path, body, req_headers)
+            BRIDGE_HEALTH.record_success()
+            settled = True
+            elapsed = time.perf_counter() - started
+            self.timings['upstream'] = elapsed
+            METRICS.observe('upstream_duration_seconds', (('endpoint', urlparse(self.path).path if response.status != 404 else '/api/other'),), elapsed)
 
-            # Send request to Bridge
-            try:
-                with urllib.request.urlopen(req, timeout=10) as response:
-                    response_body = response.read()
-                    self.send_response(response.status)
-                    # Copy response headers
-                    for header, value in response.headers.items():
-                        if header.lower() not in ['transfer-encoding', 'connection']:
-                            try:
-                                self.send_header(header, value)
-                            except:
-                                pass
-                    self.end_headers()
-                    self.wfile.write(response_body)
-                    return
-            except urllib.error.HTTPError as e:
-                error_body = e.read()
-                self.send_response(e.code)
-                for header, value in e.headers.items():
-                    if header.lower() not in ['transfer-encoding', 'connection']:
-                        try:
-                            self.send_header(header, value)
-                        except:
-                            pass
-                self.end_headers()
-                self.wfile.write(error_body)
+        except ConnectionError:
+            # Connection refused / reset - bridge not running
+            METRICS.inc('upstream_failures_total')
+            BRIDGE_HEALTH.record_failure()
+            settled = True
+            self.send_bridge_connection_failed()
+            return
+        except TimeoutError:
+            # Bridge vivo mas lento (CLI até 30 s, escritas de cron mais):
+            # não abre o circuito
+            METRICS.inc('upstream_failures_total')
+            self.send_proxy_error(504, "Bridge timed out")
+            return
+        except Exception as e:
+            self.send_proxy_error(502, str(e))
+            return
+        finally:
+            if not settled:
+                BRIDGE_HEALTH.record_inconclusive()
+
+        try:
+            self.stream_response(response, method)
+        except (OSError, http.client.HTTPException):
+            # Cliente ou Bridge caiu a meio: os headers já foram enviados e a
+            # ligação ao Bridge fica a meio de uma resposta, não volta ao pool
+            conn.close()
+            self.close_connection = True
+        except BaseException:
+            conn.close()
+            raise
+        else:
+            BRIDGE_POOL.release(conn, response)
+
+    def iter_request_body(self, req_headers):
+        """Corpo do pedido como iterador de chunks (Content-Length ou chunked).
+
+        ValueError se o Content-Length não for um inteiro >= 0.
+        """
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            # Sem Content-Length, o http.client reenvia em chunked
+            return self.iter_chunked_body()
+        length = int(self.headers.get('Content-Length') or 0)
+        if length < 0:
+            raise ValueError("negative Content-Length")
+        if not length:
+            return None
+        req_headers['Content-Length'] = str(length)
+        return self.iter_fixed_body(length)
+
+    def iter_fixed_body(self, length):
+        while length > 0:
+            chunk = self.rfile.read(min(CHUNK_SIZE, length))
+            if not chunk:
                 return
+            length -= len(chunk)
+            yield chunk
 
-        except urllib.error.URLError as e:
-            # Connection refused - bridge not running
-            self.send_response(503)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            error_response = json.dumps({
-                "ok": False,
-                "error": "Bridge connection failed",
-                "message": f"Cannot connect to OpenClaw Bridge at localhost:{BRIDGE_PORT}. Is it running?"
-            })
-            self.wfile.write(error_response.encode())
-        except Exception as e:
-            self.send_response(502)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            error_response = json.dumps({
-                "ok": False,
-                "error": str(e),
-                "message": f"Failed to proxy to Bridge on port {BRIDGE_PORT}"
-            })
-            self.wfile.write(error_response.encode())
+    def iter_chunked_body(self):
+        while True:
+            size_line = self.rfile.readline(65537)
+            size = int(size_line.split(b';', 1)[0].strip() or b'0', 16)
+            if size == 0:
+                # Trailers até à linha vazia
+                while self.rfile.readline(65537) not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            yield from self.iter_fixed_body(size)
+            self.rfile.readline()  # CRLF no fim do chunk
+
+    def stream_response(self, response, method):
+        """Copia a resposta do Bridge para o cliente chunk a chunk.
+
+        Com Content-Length os bytes seguem tal como vêm; sem ele (resposta
+        chunked do Bridge) um cliente HTTP/1.1 recebe chunked e um HTTP/1.0
+        recebe o corpo até ao fecho da ligação.
+        """
+        has_body = method != 'HEAD' and response.status not in (204, 304)
+        chunked = (has_body and response.getheader('Content-Length') is None
+                   and self.request_version == 'HTTP/1.1')
+        if chunked:
+            self.protocol_version = 'HTTP/1.1'
+
+        self.send_response(response.status)
+        for header, value in response.getheaders():
+            if header.lower() not in SKIP_RESPONSE_HEADERS:
+                self.send_header(header, value)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.send_header('Connection', 'close')
+        self.end_headers()
+
+        while has_body:
+            chunk = response.read1(CHUNK_SIZE)
+            if not chunk:
+                break
+            if chunked:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            else:
+                self.wfile.write(chunk)
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mission Control Local Server")
+    parser.add_argument('--server', choices=SERVER_MODES, default='threads',
+                        help="modo do servidor HTTP (default: threads)")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help=f"pedidos servidos em simultâneo (default: {WORKERS})")
+    parser.add_argument('--queue', type=int, default=QUEUE_SIZE,
+                        help=f"pedidos em espera antes de responder 503 (default: {QUEUE_SIZE})")
+    parser.add_argument('--log-file', metavar='PATH',
+                        help="log JSON-lines de acessos/erros (default: stdout)")
+    parser.add_argument('--log-max-mb', type=float, default=LOG_MAX_BYTES / 1024 / 1024,
+                        help="roda o log ao atingir este tamanho (default: %(default)g)")
+    parser.add_argument('--log-backups', type=int, default=LOG_BACKUPS,
+                        help="ficheiros rodados mantidos (default: %(default)s)")
+    parser.add_argument('--log-rotate-hours', type=float, default=LOG_ROTATE_INTERVAL / 3600,
+                        help="roda o log a cada N horas, 0 desativa (default: %(default)g)")
+    parser.add_argument('--log-sample', action='append', metavar='ROUTE=RATE',
+                        help="fração de respostas 2xx/3xx registadas para a rota (ex.: static=0.1)")
+    parser.add_argument('--bridge', choices=BRIDGE_MODES, default='proxy',
+                        help="proxy: /api/* via HTTP para o openclaw-bridge.py na porta "
+                             f"{BRIDGE_PORT}; inprocess: Bridge neste processo, sem hop (default: proxy)")
+    parser.add_argument('--bridge-args', default='',
+                        help="com --bridge inprocess, flags do openclaw-bridge.py (ex.: \"--poll --gateway\")")
+    parser.add_argument('--ready-file', metavar='PATH',
+                        help="escreve o PID neste ficheiro quando o servidor já aceita ligações")
+    options = parser.parse_args()
+    LOG.path = options.log_file
+    LOG.max_bytes = int(options.log_max_mb * 1024 * 1024)
+    LOG.backups = options.log_backups
+    LOG.rotate_interval = options.log_rotate_hours * 3600
+    LOG.sample_rates.update(parse_sample_rates(options.log_sample))
+
     os.chdir(os.path.dirname(DIRECTORY))
 
+    if options.bridge == 'inprocess':
+        BRIDGE = load_bridge(shlex.split(options.bridge_args))
+        BRIDGE_HANDLER = inprocess_handler(BRIDGE)
+
     # Verifica se bridge está a correr
     bridge_running = False
-    try:
-        req = urllib.request.Request(f'http://localhost:{BRIDGE_PORT}/', method='HEAD')
-        with urllib.request.urlopen(req, timeout=2) as response:
-            bridge_running = True
-    except:
-        pass
+    if BRIDGE is None:
+        try:
+            req = urllib.request.Request(f'http://localhost:{BRIDGE_PORT}/', method='HEAD')
+            with urllib.request.urlopen(req, timeout=2) as response:
+                bridge_running = True
+        except:
+            pass
 
     print(f"🚀 Mission Control Server running at http://localhost:{PORT}")
     print(f"📁 Serving files from: {os.path.dirname(DIRECTORY)}")
 
-    if bridge_running:
+    if BRIDGE is not None:
+        print(f"🦞 OpenClaw Bridge: no mesmo processo (backend {BRIDGE.BACKEND.name}, sem proxy HTTP)")
+        print(f"   Documentação API: http://localhost:{PORT}/api/")
+    elif bridge_running:
         print(f"🔗 OpenClaw Bridge: ✅ Connected (port {BRIDGE_PORT})")
         print(f"   API Proxy active: /api/* → localhost:{BRIDGE_PORT}")
     else:
@@ -195,9 +1021,15 @@ if __name__ == '__main__':
         print(f"   O Mission Control vai funcionar em modo offline até o Bridge iniciar.")
 
     print(f"\n💡 Abre no browser: http://localhost:{PORT}")
+    print(f"⚙️  Modo: {options.server} ({options.workers} workers, fila {options.queue})")
+
+    STATIC_CACHE.warm(os.path.dirname(DIRECTORY), lambda path: CORSRequestHandler.guess_type(CORSRequestHandler, path))
+    print(f"🗂️  Cache estática: {len(STATIC_CACHE._entries)} ficheiros, {STATIC_CACHE.memory // 1024} KB (gzip pré-calculado)")
     print(f"=" * 50)
 
-    with socketserver.TCPServer(("", PORT), CORSRequestHandler) as httpd:
+    with make_server(options.server, PORT, CORSRequestHandler, options.workers, options.queue, METRICS) as httpd:
+        if options.ready_file:
+            write_ready_file(options.ready_file)
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
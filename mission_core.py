@@ -0,0 +1,449 @@
+"""
+Núcleo partilhado pelo openclaw-bridge.py e pelo local/server.py
+
+Os dois servidores usam as mesmas métricas Prometheus (cada um com o seu
+prefixo), o mesmo log JSON-lines com X-Request-Id e os mesmos modos de
+servidor HTTP (pool de workers com fila de admissão, asyncio, um pedido de
+cada vez). Este ficheiro fica ao lado do openclaw-bridge.py; o
+local/server.py importa-o da pasta acima.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import random
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVER_MODES = ('threads', 'asyncio', 'single')
+
+
+# ==================== METRICS ====================
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # Segundos
+
+
+class Metrics:
+    """Contadores, gauges e histogramas em memória, no formato de texto do
+    Prometheus (GET /metrics).
+
+    As séries são indexadas por (nome, labels); `collectors` são funções
+    chamadas no render que devolvem valores já existentes noutros sítios
+    (ex.: contadores de uma cache) como [(nome, tipo, descrição, labels, valor)].
+    """
+
+    def __init__(self, prefix, buckets=LATENCY_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.collectors = []
+        self._lock = threading.Lock()
+        self._help = {}        # nome → (tipo, descrição)
+        self._values = {}      # (nome, labels) → valor (counter/gauge)
+        self._histograms = {}  # (nome, labels) → [contagem por bucket..., +Inf, soma]
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        key = (name, tuple(labels))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += seconds
+
+    def render(self):
+        """Texto de exposição (text/plain; version=0.0.4)"""
+        with self._lock:
+            values = dict(self._values)
+            histograms = {key: list(series) for key, series in self._histograms.items()}
+        help_ = dict(self._help)
+        for collector in self.collectors:
+            for name, kind, text, labels, value in collector():
+                help_.setdefault(name, (kind, text))
+                values[(name, tuple(labels))] = value
+
+        series_by_name = {}
+        for name, labels in list(values) + list(histograms):
+            series_by_name.setdefault(name, []).append(labels)
+
+        lines = []
+        for name in sorted(series_by_name):
+            kind, text = help_.get(name, ('untyped', ''))
+            full_name = f'{self.prefix}_{name}'
+            lines.append(f'# HELP {full_name} {text}')
+            lines.append(f'# TYPE {full_name} {kind}')
+            for labels in sorted(set(series_by_name[name])):
+                if kind != 'histogram':
+                    lines.append(f'{full_name}{format_labels(labels)} {values[(name, labels)]}')
+                    continue
+                series = histograms[(name, labels)]
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), series):
+                    cumulative += count
+                    lines.append(f'{full_name}_bucket{format_labels(labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{full_name}_sum{format_labels(labels)} {series[-1]:.6f}')
+                lines.append(f'{full_name}_count{format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class CountingWriter:
+    """wfile que conta os bytes escritos (para http_response_bytes_total)"""
+    __slots__ = ('raw', 'bytes_written')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self.raw.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+# ==================== STRUCTURED LOG ====================
+
+LOG_QUEUE_SIZE = 10000  # Linhas em espera; acima disto descartam-se (e contam-se)
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotação por tamanho
+LOG_BACKUPS = 5  # Ficheiros rodados mantidos (.1 … .N)
+LOG_ROTATE_INTERVAL = 24 * 3600  # Rotação por tempo (segundos; 0 desativa)
+LOG_SLOW_REQUEST = 1.0  # Segundos; pedidos lentos são sempre registados
+REQUEST_ID_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_.')
+
+
+def new_request_id():
+    return os.urandom(8).hex()
+
+
+def request_id_from(value):
+    """Reutiliza o X-Request-Id recebido se for razoável; senão gera um"""
+    if value and len(value) <= 64 and REQUEST_ID_CHARS.issuperset(value):
+        return value
+    return new_request_id()
+
+
+class StructuredLog:
+    """Log JSON-lines escrito por uma thread de background.
+
+    O pedido só mete um dict numa fila (put_nowait): a serialização, a
+    escrita e a rotação acontecem fora do hot path. Com a fila cheia a linha
+    é descartada em vez de bloquear. Respostas 2xx/3xx rápidas das rotas em
+    `sample_rates` são amostradas; erros e pedidos lentos ficam sempre.
+    """
+
+    def __init__(self, path=None, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS,
+                 rotate_interval=LOG_ROTATE_INTERVAL, sample_rates=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.rotate_interval = rotate_interval
+        self.sample_rates = dict(sample_rates or {})
+        self.dropped = 0
+        self.sampled_out = 0
+        self._queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._stream = None
+        self._opened_at = 0
+        self._size = 0
+        self._thread = threading.Thread(target=self.run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def access(self, record, route, status, elapsed):
+        """Regista um pedido (record já com os campos do pedido)"""
+        rate = self.sample_rates.get(route, 1.0)
+        if rate < 1.0 and status < 400 and elapsed < LOG_SLOW_REQUEST:
+            if random.random() >= rate:
+                self.sampled_out += 1
+                return
+            record['sample'] = rate
+        self._put(record)
+
+    def event(self, level, message, **fields):
+        self._put({"ts": time.time(), "level": level, "msg": message, **fields})
+
+    def _put(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 512:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                batch = batch[:batch.index(None)]
+                self._write(batch)
+                return
+            self._write(batch)
+
+    def _write(self, batch):
+        lines = []
+        for record in batch:
+            ts = record.get('ts', time.time())
+            record['ts'] = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(ts)) + f'.{int(ts * 1000) % 1000:03d}Z'
+            lines.append(json.dumps(record, separators=(',', ':'), ensure_ascii=False, default=str))
+        if not lines:
+            return
+        data = '\n'.join(lines) + '\n'
+        try:
+            stream = self._open()
+            stream.write(data)
+            stream.flush()
+            self._size += len(data)
+        except (OSError, ValueError):
+            self.dropped += len(lines)
+
+    def _open(self):
+        if self.path is None:
+            return sys.stdout
+        now = time.time()
+        if self._stream is not None and (
+                self._size >= self.max_bytes
+                or (self.rotate_interval and now - self._opened_at >= self.rotate_interval)):
+            self._stream.close()
+            self._stream = None
+            self._rotate()
+        if self._stream is None:
+            self._stream = open(self.path, 'a', encoding='utf-8')
+            self._size = self._stream.tell()
+            self._opened_at = now
+        return self._stream
+
+    def _rotate(self):
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = f'{self.path}.{index}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{index + 1}')
+        os.replace(self.path, f'{self.path}.1')
+
+    def close(self):
+        """Escreve o que está na fila e para a thread (no fim do processo)"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(2)
+
+
+def parse_sample_rates(values):
+    """['/metrics=0.01', 'static=0.1'] → {'/metrics': 0.01, 'static': 0.1}"""
+    rates = {}
+    for value in values or ():
+        route, _, rate = value.rpartition('=')
+        rates[route] = float(rate)
+    return rates
+
+
+# ==================== CONTENT NEGOTIATION ====================
+
+def accept_encoding_weights(accept_encoding):
+    """Accept-Encoding → {codificação: q} (q inválido conta como 0)"""
+    weights = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+# ==================== SERVER CORE ====================
+
+ASYNCIO_LOOP = None  # Event loop do AsyncioServer em curso (None nos outros modos)
+
+SATURATED_BODY = json.dumps({
+    "ok": False,
+    "error": "Server saturated",
+    "message": "Demasiados pedidos em curso. Tenta novamente dentro de momentos."
+}).encode()
+SATURATED_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Retry-After: 1\r\n"
+    b"Access-Control-Allow-Origin: *\r\n"
+    b"Connection: close\r\n"
+    b"Content-Length: " + str(len(SATURATED_BODY)).encode() + b"\r\n\r\n" + SATURATED_BODY
+)
+
+
+class DetachableServer(socketserver.TCPServer):
+    """TCPServer em que um handler pode ficar com a ligação (streams SSE).
+
+    Um pedido "detached" não é fechado no fim do handler: passa a ser
+    responsabilidade de quem o recebeu (ex.: o EventHub do Bridge ou o
+    StreamRelay do servidor local).
+    """
+    allow_reuse_address = True
+
+    def __init__(self, *args, **kwargs):
+        self._detached = set()
+        self._detached_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def detach_request(self, request):
+        with self._detached_lock:
+            self._detached.add(request)
+
+    def shutdown_request(self, request):
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
+
+class SingleServer(DetachableServer):
+    """Servidor original: um pedido de cada vez"""
+
+
+class PooledServer(DetachableServer):
+    """TCPServer com pool de workers limitado e fila de admissão.
+
+    Até `workers` pedidos correm em simultâneo e mais `queue_size` esperam
+    por um worker livre; acima disso o pedido recebe logo um 503 (contado
+    em http_rejected_total de `metrics`, se dado).
+    """
+    request_queue_size = 64
+
+    def __init__(self, server_address, handler_class, workers, queue_size, metrics=None, name='server'):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.metrics = metrics
+        self.rejected = 0
+        self._admission = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{name}-worker')
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        if not self._admission.acquire(blocking=False):
+            self.rejected += 1
+            self.reject_request(request)
+            return
+        self._executor.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._admission.release()
+
+    def reject_request(self, request):
+        if self.metrics is not None:
+            self.metrics.inc('http_rejected_total')
+        # Corre na thread (ou no event loop) que aceita as ligações: nada aqui
+        # pode bloquear. Consome o que o pedido já enviou, para o cliente
+        # receber o 503 em vez de um reset, e escreve a resposta (cabe no
+        # buffer do socket) sem esperar.
+        request.setblocking(False)
+        try:
+            while request.recv(65536):
+                pass
+        except OSError:
+            pass
+        try:
+            request.send(SATURATED_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False)
+
+
+class AsyncioServer(PooledServer):
+    """Variante asyncio: o event loop aceita as ligações (e fica em
+    ASYNCIO_LOOP, onde o Bridge corre os subprocessos CLI); os handlers HTTP
+    correm no pool de workers com a mesma fila de admissão.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._stopped = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def serve_forever(self, poll_interval=0.5):
+        self._stopped.clear()
+        try:
+            asyncio.run(self._serve())
+        finally:
+            self._stopped.set()
+
+    async def _serve(self):
+        global ASYNCIO_LOOP
+        loop = asyncio.get_running_loop()
+        ASYNCIO_LOOP = loop
+        self._accept_task = asyncio.current_task()
+        self.socket.setblocking(False)
+        try:
+            while True:
+                request, client_address = await loop.sock_accept(self.socket)
+                request.setblocking(True)
+                self.process_request(request, client_address)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            ASYNCIO_LOOP = None
+
+    def shutdown(self):
+        """Pára o serve_forever e espera que acabe (como o TCPServer)"""
+        task = getattr(self, '_accept_task', None)
+        if task is None or self._stopped.is_set():
+            return
+        try:
+            task.get_loop().call_soon_threadsafe(task.cancel)
+        except RuntimeError:
+            pass  # Loop já fechado: o serve_forever está a acabar
+        self._stopped.wait()
+
+
+SERVER_CLASSES = {'threads': PooledServer, 'asyncio': AsyncioServer, 'single': SingleServer}
+
+
+def make_server(mode, port, handler_class, workers, queue_size, metrics=None, name='server'):
+    """Servidor HTTP do modo `mode` (SERVER_MODES) em todas as interfaces"""
+    if mode == 'single':
+        return SingleServer(("", port), handler_class)
+    return SERVER_CLASSES[mode](("", port), handler_class, workers, queue_size, metrics, name)
@@ -15,41 +15,3037 @@ Endpoints:
     GET /api/v1/status          → Status completo do OpenClaw
     GET /api/v1/gateway/status  → Status do gateway
     GET /api/v1/cron/list       → Lista de cron jobs
-    GET /api/v1/sessions/list   → Lista de sessões ativas
+    POST /api/v1/cron/add|remove|update → Escritas de cron jobs (fila única, coalescida)
+    POST /api/v1/cron/bulk      → Várias escritas de cron num só lote
+    GET /api/v1/sessions/list   → Lista de sessões ativas (?since=<updatedAt> → só alterações; ?limit/cursor/sort/agentId/channel/model/maxAgeMs)
     GET /api/v1/agents/list     → Lista de agentes configurados
+    GET /api/v1/dashboard       → Gateway, cron, sessões e agentes num só pedido
+    GET /api/v1/events          → Stream SSE com as alterações de status, cron e sessões
+    GET /api/v1/cache/stats     → Contadores da cache de snapshots CLI
+    GET /api/v1/metrics/tokens  → Histórico de tokens (?from=&to=&agentId=&resolution=)
+    GET /api/v1/usage/summary   → Totais e top-N de tokens por agentId, canal e modelo (?top=&sort=)
+    GET /api/v1/fleet/<secção>  → gateway, cron, sessions ou agents de todos os hosts (--target)
+    GET /metrics                → Métricas Prometheus (latência, CLI, cache, bytes)
+
+Com --gateway, status, cron e sessões são pedidos diretamente ao gateway
+por uma ligação WebSocket persistente; o CLI fica como fallback.
+
+As respostas JSON são compactas (?pretty=1 para indentar) e comprimidas com
+gzip, ou brotli se o módulo estiver instalado, conforme o Accept-Encoding.
 """
 
-import http.server
-import socketserver
-import json
-import subprocess
-import os
-import sys
-from urllib.parse import urlparse, parse_qs
+import argparse
+import asyncio
+import atexit
+import base64
+import bisect
+import codecs
+import hashlib
+import http.client
+import http.server
+import json
+import subprocess
+import os
+import queue
+import random
+import re
+import select
+import selectors
+import socket
+import sqlite3
+import ssl
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from urllib.parse import urlparse, parse_qs
+
+try:
+    import brotli  # Opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+import mission_core
+from mission_core import (
+    LOG_BACKUPS, LOG_MAX_BYTES, LOG_ROTATE_INTERVAL, SERVER_MODES, CountingWriter, Metrics, StructuredLog,
+    accept_encoding_weights, make_server, parse_sample_rates, request_id_from
+)
+
+PORT = 18791  # Porta diferente do gateway (18789)
+CACHE_TTL = float(os.environ.get('OPENCLAW_BRIDGE_CACHE_TTL', '2'))  # Segundos
+CLI_TIMEOUT = 30  # Segundos
+WORKERS = 8  # Pedidos servidos em simultâneo
+QUEUE_SIZE = 32  # Pedidos em espera antes de responder 503
+KEEPALIVE_TIMEOUT = 5  # Segundos até fechar uma ligação keep-alive parada
+TOMBSTONE_RETENTION = 24 * 3600 * 1000  # ms durante os quais se lembram sessões removidas
+COMPRESS_MIN_SIZE = 1024  # Bytes; respostas menores seguem sem compressão
+GATEWAY_URL = os.environ.get('OPENCLAW_GATEWAY_URL', 'ws://127.0.0.1:18789')
+GATEWAY_TOKEN = os.environ.get('OPENCLAW_GATEWAY_TOKEN')  # Opcional
+GATEWAY_TIMEOUT = 10  # Segundos por pedido ao gateway
+GATEWAY_RETRY_DELAY = 5  # Segundos entre tentativas de religar ao gateway
+IDENTITY_CHECK_INTERVAL = 2  # Segundos entre stat() de cada IDENTITY.md/SOUL.md
+
+
+# ==================== METRICS ====================
+
+METRICS = Metrics('openclaw_bridge')
+METRICS.describe('http_requests_total', 'counter', "Pedidos HTTP por endpoint, método e status")
+METRICS.describe('http_request_duration_seconds', 'histogram', "Duração dos pedidos HTTP por endpoint")
+METRICS.describe('http_requests_in_flight', 'gauge', "Pedidos HTTP em curso")
+METRICS.describe('http_response_bytes_total', 'counter', "Bytes enviados por endpoint (headers incluídos)")
+METRICS.describe('http_rejected_total', 'counter', "Pedidos recusados com 503 por saturação")
+METRICS.describe('phase_duration_seconds', 'histogram', "Tempo por fase do pedido (snapshot, format, encode, compress)")
+METRICS.describe('cli_duration_seconds', 'histogram', "Tempo de parede de cada subprocesso openclaw")
+METRICS.describe('cli_exit_total', 'counter', "Subprocessos openclaw por exit code")
+METRICS.describe('cli_parse_seconds', 'histogram', "Tempo de parse do stdout do CLI (json.loads ou stream)")
+METRICS.describe('cli_queue_wait_seconds', 'histogram', "Espera por vez na fila do CLI, por prioridade")
+METRICS.describe('cli_cancelled_total', 'counter', "Execuções CLI canceladas (deadline ou cliente desligado)")
+METRICS.describe('gateway_call_seconds', 'histogram', "Round trip dos pedidos ao gateway por WebSocket")
+METRICS.describe('cron_mutations_total', 'counter', "Escritas de cron jobs aplicadas, por operação e resultado")
+METRICS.describe('cron_mutations_coalesced_total', 'counter', "Escritas juntas a outra pendente para o mesmo job")
+METRICS.describe('fleet_gather_seconds', 'histogram', "Tempo de agregação de uma secção em todos os hosts")
+METRICS.describe('cron_batch_seconds', 'histogram', "Tempo de aplicação de cada lote de escritas de cron")
+METRICS.describe('usage_rollup_seconds', 'histogram', "Tempo de atualização dos agregados de uso por snapshot")
+
+
+def command_label(args):
+    """Label curta de um argv (`cron list --json` → "cron list")"""
+    return ' '.join([arg for arg in args if not arg.startswith('-')][:2])
+
+
+def collect_bridge_metrics():
+    cache = CLI_CACHE.stats()
+    scheduler = CLI_SCHEDULER.stats()
+    return [
+        ('cache_hits_total', 'counter', "Leituras servidas da cache de snapshots", (), cache['hits']),
+        ('cache_misses_total', 'counter', "Leituras que executaram o backend", (), cache['misses']),
+        ('cache_coalesced_total', 'counter', "Leituras que esperaram por uma execução em curso", (), cache['coalesced']),
+        ('cache_entries', 'gauge', "Snapshots em cache", (), cache['entries']),
+        ('backend_calls_total', 'counter', "Chamadas ao backend de dados", (('backend', BACKEND.name),), BACKEND.calls),
+        ('identity_file_reads_total', 'counter', "Leituras de IDENTITY.md/SOUL.md", (), IDENTITY_INDEX.reads),
+        ('cli_running', 'gauge', "Subprocessos openclaw em curso", (), scheduler['running']),
+        ('cli_queue_depth', 'gauge', "Execuções CLI à espera de vez", (), scheduler['queued']),
+        ('event_clients', 'gauge', "Clientes SSE ligados", (), EVENT_HUB.client_count()),
+        ('log_dropped_total', 'counter', "Linhas de log descartadas (fila cheia)", (), LOG.dropped),
+        ('log_sampled_out_total', 'counter', "Pedidos não registados pela amostragem", (), LOG.sampled_out),
+    ]
+
+
+METRICS.collectors.append(collect_bridge_metrics)
+
+
+# ==================== STRUCTURED LOG ====================
+
+LOG_SAMPLE_RATES = {'/metrics': 0.01, '/api/v1/gateway/status': 0.1}  # Rota → fração registada
+LOG = StructuredLog(sample_rates=LOG_SAMPLE_RATES)
+atexit.register(LOG.close)
+
+
+# ==================== SNAPSHOT CACHE ====================
+
+class _Flight:
+    """Execução CLI em curso, partilhada pelos pedidos que chegam entretanto"""
+    __slots__ = ('event', 'result', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.waiters = []  # cli_waiter() de cada pedido à espera (prioridade e cancelamento)
+
+
+class SnapshotCache:
+    """Cache de resultados CLI partilhada pelo processo, indexada pelo argv.
+
+    Um resultado com sucesso é reutilizado durante `ttl` segundos. Pedidos
+    concorrentes para o mesmo argv esperam pelo subprocesso em curso
+    (single-flight) em vez de lançarem outro.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}   # argv -> (monotonic, epoch, resultado)
+        self._inflight = {}  # argv -> _Flight
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key, loader):
+        return self.lookup(key, loader)[0]
+
+    def lookup(self, key, loader, max_age=None, force=False):
+        """Devolve (resultado, asOf) para o argv.
+
+        `max_age` substitui o TTL na verificação da entrada e `force` ignora-a
+        (usado pelo poller); em ambos os casos o single-flight mantém-se.
+        asOf é o instante (epoch, segundos) em que a recolha do snapshot
+        começou, ou None se não há: o que mudou durante a execução do CLI
+        fica depois do asOf (cursor de ?since=), nunca antes.
+        """
+        key = tuple(key)
+        limit = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not force and time.monotonic() - entry[0] < limit:
+                self.hits += 1
+                return entry[2], entry[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+            flight.waiters.append(cli_waiter())
+
+        if not leader:
+            flight.event.wait()
+            return self._settled(key, flight)
+
+        # O scheduler do CLI vê todos os que esperam por esta execução
+        CLI_CONTEXT.waiters = flight.waiters
+        started_at = time.time()
+        try:
+            flight.result = loader()
+        finally:
+            CLI_CONTEXT.waiters = None
+            with self._lock:
+                # Só resultados com sucesso ficam em cache; erros são
+                # partilhados com quem esperava mas não reutilizados
+                if flight.result is not None and flight.result.get('ok'):
+                    self._entries[key] = (time.monotonic(), started_at, flight.result)
+                del self._inflight[key]
+            flight.event.set()
+        return self._settled(key, flight)
+
+    def _settled(self, key, flight):
+        result = flight.result or {"ok": False, "error": "CLI command failed"}
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[2] is result:
+            return result, entry[1]
+        return result, None
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(tuple(key), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "entries": len(self._entries),
+                "inflight": len(self._inflight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced
+            }
+
+
+CLI_CACHE = SnapshotCache(CACHE_TTL)
+
+
+# ==================== BACKGROUND POLLER ====================
+
+# Fontes mantidas quentes pelo poller: nome → argv CLI
+POLL_SOURCES = {
+    'status': ['status', '--json'],
+    'cron': ['cron', 'list', '--json'],
+    'sessions': ['sessions', 'list', '--json'],
+}
+POLL_INTERVALS = {'status': 5, 'cron': 30, 'sessions': 10}  # Segundos
+STALE_FACTOR = 3  # Snapshot é "stale" se tiver mais de N intervalos
+
+
+class BackgroundPoller(threading.Thread):
+    """Atualiza periodicamente os snapshots CLI, fora do caminho dos pedidos.
+
+    Corre uma fonte de cada vez, por isso nunca há mais do que um subprocesso
+    do poller ativo, independentemente do número de clientes.
+    """
+
+    def __init__(self, cache, loader, intervals):
+        super().__init__(name='openclaw-poller', daemon=True)
+        self.cache = cache
+        self.loader = loader
+        self.intervals = {tuple(POLL_SOURCES[name]): interval for name, interval in intervals.items()}
+        self.listeners = []  # Chamados com (argv, resultado, asOf) após cada recolha
+        self.polls = 0
+        self.failures = 0
+        self._stop_event = threading.Event()
+
+    def polls_source(self, argv):
+        return tuple(argv) in self.intervals
+
+    def max_age(self, argv):
+        return self.intervals[tuple(argv)] * STALE_FACTOR
+
+    def run(self):
+        next_due = dict.fromkeys(self.intervals, 0.0)
+        while not self._stop_event.is_set():
+            for argv, interval in self.intervals.items():
+                if time.monotonic() < next_due[argv]:
+                    continue
+                result, as_of = self.cache.lookup(argv, lambda: self.loader(list(argv)), force=True)
+                self.polls += 1
+                if not result.get('ok'):
+                    self.failures += 1
+                self.publish(argv, result, as_of)
+                next_due[argv] = time.monotonic() + interval
+            self._stop_event.wait(max(min(next_due.values()) - time.monotonic(), 0.05))
+
+    def publish(self, argv, result, as_of):
+        """Entrega um snapshot aos listeners (também usado fora do ciclo, após escritas)"""
+        for listener in self.listeners:
+            try:
+                listener(argv, result, as_of)
+            except Exception as e:
+                LOG.event('warning', f"Poller listener failed: {e}", source=' '.join(argv))
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stats(self):
+        return {
+            "intervals": {" ".join(argv): interval for argv, interval in self.intervals.items()},
+            "polls": self.polls,
+            "failures": self.failures
+        }
+
+
+POLLER = None  # Ativado com --poll ou pelo primeiro cliente de /api/v1/events
+
+# Secções do /api/v1/dashboard → método que as constrói
+DASHBOARD_SECTIONS = {
+    'gateway': 'build_gateway_status',
+    'cron': 'build_cron_list',
+    'sessions': 'build_sessions_list',
+    'agents': 'build_agents_list',
+}
+DASHBOARD_EXECUTOR = ThreadPoolExecutor(max_workers=len(DASHBOARD_SECTIONS), thread_name_prefix='dashboard')
+
+
+# ==================== CLI SCHEDULER ====================
+
+CLI_CONCURRENCY = 4  # Subprocessos openclaw em simultâneo (todo o processo)
+CLI_CHECK_INTERVAL = 0.1  # Segundos entre verificações de deadline/cliente
+# Quem pede o snapshot → prioridade na fila do CLI (menor = primeiro)
+CLI_PRIORITIES = {
+    'gateway': 0,   # Estado do gateway, o indicador principal das páginas
+    'write': 1,     # Escritas de cron (há um pedido à espera do resultado)
+    'status': 2,
+    'cron': 3,
+    'sessions': 3,
+    'agents': 4,    # Enriquecimento dos agentes
+    'poll': 5,      # Refresh em background
+}
+CLI_CONTEXT = threading.local()  # priority/client de quem corre na thread atual
+
+
+class CliCancelled(Exception):
+    """Execução CLI abandonada (clientes desligados ou deadline ultrapassado)"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def client_gone(sock):
+    """True se o cliente fechou a ligação (EOF sem dados por ler)"""
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+
+def cli_waiter():
+    """(prioridade, socket do cliente ou None) de quem corre na thread atual"""
+    priority = getattr(CLI_CONTEXT, 'priority', None)
+    return (CLI_PRIORITIES['poll'] if priority is None else priority, getattr(CLI_CONTEXT, 'client', None))
+
+
+class CliTicket:
+    """Pedido de execução na fila do CliScheduler.
+
+    `waiters` é partilhada com o _Flight da cache: quem se junta a uma
+    execução em curso sobe-lhe a prioridade e mantém-na viva. Só quando todos
+    os clientes se desligam (e nenhum é interno, client None) é cancelada.
+    """
+    __slots__ = ('label', 'waiters', 'deadline', 'seq', 'queued_at')
+
+    def __init__(self, label, waiters, deadline, seq):
+        self.label = label
+        self.waiters = waiters
+        self.deadline = deadline
+        self.seq = seq
+        self.queued_at = time.monotonic()
+
+    def priority(self):
+        return min((priority for priority, _ in list(self.waiters)), default=CLI_PRIORITIES['poll'])
+
+    def check(self):
+        """Lança CliCancelled se a execução já não interessa a ninguém"""
+        if time.monotonic() >= self.deadline:
+            raise CliCancelled('deadline')
+        waiters = list(self.waiters)
+        if waiters and all(client is not None and client_gone(client) for _, client in waiters):
+            raise CliCancelled('disconnect')
+
+
+class CliScheduler:
+    """Limite global de subprocessos openclaw, com fila por prioridade.
+
+    Acima de `limit` execuções em curso, as seguintes esperam e saem por
+    ordem de prioridade (e de chegada). Enquanto esperam ou correm, são
+    canceladas se passarem o deadline ou se todos os clientes desligarem;
+    um subprocesso cancelado é morto.
+    """
+
+    def __init__(self, limit=CLI_CONCURRENCY):
+        self.limit = limit
+        self._cond = threading.Condition()
+        self._queue = []  # CliTicket à espera de vez
+        self._seq = 0
+        self.running = 0
+        self.started = 0
+        self.cancelled = {'deadline': 0, 'disconnect': 0}
+
+    def ticket(self, label, timeout=CLI_TIMEOUT):
+        waiters = getattr(CLI_CONTEXT, 'waiters', None) or [cli_waiter()]
+        with self._cond:
+            self._seq += 1
+            return CliTicket(label, waiters, time.monotonic() + timeout, self._seq)
+
+    def acquire(self, ticket):
+        """Espera por vez; CliCancelled se o ticket for abandonado na fila"""
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    if self.running < self.limit and ticket is min(self._queue, key=lambda t: (t.priority(), t.seq)):
+                        break
+                    try:
+                        ticket.check()
+                    except CliCancelled as e:
+                        self.cancelled[e.reason] += 1
+                        METRICS.inc('cli_cancelled_total', (('reason', e.reason), ('stage', 'queued')))
+                        raise
+                    self._cond.wait(CLI_CHECK_INTERVAL)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+            self.running += 1
+            self.started += 1
+        METRICS.observe('cli_queue_wait_seconds', (('priority', str(ticket.priority())),),
+                        time.monotonic() - ticket.queued_at)
+
+    def release(self):
+        with self._cond:
+            self.running -= 1
+            self._cond.notify_all()
+
+    def record_cancel(self, reason):
+        with self._cond:
+            self.cancelled[reason] += 1
+        METRICS.inc('cli_cancelled_total', (('reason', reason), ('stage', 'running')))
+
+    def stats(self):
+        with self._cond:
+            queued = [ticket.priority() for ticket in self._queue]
+            return {
+                "limit": self.limit,
+                "running": self.running,
+                "queued": len(queued),
+                "queuedByPriority": {str(p): queued.count(p) for p in sorted(set(queued))},
+                "started": self.started,
+                "cancelled": dict(self.cancelled)
+            }
+
+
+CLI_SCHEDULER = CliScheduler()
+
+
+def run_cli_sync(cmd, ticket, parser=None):
+    """Corre o CLI numa thread; devolve (returncode, stdout, stderr).
+
+    Com `parser` o stdout vai para o parser à medida que chega e o stdout
+    devolvido é None.
+    """
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=parser is None,
+        cwd=os.path.expanduser('~')
+    )
+    if parser is not None:
+        stderr = stream_cli_output(proc, ticket, parser)
+        return proc.returncode, None, stderr
+    while True:
+        try:
+            stdout, stderr = proc.communicate(timeout=CLI_CHECK_INTERVAL)
+            return proc.returncode, stdout, stderr
+        except subprocess.TimeoutExpired:
+            # communicate() pode ser repetido sem perder output
+            try:
+                ticket.check()
+            except CliCancelled:
+                proc.kill()
+                proc.communicate()
+                raise
+
+
+async def run_cli_async(cmd, ticket, parser=None):
+    """Corre o CLI no event loop; devolve (returncode, stdout, stderr)"""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=os.path.expanduser('~')
+    )
+    if parser is None:
+        communicate = asyncio.ensure_future(proc.communicate())
+    else:
+        communicate = asyncio.ensure_future(stream_cli_output_async(proc, parser))
+    while True:
+        done, _ = await asyncio.wait({communicate}, timeout=CLI_CHECK_INTERVAL)
+        if done:
+            stdout, stderr = communicate.result()
+            if stdout is not None:
+                stdout = stdout.decode(errors='replace')
+            return proc.returncode, stdout, stderr.decode(errors='replace')
+        try:
+            ticket.check()
+        except CliCancelled:
+            proc.kill()
+            await communicate
+            raise
+
+
+# ==================== STREAMING JSON ====================
+
+CLI_READ_SIZE = 64 * 1024  # Bytes lidos do stdout do CLI de cada vez
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+JSON_NUMBER_TAIL = '.eE+-'  # Depois de um número cortado no chunk: fração/expoente ainda por chegar
+_INCOMPLETE = object()
+
+
+def streamed_projections(args):
+    """argv → {lista: projeção} para ler o output em stream (None: json.loads)"""
+    command = tuple(arg for arg in args if not arg.startswith('-'))
+    if command == ('sessions', 'list'):
+        return {'sessions': Session.from_raw}
+    return None
+
+
+class StreamingObjectParser:
+    """Parser incremental do objeto JSON de topo que o CLI escreve com --json.
+
+    Os elementos das listas em `projections` (chave → função) são
+    descodificados um a um à medida que o stdout chega e guardados já
+    projetados; o texto lido é descartado. As outras chaves são valores
+    pequenos, descodificados inteiros. Um documento que não seja um objeto
+    fica em buffer e vai ao json.loads no fim.
+    """
+
+    def __init__(self, projections):
+        self.projections = projections
+        self.result = {}
+        self.parse_seconds = 0.0
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self._scan = json.JSONDecoder().raw_decode
+        self._buffer = ''
+        self._pos = 0
+        self._state = 'start'
+        self._key = None
+        self._items = None
+
+    def feed(self, chunk):
+        started = time.perf_counter()
+        self._buffer += self._decoder.decode(chunk)
+        self._parse(final=False)
+        self.parse_seconds += time.perf_counter() - started
+
+    def close(self):
+        """Resultado completo; ValueError se o JSON for inválido ou truncado"""
+        started = time.perf_counter()
+        self._buffer += self._decoder.decode(b'', final=True)
+        try:
+            if self._state == 'raw':
+                return json.loads(self._buffer)
+            self._parse(final=True)
+            if self._state != 'done':
+                raise ValueError("truncated JSON output")
+            return self.result
+        finally:
+            self.parse_seconds += time.perf_counter() - started
+
+    def _value(self, final):
+        """Descodifica o valor em _pos; _INCOMPLETE se ainda não chegou todo"""
+        try:
+            value, end = self._scan(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return _INCOMPLETE
+        if not final and isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Um número no fim do buffer pode continuar no próximo chunk; "5."
+            # ou "5.0e" descodificam como 5 e 5.0, mas o resto ainda vem aí
+            if end == len(self._buffer) or self._buffer[end] in JSON_NUMBER_TAIL:
+                return _INCOMPLETE
+        self._pos = end
+        return value
+
+    def _parse(self, final):
+        if self._state == 'raw':
+            return
+        buffer = self._buffer
+        while self._state != 'done':
+            self._pos = JSON_WHITESPACE.match(buffer, self._pos).end()
+            if self._pos >= len(buffer):
+                break
+            char, state = buffer[self._pos], self._state
+            if state == 'start':
+                if char != '{':
+                    self._state = 'raw'
+                    return
+                self._pos += 1
+                self._state = 'key'
+            elif state == 'key':
+                if char in ',}':
+                    self._pos += 1
+                    if char == '}':
+                        self._state = 'done'
+                    continue
+                key = self._value(final)
+                if key is _INCOMPLETE:
+                    break
+                self._key, self._state = key, 'colon'
+            elif state == 'colon':
+                if char != ':':
+                    raise ValueError(f"expected ':' at offset {self._pos}")
+                self._pos += 1
+                self._state = 'value'
+            elif state == 'value':
+                if char == '[' and self._key in self.projections:
+                    self._pos += 1
+                    self._items = self.result[self._key] = []
+                    self._state = 'items'
+                    continue
+                value = self._value(final)
+                if value is _INCOMPLETE:
+                    break
+                self.result[self._key] = value
+                self._state = 'key'
+            elif state == 'items':
+                if char in ',]':
+                    self._pos += 1
+                    if char == ']':
+                        self._state = 'key'
+                    continue
+                item = self._value(final)
+                if item is _INCOMPLETE:
+                    break
+                self._items.append(self.projections[self._key](item))
+        # Descarta o texto já consumido
+        self._buffer = buffer[self._pos:]
+        self._pos = 0
+
+
+def stream_cli_output(proc, ticket, parser):
+    """Lê stdout (para o parser) e stderr de um Popen em binário; devolve o stderr"""
+    stderr = bytearray()
+    last_check = time.monotonic()
+    with selectors.DefaultSelector() as selector:
+        selector.register(proc.stdout, selectors.EVENT_READ)
+        selector.register(proc.stderr, selectors.EVENT_READ)
+        while selector.get_map():
+            events = selector.select(CLI_CHECK_INTERVAL)
+            if not events or time.monotonic() - last_check >= CLI_CHECK_INTERVAL:
+                last_check = time.monotonic()
+                try:
+                    ticket.check()
+                except CliCancelled:
+                    proc.kill()
+                    proc.wait()
+                    raise
+            for key, _ in events:
+                chunk = os.read(key.fd, CLI_READ_SIZE)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                elif key.fileobj is proc.stdout:
+                    parser.feed(chunk)
+                else:
+                    stderr += chunk
+    proc.wait()
+    return stderr.decode(errors='replace')
+
+
+async def stream_cli_output_async(proc, parser):
+    async def pump_stdout():
+        while True:
+            chunk = await proc.stdout.read(CLI_READ_SIZE)
+            if not chunk:
+                return
+            parser.feed(chunk)
+
+    stderr, _ = await asyncio.gather(proc.stderr.read(), pump_stdout())
+    await proc.wait()
+    return None, stderr
+
+
+# ==================== BACKENDS ====================
+
+def fixture_name(args):
+    """Ficheiro de gravação de um argv: `cron list --json` → cron_list.json"""
+    return '_'.join(arg for arg in args if not arg.startswith('-')) + '.json'
+
+
+class Backend:
+    """Origem dos dados `openclaw <args> --json` servidos pelos handlers.
+
+    `run(args)` devolve {"ok": True, "result": ...} ou {"ok": False,
+    "error": ...}, com o mesmo formato do CLI. Latência e jitter (ms) podem
+    ser injetados para simular um CLI real em testes de carga.
+    """
+    name = None
+
+    def __init__(self, latency_ms=0, jitter_ms=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls = 0
+
+    def run(self, args):
+        raise NotImplementedError
+
+    def delay(self):
+        self.calls += 1
+        delay_ms = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def stats(self):
+        return {"backend": self.name, "calls": self.calls, "latencyMs": self.latency_ms, "jitterMs": self.jitter_ms}
+
+
+class CliBackend(Backend):
+    """Subprocesso `openclaw` (o comportamento de sempre).
+
+    Com `record_dir`, cada output com sucesso é guardado para o ReplayBackend.
+    Sem gravação, os outputs grandes (sessions list) são lidos em stream e
+    projetados em registos compactos sem nunca terem o texto inteiro em memória.
+    """
+    name = 'cli'
+
+    def __init__(self, record_dir=None, **kwargs):
+        super().__init__(**kwargs)
+        self.record_dir = record_dir
+
+    def run(self, args):
+        self.delay()
+        command = (('command', command_label(args)),)
+        ticket = CLI_SCHEDULER.ticket(command_label(args))
+        try:
+            CLI_SCHEDULER.acquire(ticket)
+        except CliCancelled as e:
+            if e.reason == 'deadline':
+                return {"ok": False, "error": "CLI command timed out (queued)"}
+            return {"ok": False, "error": "CLI command cancelled (client disconnected)"}
+        started = time.perf_counter()
+        projections = None if self.record_dir else streamed_projections(args)
+        parser = StreamingObjectParser(projections) if projections else None
+        try:
+            cmd = ['openclaw'] + args
+            loop = mission_core.ASYNCIO_LOOP
+            if loop is not None:
+                future = asyncio.run_coroutine_threadsafe(run_cli_async(cmd, ticket, parser), loop)
+                returncode, stdout, stderr = future.result()
+            else:
+                returncode, stdout, stderr = run_cli_sync(cmd, ticket, parser)
+            METRICS.observe('cli_duration_seconds', command, time.perf_counter() - started)
+            METRICS.inc('cli_exit_total', command + (('code', str(returncode)),))
+
+            if returncode != 0:
+                return {
+                    "ok": False,
+                    "error": f"CLI error (code {returncode})",
+                    "stderr": stderr[:500]
+                }
+
+            if parser is not None:
+                try:
+                    data = parser.close()
+                except ValueError as e:
+                    return {"ok": False, "error": f"Invalid JSON from CLI: {str(e)}", "raw": ''}
+                METRICS.observe('cli_parse_seconds', command, parser.parse_seconds)
+                return {"ok": True, "result": data}
+
+            # Parse JSON output
+            started = time.perf_counter()
+            try:
+                data = json.loads(stdout)
+            except json.JSONDecodeError as e:
+                return {
+                    "ok": False,
+                    "error": f"Invalid JSON from CLI: {str(e)}",
+                    "raw": stdout[:1000]
+                }
+            METRICS.observe('cli_parse_seconds', command, time.perf_counter() - started)
+            if self.record_dir and args[:2] != ['gateway', 'call']:
+                self.record(args, stdout)
+            return {"ok": True, "result": data}
+
+        except CliCancelled as e:
+            CLI_SCHEDULER.record_cancel(e.reason)
+            if e.reason == 'deadline':
+                METRICS.inc('cli_exit_total', command + (('code', 'timeout'),))
+                return {"ok": False, "error": "CLI command timed out"}
+            METRICS.inc('cli_exit_total', command + (('code', 'cancelled'),))
+            return {"ok": False, "error": "CLI command cancelled (client disconnected)"}
+        except FileNotFoundError:
+            METRICS.inc('cli_exit_total', command + (('code', 'not-found'),))
+            return {"ok": False, "error": "openclaw CLI not found. Is OpenClaw installed?"}
+        except Exception as e:
+            return {"ok": False, "error": f"Unexpected error: {str(e)}"}
+        finally:
+            CLI_SCHEDULER.release()
+
+    def record(self, args, stdout):
+        os.makedirs(self.record_dir, exist_ok=True)
+        path = os.path.join(self.record_dir, fixture_name(args))
+        with open(path + '.tmp', 'w') as f:
+            f.write(stdout)
+        os.replace(path + '.tmp', path)
+
+
+class ReplayBackend(Backend):
+    """Serve outputs `--json` gravados (ver CliBackend record_dir / --record).
+
+    Os ficheiros são lidos uma vez mas parseados a cada chamada, como o
+    stdout do CLI.
+    """
+    name = 'replay'
+
+    def __init__(self, directory, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        self._fixtures = {}
+
+    def run(self, args):
+        self.delay()
+        name = fixture_name(args)
+        raw = self._fixtures.get(name)
+        if raw is None:
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    raw = self._fixtures[name] = f.read()
+            except OSError:
+                return {"ok": False, "error": f"No recorded output for 'openclaw {' '.join(args)}' ({name})"}
+        try:
+            return {"ok": True, "result": json.loads(raw)}
+        except json.JSONDecodeError as e:
+            return {"ok": False, "error": f"Invalid JSON in {name}: {str(e)}"}
+
+
+class SyntheticBackend(Backend):
+    """Gera status, cron e sessões com o formato do CLI, em qualquer escala.
+
+    A cada `sessions list` uma fração `churn` das sessões é atualizada, para
+    que diffs, ETags e eventos SSE tenham trabalho realista.
+    """
+    name = 'synthetic'
+    CHANNELS = ('telegram', 'whatsapp', 'discord', 'webchat')
+    MODELS = ('kimi-k2.5:cloud', 'openai/gpt-5.1-codex', 'anthropic/claude-sonnet-4-5')
+
+    def __init__(self, sessions=50, jobs=10, agents=5, churn=0.05, seed=0, **kwargs):
+        super().__init__(**kwargs)
+        self.churn = churn
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        now = int(time.time() * 1000)
+        rnd = self._random
+        self.agents = [
+            {
+                "id": 'main' if i == 0 else f"agent-{i}",
+                "workspaceDir": os.path.expanduser(f"~/.openclaw/workspace-synthetic-{i}"),
+                "sessionsCount": 0,
+                "lastActiveAgeMs": rnd.randint(0, 3600000),
+                "bootstrapPending": False
+            }
+            for i in range(max(agents, 1))
+        ]
+        self.sessions = []
+        for i in range(sessions):
+            agent = self.agents[i % len(self.agents)]
+            agent['sessionsCount'] += 1
+            input_tokens = rnd.randint(100, 200000)
+            output_tokens = rnd.randint(50, 50000)
+            self.sessions.append({
+                "key": f"agent:{agent['id']}:{rnd.choice(self.CHANNELS)}:{100000 + i}",
+                "kind": 'direct' if i % 5 else 'group',
+                "sessionId": f"{i:08x}-synthetic",
+                "updatedAt": now - rnd.randint(0, 7 * 24 * 3600000),
+                "ageMs": 0,
+                "model": rnd.choice(self.MODELS),
+                "inputTokens": input_tokens,
+                "outputTokens": output_tokens,
+                "totalTokens": input_tokens + output_tokens,
+                "contextTokens": 256000,
+                "systemSent": True
+            })
+        self.jobs = [
+            {
+                "id": f"job-{i}",
+                "name": f"Synthetic job {i}",
+                "description": f"Job gerado #{i}",
+                "enabled": i % 4 != 3,
+                "agentId": self.agents[i % len(self.agents)]['id'],
+                "schedule": {"kind": 'every', "everyMs": 60000 * (1 + i % 30)},
+                "payload": {"kind": 'systemEvent', "text": f"synthetic tick {i}"}
+            }
+            for i in range(jobs)
+        ]
+
+    def run(self, args):
+        self.delay()
+        command = tuple(arg for arg in args if not arg.startswith('-'))
+        with self._lock:
+            if args[:2] == ['gateway', 'call'] and args[2:3] and args[2].startswith('cron.'):
+                data = self.cron_call(args[2], json.loads(args[args.index('--params') + 1]))
+                if data is None:
+                    return {"ok": False, "error": "CLI error (code 1)", "stderr": f"{args[2]}: unknown job"}
+            elif command == ('status',):
+                data = self.status()
+            elif command == ('cron', 'list'):
+                data = {"jobs": self.jobs}
+            elif command == ('sessions', 'list'):
+                data = self.sessions_list()
+            else:
+                return {"ok": False, "error": f"Synthetic backend does not support 'openclaw {' '.join(args)}'"}
+            # Serializar e parsear como o stdout do CLI (e sem partilhar o estado)
+            return {"ok": True, "result": json.loads(json.dumps(data))}
+
+    def cron_call(self, method, params):
+        """Escritas de cron como o gateway: None se o job não existe"""
+        if method == 'cron.add':
+            job = dict(params, id=f"job-{self._random.getrandbits(32):08x}")
+            self.jobs.append(job)
+            return job
+        job = next((job for job in self.jobs if job['id'] == params.get('jobId')), None)
+        if job is None:
+            return None
+        if method == 'cron.remove':
+            self.jobs.remove(job)
+            return {"removed": True}
+        if method == 'cron.update':
+            job.update(params.get('patch') or {})
+            return job
+        return None
+
+    def status(self):
+        return {
+            "gateway": {"url": 'ws://127.0.0.1:18789', "reachable": True, "connectLatencyMs": 1, "mode": 'local'},
+            "gatewayService": {"runtimeShort": f"running (pid {os.getpid()})"},
+            "sessions": {"defaults": {"model": self.MODELS[0]}, "count": len(self.sessions)},
+            "agents": {"agents": self.agents, "totalSessions": len(self.sessions), "defaultId": 'main'}
+        }
+
+    def sessions_list(self):
+        now = int(time.time() * 1000)
+        if self.sessions and self.churn:
+            for session in self._random.sample(self.sessions, max(1, int(len(self.sessions) * self.churn))):
+                added = self._random.randint(10, 5000)
+                session['updatedAt'] = now
+                session['inputTokens'] += added
+                session['totalTokens'] += added
+        for session in self.sessions:
+            session['ageMs'] = now - session['updatedAt']
+        return {"sessions": self.sessions, "count": len(self.sessions), "path": '(synthetic)'}
+
+
+BACKENDS = {'cli': CliBackend, 'replay': ReplayBackend, 'synthetic': SyntheticBackend}
+BACKEND = CliBackend()
+
+
+# ==================== GATEWAY CLIENT ====================
+
+# argv do CLI → método equivalente no gateway
+GATEWAY_METHODS = {
+    ('status', '--json'): 'status',
+    ('cron', 'list', '--json'): 'cron.list',
+    ('sessions', 'list', '--json'): 'sessions.list',
+}
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class GatewayError(Exception):
+    """Falha do gateway (ligação, timeout ou resposta de erro)"""
+
+
+def encode_ws_frame(opcode, payload):
+    """Frame WebSocket de cliente (FIN, com máscara)"""
+    header = bytearray([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header.append(0x80 | length)
+    elif length < 65536:
+        header.append(0x80 | 126)
+        header += length.to_bytes(2, 'big')
+    else:
+        header.append(0x80 | 127)
+        header += length.to_bytes(8, 'big')
+    mask = os.urandom(4)
+    header += mask
+    if length:
+        # XOR da máscara de uma vez, sem ciclo byte a byte
+        key = (mask * (length // 4 + 1))[:length]
+        payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+    return bytes(header) + payload
+
+
+def read_ws_frame(rfile):
+    """Lê um frame do servidor; devolve (fin, opcode, payload)"""
+    head = rfile.read(2)
+    if len(head) < 2:
+        raise GatewayError("gateway closed the connection")
+    fin, opcode = head[0] & 0x80, head[0] & 0x0F
+    length = head[1] & 0x7F
+    if length == 126:
+        length = int.from_bytes(rfile.read(2), 'big')
+    elif length == 127:
+        length = int.from_bytes(rfile.read(8), 'big')
+    mask = rfile.read(4) if head[1] & 0x80 else None
+    payload = rfile.read(length)
+    if len(payload) < length:
+        raise GatewayError("gateway closed the connection")
+    if mask:
+        key = (mask * (length // 4 + 1))[:length]
+        payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+    return fin, opcode, payload
+
+
+def open_websocket(url, timeout):
+    """Handshake WebSocket (ws:// ou wss://); devolve (socket, rfile)"""
+    parsed = urlparse(url)
+    secure = parsed.scheme == 'wss'
+    host = parsed.hostname or '127.0.0.1'
+    port = parsed.port or (443 if secure else 80)
+    sock = socket.create_connection((host, port), timeout=timeout)
+    try:
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        key = base64.b64encode(os.urandom(16)).decode()
+        sock.sendall((
+            f"GET {parsed.path or '/'} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode())
+        rfile = sock.makefile('rb')
+        status = rfile.readline().decode('latin-1')
+        headers = {}
+        while True:
+            line = rfile.readline().decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        expected = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        if ' 101 ' not in status or headers.get('sec-websocket-accept') != expected:
+            raise GatewayError(f"WebSocket handshake failed: {status.strip() or 'no response'}")
+        sock.settimeout(None)
+        return sock, rfile
+    except BaseException:
+        sock.close()
+        raise
+
+
+class GatewayClient:
+    """Ligação WebSocket persistente ao gateway OpenClaw.
+
+    Os pedidos seguem o protocolo de frames JSON do gateway
+    ({"type":"req","id","method","params"} → {"type":"res","id","ok","payload"})
+    e são multiplexados na mesma ligação; uma thread lê as respostas. Se a
+    ligação cair, o próximo pedido volta a ligar (no máximo uma tentativa a
+    cada `retry_delay` segundos).
+    """
+
+    def __init__(self, url, token=None, timeout=GATEWAY_TIMEOUT, retry_delay=GATEWAY_RETRY_DELAY):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.calls = 0
+        self.failures = 0
+        self.connects = 0
+        self.last_latency_ms = None
+        self._lock = threading.Lock()        # ligação e pedidos pendentes
+        self._send_lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._sock = None
+        self._pending = {}  # id → [Event, resposta]
+        self._next_id = 0
+        self._retry_at = 0
+
+    def call(self, method, params=None):
+        """Executa um método no gateway e devolve o payload"""
+        sock = self._connection()
+        self.calls += 1
+        try:
+            return self._request(sock, method, params)
+        except GatewayError:
+            self.failures += 1
+            raise
+
+    def fetch(self, args):
+        """Equivalente ao `openclaw <args>` via gateway; None se não houver método"""
+        method = GATEWAY_METHODS.get(tuple(args))
+        if method is None:
+            return None
+        started = time.monotonic()
+        data = self.call(method)
+        elapsed = time.monotonic() - started
+        self.last_latency_ms = round(elapsed * 1000)
+        METRICS.observe('gateway_call_seconds', (('method', method),), elapsed)
+        if method == 'status' and isinstance(data, dict):
+            # O CLI junta a sonda ao gateway; aqui a sonda é a própria ligação
+            data.setdefault('gateway', {
+                "url": self.url,
+                "reachable": True,
+                "connectLatencyMs": self.last_latency_ms,
+                "mode": 'local'
+            })
+            data.setdefault('gatewayService', {"runtimeShort": 'running'})
+        return data
+
+    def _connection(self):
+        # Um só handshake de cada vez; a ligação só fica visível depois do connect
+        with self._connect_lock:
+            with self._lock:
+                if self._sock is not None:
+                    return self._sock
+                if time.monotonic() < self._retry_at:
+                    raise GatewayError("gateway unavailable")
+            sock = None
+            try:
+                sock, rfile = open_websocket(self.url, self.timeout)
+                threading.Thread(target=self._read_loop, args=(sock, rfile), name='gateway-reader', daemon=True).start()
+                self._request(sock, 'connect', {
+                    "client": {"id": 'mission-control-bridge', "mode": 'backend', "platform": sys.platform},
+                    "auth": {"token": self.token} if self.token else {}
+                })
+            except (OSError, GatewayError) as e:
+                if sock is not None:
+                    self._drop(sock)
+                self._retry_at = time.monotonic() + self.retry_delay
+                raise GatewayError(f"cannot connect to gateway: {e}") from e
+            with self._lock:
+                self._sock = sock
+                self.connects += 1
+            return sock
+
+    def _request(self, sock, method, params):
+        with self._lock:
+            self._next_id += 1
+            request_id = str(self._next_id)
+            waiter = self._pending[request_id] = [threading.Event(), None]
+        frame = json.dumps({"type": 'req', "id": request_id, "method": method, "params": params or {}})
+        try:
+            with self._send_lock:
+                sock.sendall(encode_ws_frame(0x1, frame.encode()))
+            if not waiter[0].wait(self.timeout):
+                raise GatewayError(f"gateway timed out on '{method}'")
+        except OSError as e:
+            self._drop(sock)
+            raise GatewayError(f"gateway connection lost: {e}") from e
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+
+        response = waiter[1]
+        if response is None:
+            raise GatewayError("gateway connection lost")
+        if not response.get('ok'):
+            error = response.get('error') or {}
+            raise GatewayError(error.get('message', str(error)) if isinstance(error, dict) else str(error))
+        return response.get('payload')
+
+    def _read_loop(self, sock, rfile):
+        message, message_opcode = b'', None
+        try:
+            while True:
+                fin, opcode, payload = read_ws_frame(rfile)
+                if opcode == 0x9:
+                    with self._send_lock:
+                        sock.sendall(encode_ws_frame(0xA, payload))
+                    continue
+                if opcode == 0x8:
+                    break
+                if opcode in (0x1, 0x2):
+                    message, message_opcode = payload, opcode
+                elif opcode == 0x0:
+                    message += payload
+                else:
+                    continue
+                if not fin or message_opcode != 0x1:
+                    continue
+                try:
+                    frame = json.loads(message)
+                except ValueError:
+                    continue
+                # Eventos (type "event") não são usados: o estado vem dos pedidos
+                if isinstance(frame, dict) and frame.get('type') == 'res':
+                    with self._lock:
+                        waiter = self._pending.get(str(frame.get('id')))
+                    if waiter:
+                        waiter[1] = frame
+                        waiter[0].set()
+        except (OSError, GatewayError):
+            pass
+        finally:
+            self._drop(sock)
+
+    def _drop(self, sock):
+        """Fecha a ligação e acorda os pedidos pendentes (falham e caem no CLI)"""
+        with self._lock:
+            if self._sock is sock:
+                self._sock = None
+            pending = list(self._pending.values())
+        try:
+            sock.close()
+        except OSError:
+            pass
+        for waiter in pending:
+            waiter[0].set()
+
+    def stats(self):
+        with self._lock:
+            connected = self._sock is not None
+        return {
+            "url": self.url,
+            "connected": connected,
+            "connects": self.connects,
+            "calls": self.calls,
+            "failures": self.failures,
+            "lastLatencyMs": self.last_latency_ms
+        }
+
+
+GATEWAY = None  # GatewayClient, ativado com --gateway
+
+
+# ==================== MODELS ====================
+
+# Os resultados do CLI/gateway são normalizados uma vez, ao entrarem na
+# cache (normalize_snapshot); endpoints, índices, eventos e histórico
+# partilham os mesmos registos em vez de remodelarem dicts a cada pedido.
+
+class Record:
+    """Base dos registos compactos (__slots__, sem __dict__ por instância).
+
+    Leitura ao estilo dict (get, [], keys, items) para o código que lê
+    resultados normalizados (índices, diffs, fleet) funcionar igual, e
+    serialização pelo `default` dos encoders JSON. Campos em OPTIONAL a
+    None ficam de fora, como chaves ausentes.
+    """
+    __slots__ = ()
+    OPTIONAL = ()
+
+    def get(self, name, default=None):
+        if name not in self.__slots__:
+            return default
+        value = getattr(self, name)
+        return default if value is None and name in self.OPTIONAL else value
+
+    def __getitem__(self, name):
+        if name not in self.__slots__ or (name in self.OPTIONAL and getattr(self, name) is None):
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name):
+        return name in self.to_dict()
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        for name in self.OPTIONAL:
+            if data[name] is None:
+                del data[name]
+        return data
+
+
+def encode_record(obj):
+    """`default` dos encoders: um Record vira dict só durante a escrita"""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def intern_value(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Session(Record):
+    """Sessão normalizada (os campos de /api/v1/sessions/list)"""
+    __slots__ = ('key', 'kind', 'agentId', 'channel', 'sessionId', 'updatedAt', 'ageMs', 'model',
+                 'inputTokens', 'outputTokens', 'totalTokens', 'contextTokens', 'systemSent')
+
+    @classmethod
+    def from_raw(cls, raw):
+        """Projeta uma sessão do CLI/gateway, lendo a chave `agent:<id>:<canal>:…` uma vez"""
+        session = cls()
+        key = raw.get('key', '')
+        parts = key.split(':', 3)
+        session.key = key
+        # Valores repetidos em milhares de sessões partilham a mesma string
+        session.kind = intern_value(raw.get('kind', 'direct'))
+        session.agentId = sys.intern(parts[1]) if len(parts) > 1 else 'main'
+        session.channel = sys.intern(parts[2]) if len(parts) > 2 else 'main'
+        session.sessionId = raw.get('sessionId', '')
+        session.updatedAt = raw.get('updatedAt', 0)
+        session.ageMs = raw.get('ageMs', 0)
+        session.model = intern_value(raw.get('model', 'unknown'))
+        session.inputTokens = raw.get('inputTokens', 0)
+        session.outputTokens = raw.get('outputTokens', 0)
+        session.totalTokens = raw.get('totalTokens', 0)
+        session.contextTokens = raw.get('contextTokens', 0)
+        session.systemSent = raw.get('systemSent', False)
+        return session
+
+
+class CronJob(Record):
+    """Cron job normalizado (os campos de /api/v1/cron/list)"""
+    __slots__ = ('id', 'name', 'description', 'enabled', 'schedule', 'payload')
+
+    @classmethod
+    def from_raw(cls, raw, index):
+        job = cls()
+        job.id = raw.get('id', f"job-{index}")
+        job.name = raw.get('name', raw.get('id', f"Job {index}"))
+        job.description = raw.get('description', '')
+        job.enabled = raw.get('enabled', True)
+        job.schedule = raw.get('schedule', {})
+        job.payload = raw.get('payload', {})
+        return job
+
+
+class Agent(Record):
+    """Agente configurado; a identidade (SOUL.md/IDENTITY.md) é juntada ao servir"""
+    __slots__ = ('id', 'workspaceDir', 'sessionsCount', 'lastActiveAgeMs', 'bootstrapPending',
+                 'name', 'emoji', 'type', 'description')
+    OPTIONAL = ('name', 'emoji', 'type', 'description')
+
+    @classmethod
+    def from_raw(cls, raw):
+        agent = cls()
+        agent.id = raw.get('id', 'main')
+        agent.workspaceDir = raw.get('workspaceDir', os.path.expanduser('~/.openclaw/workspace'))
+        agent.sessionsCount = raw.get('sessionsCount', 0)
+        agent.lastActiveAgeMs = raw.get('lastActiveAgeMs', 0)
+        agent.bootstrapPending = raw.get('bootstrapPending', False)
+        agent.name = agent.emoji = agent.type = agent.description = None
+        return agent
+
+    def with_identity(self, identity):
+        """Cópia com nome/emoji/tipo/descrição (o registo da cache não muda)"""
+        agent = Agent()
+        for name in self.__slots__:
+            setattr(agent, name, identity.get(name) if name in self.OPTIONAL else getattr(self, name))
+        return agent
+
+
+RUNTIME_PID = re.compile(r'running \(pid ([^)]*)\)')
+
+
+class GatewayStatus(Record):
+    """Estado do gateway (os campos de /api/v1/gateway/status)"""
+    __slots__ = ('running', 'url', 'reachable', 'connectLatencyMs', 'version', 'model', 'pid', 'mode')
+
+    @classmethod
+    def from_status(cls, result):
+        gateway = result.get('gateway', {})
+        runtime = result.get('gatewayService', {}).get('runtimeShort', '')
+        pid = RUNTIME_PID.search(runtime)
+        status = cls()
+        status.running = gateway.get('reachable', False) and 'running' in runtime
+        status.url = gateway.get('url', 'ws://127.0.0.1:18789')
+        status.reachable = gateway.get('reachable', False)
+        status.connectLatencyMs = gateway.get('connectLatencyMs', 0)
+        status.version = "v2026.2.13"  # Versão atual
+        status.model = result.get('sessions', {}).get('defaults', {}).get('model', 'kimi-k2.5:cloud')
+        status.pid = pid.group(1) if pid else None
+        status.mode = gateway.get('mode', 'local')
+        return status
+
+
+class StatusSnapshot(dict):
+    """Resultado de `openclaw status` tal como veio (servido em /api/v1/status)
+    mais os modelos do gateway e dos agentes, construídos uma vez"""
+    __slots__ = ('gateway', 'agents')
+
+
+def normalize_status(result):
+    snapshot = StatusSnapshot(result)
+    snapshot.gateway = GatewayStatus.from_status(result)
+    snapshot.agents = [Agent.from_raw(agent) for agent in result.get('agents', {}).get('agents', [])]
+    return snapshot
+
+
+def normalize_cron(result):
+    jobs = result.get('jobs', [])
+    if all(type(job) is CronJob for job in jobs):
+        return result
+    return dict(result, jobs=[CronJob.from_raw(job, i) for i, job in enumerate(jobs)])
+
+
+def normalize_sessions(result):
+    sessions = result.get('sessions', [])
+    if all(type(s) is Session for s in sessions):
+        return result  # Já projetadas em stream pelo CliBackend
+    return dict(result, sessions=[s if type(s) is Session else Session.from_raw(s) for s in sessions])
+
+
+NORMALIZERS = {'status': normalize_status, 'cron list': normalize_cron, 'sessions list': normalize_sessions}
+
+
+def normalize_snapshot(args, data):
+    """Resultado {"ok", "result"} de um comando → o mesmo com os modelos"""
+    normalizer = NORMALIZERS.get(command_label(args))
+    if normalizer is None or not data.get('ok') or not isinstance(data.get('result'), dict):
+        return data
+    return dict(data, result=normalizer(data['result']))
+
+
+def status_models(result):
+    """(GatewayStatus, [Agent]) de um resultado de status, normalizado ou não"""
+    if not isinstance(result, StatusSnapshot):
+        result = normalize_status(result)
+    return result.gateway, result.agents
+
+
+# ==================== RESPONSE ENCODING ====================
+
+COMPACT_ENCODER = json.JSONEncoder(separators=(',', ':'), default=encode_record)
+PRETTY_ENCODER = json.JSONEncoder(indent=2, default=encode_record)
+# Por ordem de preferência quando o cliente aceita várias com o mesmo q
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def encode_json(data, pretty=False):
+    """JSON compacto (ou indentado para humanos) já em bytes"""
+    return (PRETTY_ENCODER if pretty else COMPACT_ENCODER).encode(data).encode()
+
+
+def choose_encoding(accept_encoding):
+    """Escolhe br/gzip a partir do Accept-Encoding; None → identity"""
+    weights = accept_encoding_weights(accept_encoding)
+    best, best_weight = None, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=4)
+    # wbits=31 → contentor gzip
+    return zlib.compress(body, 6, wbits=31)
+
+
+# ==================== AGENT IDENTITY ====================
+
+IDENTITY_FIELDS = (('Name:', 'name'), ('Emoji:', 'emoji'), ('Creature:', 'creature'), ('Type:', 'type'))
+
+
+def parse_identity(content):
+    """Campos "Chave: valor" de um IDENTITY.md/SOUL.md, numa só passagem.
+
+    Fica a primeira ocorrência de cada chave; Creature tem prioridade sobre
+    Type. No SOUL.md o título "# SOUL.md - Nome" serve de nome e a primeira
+    linha de texto de descrição.
+    """
+    fields = {}
+    for line in content.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith('#'):
+            title = stripped.lstrip('#').strip()
+            if ' - ' in title and 'title' not in fields:
+                fields['title'] = title.split(' - ', 1)[1].strip()
+            continue
+        for key, field in IDENTITY_FIELDS:
+            if field not in fields and key in line:
+                fields[field] = line.split(key, 1)[1].strip(' \t*_')
+        if 'description' not in fields and ':' not in stripped:
+            fields['description'] = stripped.lstrip('-* ').strip()
+
+    if 'creature' in fields:
+        fields['type'] = fields.pop('creature')
+    return fields
+
+
+class _IdentityEntry:
+    __slots__ = ('checked', 'mtime_ns', 'size', 'fields')
+
+    def __init__(self, checked, mtime_ns, size, fields):
+        self.checked = checked
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.fields = fields
+
+
+class IdentityIndex:
+    """Índice dos ficheiros de identidade dos agentes, por caminho.
+
+    Cada ficheiro é relido só quando o (mtime, tamanho) muda, e o stat() em
+    si é feito no máximo uma vez por check_interval; em regime estável listar
+    agentes não lê nada do disco.
+    """
+
+    def __init__(self, check_interval=IDENTITY_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.reads = 0
+        self.stats_calls = 0
+        self.generation = 0  # Sobe sempre que um ficheiro muda (invalida ETags de /agents)
+        self._lock = threading.Lock()
+        self._entries = {}  # caminho → _IdentityEntry (fields None se não existir)
+
+    def get(self, path):
+        """Campos do ficheiro (dict vazio se não existir ou não for legível)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and now - entry.checked < self.check_interval:
+                return entry.fields or {}
+
+        self.stats_calls += 1
+        try:
+            stat = os.stat(path)
+            mtime_ns, size = stat.st_mtime_ns, stat.st_size
+        except OSError:
+            mtime_ns = size = None
+
+        if entry and entry.mtime_ns == mtime_ns and entry.size == size:
+            entry.checked = now
+            return entry.fields or {}
+
+        fields = None
+        if mtime_ns is not None:
+            try:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    fields = parse_identity(f.read())
+                self.reads += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._entries[path] = _IdentityEntry(now, mtime_ns, size, fields)
+            self.generation += 1
+        return fields or {}
+
+    def agent_identity(self, workspace_dir):
+        """Nome, emoji, tipo e descrição de um agente; IDENTITY.md manda sobre SOUL.md"""
+        soul = self.get(os.path.join(workspace_dir, 'SOUL.md'))
+        identity = self.get(os.path.join(workspace_dir, 'IDENTITY.md'))
+        info = {}
+        for field in ('name', 'emoji', 'type'):
+            value = identity.get(field) or soul.get(field)
+            if value:
+                info[field] = value
+        if 'name' not in info and soul.get('title'):
+            info['name'] = soul['title']
+        if soul.get('description'):
+            info['description'] = soul['description']
+        return info
+
+    def stats(self):
+        with self._lock:
+            files = len(self._entries)
+        return {"files": files, "reads": self.reads, "stats": self.stats_calls}
+
+
+IDENTITY_INDEX = IdentityIndex()
+
+
+# ==================== FORMATTERS ====================
+
+def format_gateway_status(full_status, freshness):
+    """Status específico do gateway"""
+    if not full_status.get('ok'):
+        return full_status
+
+    gateway, _ = status_models(full_status.get('result', {}))
+    return {"ok": True, "result": gateway, **freshness}
+
+
+def format_cron_list(data, freshness):
+    """Lista de cron jobs"""
+    if not data.get('ok'):
+        return data
+
+    # Formata para o formato esperado pelo Mission Control
+    jobs = normalize_cron(data.get('result', {})).get('jobs', [])
+    formatted = {
+        "ok": True,
+        "result": {
+            "jobs": jobs,
+            "total": len(jobs),
+            "enabled": sum(1 for job in jobs if job.enabled)
+        },
+        **freshness
+    }
+    return formatted
+
+
+def format_sessions_list(data, freshness):
+    """Lista de sessões ativas"""
+    if not data.get('ok'):
+        return data
+
+    result = normalize_sessions(data.get('result', {}))
+    sessions = result.get('sessions', [])
+
+    formatted = {
+        "ok": True,
+        "result": {
+            "sessions": sessions,
+            "count": result.get('count', len(sessions)),
+            "path": result.get('path', '')
+        },
+        **freshness
+    }
+    return formatted
+
+
+def format_agents_list(full_status, freshness):
+    """Lista de agentes configurados"""
+    if not full_status.get('ok'):
+        return full_status
+
+    result = full_status.get('result', {})
+    agents_data = result.get('agents', {})
+    _, agents = status_models(result)
+
+    formatted = {
+        "ok": True,
+        "result": {
+            # Nome, emoji e tipo do IDENTITY.md/SOUL.md (índice em memória)
+            "agents": [agent.with_identity(IDENTITY_INDEX.agent_identity(agent.workspaceDir)) for agent in agents],
+            "totalSessions": agents_data.get('totalSessions', 0),
+            "defaultId": agents_data.get('defaultId', 'main')
+        },
+        **freshness
+    }
+    return formatted
+
+
+# ==================== INCREMENTAL SESSIONS ====================
+
+ETAG_CACHE_SIZE = 256  # URLs (com query) cuja ETag fica em memória
+
+
+def _etag_view(value):
+    """O resultado sem VOLATILE_FIELDS (ageMs, connectLatencyMs) a qualquer profundidade"""
+    if isinstance(value, (dict, Record)):
+        return {k: _etag_view(v) for k, v in value.items() if k not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_etag_view(v) for v in value]
+    return value
+
+
+def compute_etag(result):
+    """ETag fraca a partir do resultado normalizado.
+
+    Os campos voláteis ficam de fora (como nos diffs SSE): um refresh que só
+    muda idades ou latências continua a dar 304. Por isso (e por a mesma
+    ETag servir a resposta gzip e a identity) o validador é fraco, W/"…".
+    """
+    digest = hashlib.sha1(json.dumps(_etag_view(result), separators=(',', ':')).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Comparação fraca do If-None-Match: o prefixo W/ não conta"""
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque for tag in if_none_match.split(','))
+
+
+class EtagCache:
+    """ETag já calculada por URL, válida enquanto o snapshot (asOf) e os
+    ficheiros de identidade não mudam.
+
+    Evita refazer o _etag_view e o json.dumps do resultado inteiro em cada
+    pedido; um poll que acaba em 304 fica O(1).
+    """
+
+    def __init__(self, size=ETAG_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # URL → ((asOf, geração da identidade), etag)
+
+    def get(self, url, payload):
+        as_of = payload.get('asOf')
+        if as_of is None:
+            return compute_etag(payload['result'])
+        version = (as_of, IDENTITY_INDEX.generation)
+        with self._lock:
+            cached = self._entries.get(url)
+            if cached and cached[0] == version:
+                self._entries.move_to_end(url)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        etag = compute_etag(payload['result'])
+        with self._lock:
+            self._entries[url] = (version, etag)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return etag
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+
+ETAG_CACHE = EtagCache()
+
+
+class SessionChangeLog:
+    """Regista as sessões que aparecem e desaparecem entre snapshots, para ?since=.
+
+    `horizon` é o instante (epoch ms) a partir do qual o registo está
+    completo; um `since` anterior obriga o cliente a recomeçar da lista
+    completa.
+    """
+
+    def __init__(self, retention=TOMBSTONE_RETENTION):
+        self.retention = retention
+        self.horizon = None
+        self._lock = threading.Lock()
+        self._source = None  # Último resultado CLI observado
+        self._keys = set()
+        self._added = {}  # key → addedAt (epoch ms)
+        self._removed = {}  # key → removedAt (epoch ms)
+
+    def observe(self, data, sessions, as_of=None):
+        with self._lock:
+            if data is self._source:
+                return
+            now = as_of or int(time.time() * 1000)
+            keys = {s['key'] for s in sessions}
+            if self._source is None:
+                self.horizon = now
+            else:
+                for key in keys - self._keys:
+                    self._added[key] = now
+                    self._removed.pop(key, None)
+                for key in self._keys - keys:
+                    self._removed[key] = now
+                    self._added.pop(key, None)
+            cutoff = now - self.retention
+            for log in (self._added, self._removed):
+                expired = [key for key, at in log.items() if at < cutoff]
+                for key in expired:
+                    del log[key]
+                if expired:
+                    self.horizon = max(self.horizon, cutoff)
+            self._source, self._keys = data, keys
+
+    def since(self, since):
+        """(chaves adicionadas, tombstones) depois de `since`; None se o
+        registo não chega lá"""
+        with self._lock:
+            if self.horizon is None or since < self.horizon:
+                return None
+            added = {key for key, added_at in self._added.items() if added_at > since}
+            removed = [{"key": key, "removedAt": removed_at}
+                       for key, removed_at in self._removed.items() if removed_at > since]
+            return added, removed
+
+
+SESSION_CHANGES = SessionChangeLog()
+
+
+def select_sessions_since(payload, since, changes):
+    """Reduz uma lista de sessões às alteradas depois de `since`.
+
+    Devolve as sessões novas ou com `updatedAt` posterior, as removidas
+    (tombstones)
+    e um `cursor` (instante do snapshot) a usar no próximo pedido. Com
+    `reset: true` a lista é a completa e o cliente deve substituir o seu
+    estado.
+    """
+    result = payload['result']
+    sessions = result['sessions']
+    log = changes.since(since)
+    reset = log is None
+    if reset:
+        changed, removed = sessions, []
+    else:
+        added, removed = log
+        changed = [s for s in sessions if (s['updatedAt'] or 0) > since or s['key'] in added]
+    cursor = payload.get('asOf') or int(time.time() * 1000)
+    incremental = {k: v for k, v in result.items() if k != 'sessions'}
+    incremental.update(sessions=changed, removed=removed, since=since, cursor=cursor, reset=reset)
+    return dict(payload, result=incremental)
+
+
+# ==================== LIST QUERIES ====================
+
+# Secção → campo da lista, chave única, filtros por igualdade, ordenações (campo → valor por omissão)
+LIST_SPECS = {
+    'sessions': {
+        'items': 'sessions',
+        'key': 'key',
+        'filters': ('agentId', 'channel', 'model', 'kind'),
+        'sorts': {'updatedAt': 0, 'totalTokens': 0, 'inputTokens': 0, 'outputTokens': 0, 'contextTokens': 0, 'key': ''},
+    },
+    'cron': {
+        'items': 'jobs',
+        'key': 'id',
+        'filters': ('enabled',),
+        'booleans': ('enabled',),
+        'sorts': {'name': '', 'id': ''},
+    },
+}
+BOOLEAN_VALUES = {'1': 'true', 'true': 'true', '0': 'false', 'false': 'false'}  # Como ?pretty=
+AGE_PARAMS = ('maxAgeMs', 'minAgeMs')  # Só sessões: filtro por idade via updatedAt
+PAGING_PARAMS = ('limit', 'cursor', 'sort')
+MAX_PAGE_SIZE = 1000
+
+
+class ListIndex:
+    """Índices de uma lista formatada (sessões ou cron jobs) de um snapshot.
+
+    Construído uma vez por snapshot: por cada filtro, valor → posições; por
+    cada ordenação, lista ascendente de (valor, chave, posição) onde os
+    cursores e os intervalos de idade se resolvem com bisect. Cada pedido
+    percorre só a página que devolve.
+    """
+
+    def __init__(self, items, spec):
+        self.items = items
+        self.filters = {field: {} for field in spec['filters']}
+        for pos, item in enumerate(items):
+            for field, values in self.filters.items():
+                values.setdefault(str(item.get(field)).lower(), set()).add(pos)
+        key_field = spec['key']
+        # Ordem original do CLI como ordenação por omissão
+        self.orders = {None: [(pos, str(item.get(key_field, '')), pos) for pos, item in enumerate(items)]}
+        for field, default in spec['sorts'].items():
+            self.orders[field] = sorted(
+                (item.get(field) if item.get(field) is not None else default, str(item.get(key_field, '')), pos)
+                for pos, item in enumerate(items)
+            )
+        self._ranks = {}
+
+    def rank(self, field):
+        """posição → índice na ordenação (para ordenar subconjuntos pequenos)"""
+        ranks = self._ranks.get(field)
+        if ranks is None:
+            ranks = [0] * len(self.items)
+            for index, entry in enumerate(self.orders[field]):
+                ranks[entry[2]] = index
+            self._ranks[field] = ranks
+        return ranks
+
+    def page(self, filters=None, ranges=None, sort=None, descending=False, after=None, limit=None):
+        """Devolve (itens, total de correspondências, último (valor, chave) ou None)"""
+        candidates = None
+        for field, wanted in (filters or {}).items():
+            index = self.filters[field]
+            matched = set().union(*(index.get(value, ()) for value in wanted))
+            candidates = matched if candidates is None else candidates & matched
+        for field, (low, high) in (ranges or {}).items():
+            order = self.orders[field]
+            start = bisect.bisect_left(order, (low,)) if low is not None else 0
+            end = bisect.bisect_right(order, (high, '￿')) if high is not None else len(order)
+            matched = {entry[2] for entry in order[start:end]}
+            candidates = matched if candidates is None else candidates & matched
+
+        order = self.orders[sort]
+        total = len(order) if candidates is None else len(candidates)
+        limit = total if limit is None else limit
+        if after is None:
+            start = len(order) - 1 if descending else 0
+        elif descending:
+            start = bisect.bisect_left(order, tuple(after)) - 1
+        else:
+            start = bisect.bisect_right(order, (after[0], after[1], float('inf')))
+
+        if candidates is not None and len(candidates) * 8 < len(order):
+            # Poucos resultados: ordenar só esses em vez de percorrer a ordenação
+            ranks = self.rank(sort)
+            selected = sorted(
+                (ranks[pos] for pos in candidates if (ranks[pos] <= start if descending else ranks[pos] >= start)),
+                reverse=descending
+            )[:limit + 1]
+        else:
+            selected = []
+            step = -1 if descending else 1
+            index = start
+            while 0 <= index < len(order) and len(selected) <= limit:
+                if candidates is None or order[index][2] in candidates:
+                    selected.append(index)
+                index += step
+
+        more = len(selected) > limit
+        selected = selected[:limit]
+        items = [self.items[order[index][2]] for index in selected]
+        last = order[selected[-1]][:2] if more and selected else None
+        return items, total, last
+
+
+def encode_list_cursor(last):
+    return base64.urlsafe_b64encode(json.dumps(list(last), separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_list_cursor(cursor, default):
+    """Cursor → [valor, chave]; o valor tem de ser do tipo da ordenação
+    (`default`: 0 numérica, '' texto) para o bisect poder compará-lo"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    value = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(value, list) or len(value) != 2 or not isinstance(value[1], str):
+        raise ValueError("malformed cursor")
+    if isinstance(default, str):
+        valid = isinstance(value[0], str)
+    else:
+        valid = isinstance(value[0], (int, float)) and not isinstance(value[0], bool)
+    if not valid:
+        raise ValueError("cursor does not match the sort")
+    return value
+
+
+def wants_list_query(section, query):
+    params = PAGING_PARAMS + LIST_SPECS[section]['filters'] + (AGE_PARAMS if section == 'sessions' else ())
+    return any(param in query for param in params)
+
+
+def parse_int_param(query, name, error):
+    """Inteiro da query string (None se ausente); ValueError(`error`) se não for"""
+    value = query.get(name, [None])[0]
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(error) from None
+
+
+def parse_list_query(section, query):
+    """Query string → argumentos de ListIndex.page; ValueError se inválida"""
+    spec = LIST_SPECS[section]
+    filters = {
+        field: [value.lower() for value in ','.join(query[field]).split(',') if value]
+        for field in spec['filters'] if field in query
+    }
+    for field in spec.get('booleans', ()):
+        if field in filters:
+            if any(value not in BOOLEAN_VALUES for value in filters[field]):
+                raise ValueError(f"Invalid '{field}' (expected true/false or 1/0)")
+            filters[field] = [BOOLEAN_VALUES[value] for value in filters[field]]
+
+    ranges = {}
+    if section == 'sessions' and any(param in query for param in AGE_PARAMS):
+        now = int(time.time() * 1000)
+        max_age = parse_int_param(query, 'maxAgeMs', "Invalid 'maxAgeMs' (expected ms)")
+        min_age = parse_int_param(query, 'minAgeMs', "Invalid 'minAgeMs' (expected ms)")
+        ranges['updatedAt'] = (
+            now - max_age if max_age is not None else None,
+            now - min_age if min_age is not None else None
+        )
+
+    sort = query.get('sort', [None])[0]
+    descending = False
+    if sort:
+        descending = sort.startswith('-')
+        sort = sort.lstrip('-+')
+        if sort == 'ageMs' and section == 'sessions':
+            # Mais recente primeiro = menor idade primeiro
+            sort, descending = 'updatedAt', not descending
+        if sort not in spec['sorts']:
+            raise ValueError(f"Invalid sort '{sort}' (expected one of: {', '.join(spec['sorts'])})")
+    else:
+        sort = None
+
+    limit = parse_int_param(query, 'limit', f"Invalid limit (1-{MAX_PAGE_SIZE})")
+    if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"Invalid limit (1-{MAX_PAGE_SIZE})")
+
+    cursor = query.get('cursor', [None])[0]
+    # Sem sort a ordem é a posição no snapshot (numérica)
+    after = decode_list_cursor(cursor, spec['sorts'][sort] if sort else 0) if cursor else None
+    return {"filters": filters, "ranges": ranges, "sort": sort, "descending": descending,
+            "after": after, "limit": limit}
+
+
+class ListIndexCache:
+    """Último ListIndex por secção, reconstruído quando muda o snapshot (asOf)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}  # secção → (asOf, ListIndex)
+        self.builds = 0
+
+    def get(self, section, payload):
+        as_of = payload.get('asOf')
+        with self._lock:
+            cached = self._indexes.get(section)
+            if cached and as_of is not None and cached[0] == as_of:
+                return cached[1]
+        index = ListIndex(payload['result'][LIST_SPECS[section]['items']], LIST_SPECS[section])
+        with self._lock:
+            self._indexes[section] = (as_of, index)
+            self.builds += 1
+        return index
+
+
+LIST_INDEXES = ListIndexCache()
+
+
+def select_list_page(section, payload, query):
+    """Aplica filtros, ordenação e paginação a uma resposta formatada"""
+    options = parse_list_query(section, query)
+    items, matched, last = LIST_INDEXES.get(section, payload).page(**options)
+    result = dict(payload['result'])
+    result[LIST_SPECS[section]['items']] = items
+    result.update(matched=matched, nextCursor=encode_list_cursor(last) if last else None)
+    return dict(payload, result=result)
+
+
+# ==================== CRON MUTATIONS ====================
+
+# Operação de escrita → método do gateway (`openclaw gateway call <método>` no CLI)
+CRON_METHODS = {'add': 'cron.add', 'remove': 'cron.remove', 'update': 'cron.update'}
+COALESCE_WINDOW = 0.15  # Segundos à espera de mais edições antes de aplicar um lote
+MUTATION_TIMEOUT = CLI_TIMEOUT * 4  # Espera máxima de um pedido pelo seu lote
+MAX_BODY_SIZE = 1024 * 1024  # Corpo máximo de um POST
+MAX_BULK_OPS = 200
+
+
+def parse_cron_mutation(op, body):
+    """Corpo de um pedido de escrita → params do método; ValueError se inválido.
+
+    Aceita o formato das páginas: {job}, {jobId} e {jobId, patch}.
+    """
+    if op not in CRON_METHODS:
+        raise ValueError(f"Unknown op '{op}' (expected one of: {', '.join(CRON_METHODS)})")
+    if not isinstance(body, dict):
+        raise ValueError("Expected a JSON object")
+    if op == 'add':
+        job = body.get('job')
+        if not isinstance(job, dict) or not job.get('schedule') or not job.get('payload'):
+            raise ValueError("'job' with schedule and payload is required")
+        return {"job": job}
+    job_id = body.get('jobId') or body.get('id')
+    if not isinstance(job_id, str) or not job_id:
+        raise ValueError("'jobId' is required")
+    if op == 'remove':
+        return {"jobId": job_id}
+    patch = body.get('patch')
+    if not isinstance(patch, dict) or not patch:
+        raise ValueError("'patch' must be a non-empty object")
+    return {"jobId": job_id, "patch": patch}
+
+
+def run_cron_mutation(op, params):
+    """Aplica uma alteração: pelo gateway nativo se ativo, senão pelo CLI"""
+    method = CRON_METHODS[op]
+    # cron.add recebe o próprio job; remove/update recebem {jobId[, patch]}
+    call_params = params['job'] if op == 'add' else params
+    gateway = GATEWAY
+    if gateway is not None:
+        try:
+            return {"ok": True, "result": gateway.call(method, call_params)}
+        except GatewayError as e:
+            # Um add pode ter sido aplicado antes de a ligação cair: repetir
+            # pelo CLI arriscava criar o job duas vezes
+            if op == 'add':
+                return {"ok": False, "error": f"Gateway error: {e}"}
+    return BACKEND.run(['gateway', 'call', method, '--params', json.dumps(call_params), '--json'])
+
+
+def refresh_cron_snapshot():
+    """Só o snapshot de cron muda com uma escrita; status e sessões ficam em cache"""
+    argv = POLL_SOURCES['cron']
+    poller = POLLER
+    if poller is None:
+        CLI_CACHE.invalidate(argv)
+        return
+    # Com o poller, os pedidos nunca recarregam sozinhos: recolher já e
+    # avisar os listeners (SSE) em vez de esperar pelo próximo ciclo
+    result, as_of = CLI_CACHE.lookup(argv, lambda: OpenClawBridgeHandler.exec_openclaw_cli(argv), force=True)
+    poller.publish(tuple(argv), result, as_of)
+
+
+class CronMutation:
+    """Alteração pendente; pedidos coalescidos esperam pelo mesmo resultado"""
+    __slots__ = ('op', 'job_id', 'params', 'requests', 'event', 'result')
+
+    def __init__(self, op, params):
+        self.op = op
+        self.job_id = params.get('jobId')
+        self.params = params
+        self.requests = 1
+        self.event = threading.Event()
+        self.result = None
+
+    def wait(self, timeout=MUTATION_TIMEOUT):
+        if not self.event.wait(timeout):
+            return {"ok": False, "error": "Timed out waiting for cron mutation"}
+        return self.result
+
+
+class CronMutationQueue(threading.Thread):
+    """Fila única das escritas de cron jobs.
+
+    Um só worker aplica as alterações, por isso nunca há duas escritas CLI em
+    simultâneo. Edições ao mesmo job ainda na fila juntam-se numa só (os
+    patches fundem-se; um remove substitui os updates pendentes) e tudo o que
+    chega dentro de `window` segundos vai no mesmo lote, seguido de uma só
+    atualização do snapshot de cron.
+    """
+
+    def __init__(self, window=COALESCE_WINDOW):
+        super().__init__(name='cron-mutations', daemon=True)
+        self.window = window
+        self._cond = threading.Condition()
+        self._pending = []  # CronMutation por ordem de chegada
+        self.batches = 0
+        self.applied = 0
+        self.failed = 0
+        self.coalesced = 0
+
+    def submit(self, op, params):
+        return self.submit_many([(op, params)])[0]
+
+    def submit_many(self, changes):
+        """Enfileira [(op, params)] no mesmo lote; devolve a CronMutation de cada"""
+        with self._cond:
+            mutations = [self._enqueue(op, params) for op, params in changes]
+            self._cond.notify()
+        return mutations
+
+    def _enqueue(self, op, params):
+        job_id = params.get('jobId')
+        if job_id is not None and op != 'add':
+            pending = next((m for m in reversed(self._pending) if m.job_id == job_id), None)
+            if pending is not None and pending.op == 'update':
+                if op == 'update':
+                    pending.params = {"jobId": job_id, "patch": {**pending.params['patch'], **params['patch']}}
+                else:
+                    pending.op, pending.params = op, params
+                pending.requests += 1
+                self.coalesced += 1
+                METRICS.inc('cron_mutations_coalesced_total')
+                return pending
+        mutation = CronMutation(op, params)
+        self._pending.append(mutation)
+        return mutation
+
+    def run(self):
+        CLI_CONTEXT.priority = CLI_PRIORITIES['write']
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Dar tempo às edições seguintes de se juntarem ao lote
+            time.sleep(self.window)
+            with self._cond:
+                batch, self._pending = self._pending, []
+            self.apply(batch)
+
+    def apply(self, batch):
+        started = time.perf_counter()
+        changed = False
+        for mutation in batch:
+            try:
+                result = run_cron_mutation(mutation.op, mutation.params)
+            except Exception as e:
+                result = {"ok": False, "error": f"Unexpected error: {str(e)}"}
+            outcome = 'ok' if result.get('ok') else 'error'
+            METRICS.inc('cron_mutations_total', (('op', mutation.op), ('outcome', outcome)))
+            if result.get('ok'):
+                self.applied += 1
+                changed = True
+            else:
+                self.failed += 1
+                LOG.event('warning', f"Cron {mutation.op} failed: {result.get('error')}", job=mutation.job_id)
+            mutation.result = result
+        if changed:
+            try:
+                refresh_cron_snapshot()
+            except Exception as e:
+                LOG.event('warning', f"Cron snapshot refresh failed: {e}")
+        self.batches += 1
+        METRICS.observe('cron_batch_seconds', (), time.perf_counter() - started)
+        # Só depois do refresh: quem recarrega a lista a seguir já vê a alteração
+        for mutation in batch:
+            mutation.event.set()
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "window": self.window,
+            "pending": pending,
+            "batches": self.batches,
+            "applied": self.applied,
+            "failed": self.failed,
+            "coalesced": self.coalesced
+        }
+
+
+CRON_MUTATIONS = CronMutationQueue()
+
+
+# ==================== FLEET ====================
+
+FLEET_TIMEOUT = 2.0  # Segundos de espera por cada host antes de responder sem ele
+# Secção → endpoint equivalente num bridge remoto
+FLEET_ENDPOINTS = {
+    'gateway': '/api/v1/gateway/status',
+    'cron': '/api/v1/cron/list',
+    'sessions': '/api/v1/sessions/list',
+    'agents': '/api/v1/agents/list',
+}
+FLEET_LISTS = {'cron': 'jobs', 'sessions': 'sessions', 'agents': 'agents'}  # Secção → lista a juntar
+
+
+def fleet_gateway_source(section):
+    """Secção → (argv, formatter): snapshot deste host ou de um gateway remoto"""
+    return {
+        'gateway': (POLL_SOURCES['status'], format_gateway_status),
+        'cron': (POLL_SOURCES['cron'], format_cron_list),
+        'sessions': (POLL_SOURCES['sessions'], format_sessions_list),
+        'agents': (POLL_SOURCES['status'], format_agents_list),
+    }[section]
+
+
+def parse_target(value):
+    """`nome=url` (--target) → (nome, url)"""
+    name, sep, url = value.partition('=')
+    if not sep or not name or not url.startswith(('http://', 'https://', 'ws://', 'wss://')):
+        raise argparse.ArgumentTypeError(f"expected NAME=URL with an http(s):// bridge or ws(s):// gateway, got '{value}'")
+    return name, url.rstrip('/')
+
+
+class FleetTarget:
+    """Um host OpenClaw agregado em /api/v1/fleet/*.
+
+    `url` None é este bridge (snapshots locais); http(s):// é outro bridge
+    e ws(s):// um gateway, pedido pelo GatewayClient e formatado aqui. Cada
+    host remoto tem a sua cache (com single-flight) e guarda o último
+    resultado com sucesso, servido como stale quando passa o timeout.
+    """
+
+    def __init__(self, name, url=None, timeout=FLEET_TIMEOUT, ttl=CACHE_TTL):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+        self.cache = SnapshotCache(ttl) if url else None
+        self.gateway = GatewayClient(url, GATEWAY_TOKEN) if url and url.startswith(('ws://', 'wss://')) else None
+        self.last = {}  # Secção → último resultado com sucesso
+
+    def timed_fetch(self, section):
+        started = time.monotonic()
+        return self.fetch(section), time.monotonic() - started
+
+    def fetch(self, section):
+        if self.cache is None:
+            result = self.load_local(section)
+        else:
+            result = self.cache.get((section,), lambda: self.load(section))
+        if result.get('ok'):
+            self.last[section] = result
+        return result
+
+    def load_local(self, section):
+        """Snapshot deste host pela CLI_CACHE, sem o handler do pedido: corre
+        no FLEET_EXECUTOR e pode continuar depois da resposta (sem cliente,
+        o CliScheduler não o cancela)"""
+        argv, formatter = fleet_gateway_source(section)
+        CLI_CONTEXT.priority = CLI_PRIORITIES[section]
+        try:
+            data, freshness = load_snapshot(argv)
+        finally:
+            CLI_CONTEXT.priority = None
+        return formatter(data, freshness)
+
+    def load(self, section):
+        if self.gateway is not None:
+            argv, formatter = fleet_gateway_source(section)
+            try:
+                data = self.gateway.fetch(argv)
+            except GatewayError as e:
+                return {"ok": False, "error": f"Gateway error: {e}"}
+            return formatter({"ok": True, "result": data}, {"asOf": int(time.time() * 1000), "stale": False})
+
+        parsed = urlparse(self.url)
+        connection_class = http.client.HTTPSConnection if parsed.scheme == 'https' else http.client.HTTPConnection
+        # O timeout do pedido limita o trabalho em background; o do host
+        # (self.timeout) só limita quanto a resposta agregada espera
+        conn = connection_class(parsed.netloc, timeout=CLI_TIMEOUT)
+        try:
+            conn.request('GET', parsed.path + FLEET_ENDPOINTS[section], headers={"Accept": 'application/json'})
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            return {"ok": False, "error": f"Cannot reach {self.url}: {e}"}
+        finally:
+            conn.close()
+        try:
+            return json.loads(body)
+        except ValueError:
+            return {"ok": False, "error": f"Invalid JSON from {self.url} (HTTP {response.status})"}
+
+    def stats(self):
+        stats = {"url": self.url or 'local', "timeout": self.timeout}
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
+
+
+FLEET = [FleetTarget(socket.gethostname().split('.')[0] or 'local')]  # Este host primeiro; --target acrescenta
+FLEET_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix='fleet')
+
+
+def gather_fleet(section):
+    """Pede a secção a todos os hosts em paralelo.
+
+    Devolve (resultados por host, estado por host). Um host que não
+    responde dentro do seu timeout fica de fora (ou com o último resultado,
+    marcado stale); o pedido continua em background e enche a cache dele.
+    """
+    started = time.monotonic()
+    futures = [(target, FLEET_EXECUTOR.submit(target.timed_fetch, section)) for target in FLEET]
+    results, hosts = {}, {}
+    for target, future in futures:
+        remaining = max(target.timeout - (time.monotonic() - started), 0)
+        elapsed = target.timeout
+        try:
+            result, elapsed = future.result(timeout=remaining)
+            error = None if result.get('ok') else result.get('error', 'request failed')
+        except FutureTimeout:
+            result, error = None, f"timed out after {target.timeout:g}s"
+        except Exception as e:
+            result, error = None, f"Unexpected error: {str(e)}"
+        status = {"ok": error is None, "ms": round(elapsed * 1000, 1)}
+        if error is not None:
+            status['error'] = error
+            result = target.last.get(section)
+            status['stale'] = result is not None
+        elif result.get('stale'):
+            status['stale'] = True
+        if result is not None and result.get('asOf'):
+            status['asOf'] = result['asOf']
+        if result is not None:
+            results[target.name] = result
+        hosts[target.name] = status
+    METRICS.observe('fleet_gather_seconds', (('section', section),), time.monotonic() - started)
+    return results, hosts
+
+
+def merge_fleet(section, results):
+    """Junta as respostas dos hosts: listas com `host` em cada item"""
+    if section == 'gateway':
+        return {"hosts": {name: result.get('result') for name, result in results.items()}}
+    key = FLEET_LISTS[section]
+    items = []
+    for name, result in results.items():
+        for item in (result.get('result') or {}).get(key) or ():
+            items.append(dict(item, host=name))
+    if section == 'sessions':
+        items.sort(key=lambda session: session.get('updatedAt') or 0, reverse=True)
+    return {key: items, "count": len(items)}
+
+
+# ==================== TOKEN HISTORY ====================
+
+TOKEN_DB = os.environ.get('OPENCLAW_BRIDGE_TOKEN_DB',
+                          os.path.expanduser('~/.openclaw/mission-control/tokens.db'))
+# Resolução → (segundos por ponto, retenção em segundos)
+TOKEN_ROLLUPS = {
+    '1m': (60, 2 * 86400),
+    '1h': (3600, 90 * 86400),
+    '1d': (86400, 5 * 365 * 86400),
+}
+TOKEN_MAX_POINTS = 1500  # Pontos por resposta; a resolução sobe até caber
+TOKEN_PRUNE_INTERVAL = 3600  # Segundos entre limpezas da retenção
+
+
+class TokenHistory:
+    """Consumo de tokens por agente ao longo do tempo, em SQLite.
+
+    Cada snapshot de `sessions list` é comparado com o anterior (por sessão)
+    e os aumentos de input/output/total entram em três tabelas de rollup
+    (1m, 1h, 1d) com retenção própria. O estado por sessão também fica na
+    base, para um restart não contar outra vez tokens já vistos. A escrita
+    corre numa thread; o pedido só mete o snapshot numa fila.
+    """
+
+    def __init__(self, path=TOKEN_DB):
+        self.path = path
+        self.samples = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=16)
+        self._last = None
+        self._pruned_at = 0
+        with self._lock:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            for resolution in TOKEN_ROLLUPS:
+                self._db.execute(
+                    f'CREATE TABLE IF NOT EXISTS tokens_{resolution} ('
+                    'ts INTEGER NOT NULL, agent TEXT NOT NULL, input INTEGER NOT NULL, '
+                    'output INTEGER NOT NULL, total INTEGER NOT NULL, context INTEGER NOT NULL, '
+                    'sessions INTEGER NOT NULL, PRIMARY KEY (ts, agent)) WITHOUT ROWID'
+                )
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS session_state ('
+                'key TEXT PRIMARY KEY, input INTEGER NOT NULL, output INTEGER NOT NULL, '
+                'total INTEGER NOT NULL) WITHOUT ROWID'
+            )
+            self._db.commit()
+            self._state = {row[0]: row[1:] for row in self._db.execute('SELECT key, input, output, total FROM session_state')}
+            self._seeded = bool(self._state)
+        threading.Thread(target=self.run, name='token-history', daemon=True).start()
+
+    def on_poll(self, argv, data, as_of):
+        """Listener do poller / chamado após cada leitura de sessions list"""
+        if tuple(argv) != tuple(POLL_SOURCES['sessions']) or as_of is None or not data.get('ok'):
+            return
+        if data is self._last:
+            return
+        self._last = data
+        try:
+            self._queue.put_nowait((data.get('result', {}).get('sessions', []), as_of))
+        except queue.Full:
+            pass
+
+    def run(self):
+        while True:
+            sessions, as_of = self._queue.get()
+            try:
+                self.record(sessions, as_of)
+            except sqlite3.Error as e:
+                LOG.event('warning', f"Token history write failed: {e}")
+
+    def record(self, sessions, as_of):
+        """Acumula os aumentos de tokens desde a observação anterior"""
+        with self._lock:
+            previous = self._state
+            per_agent = {}
+            state = {}
+            changed = []  # Só as sessões novas ou com contadores diferentes vão à base
+            for session in sessions:
+                key = session.key
+                counts = (session.inputTokens or 0, session.outputTokens or 0, session.totalTokens or 0)
+                state[key] = counts
+                before = previous.get(key)
+                if before != counts:
+                    changed.append((key,) + counts)
+                before = before or (0, 0, 0)
+                usage = per_agent.setdefault(session.agentId, [0, 0, 0, 0, 0])
+                if self._seeded:
+                    # Um contador que desce (sessão reiniciada) conta a partir de zero
+                    for i in range(3):
+                        usage[i] += counts[i] - before[i] if counts[i] >= before[i] else counts[i]
+                usage[3] = max(usage[3], session.contextTokens or 0)
+                usage[4] += 1
+
+            for resolution, (step, _) in TOKEN_ROLLUPS.items():
+                bucket = int(as_of) // step * step
+                self._db.executemany(
+                    f'INSERT INTO tokens_{resolution} VALUES (?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (ts, agent) DO UPDATE SET input = input + excluded.input, '
+                    'output = output + excluded.output, total = total + excluded.total, '
+                    'context = max(context, excluded.context), sessions = max(sessions, excluded.sessions)',
+                    [(bucket, agent, *usage) for agent, usage in per_agent.items()]
+                )
+            self._db.executemany('INSERT OR REPLACE INTO session_state VALUES (?, ?, ?, ?)', changed)
+            self._db.executemany('DELETE FROM session_state WHERE key = ?',
+                                 [(key,) for key in previous.keys() - state.keys()])
+
+            if as_of - self._pruned_at >= TOKEN_PRUNE_INTERVAL:
+                for resolution, (_, retention) in TOKEN_ROLLUPS.items():
+                    self._db.execute(f'DELETE FROM tokens_{resolution} WHERE ts < ?', (int(as_of - retention),))
+                self._pruned_at = as_of
+            self._db.commit()
+            self._state = state
+            # A primeira observação (base vazia) só serve de ponto de partida
+            self._seeded = True
+            self.samples += 1
+
+    def query(self, start, end, agent=None, resolution=None):
+        """Pontos [start, end) (epoch s) na resolução pedida ou na mais fina que caiba"""
+        if resolution is None:
+            resolution = next(
+                (name for name, (step, retention) in TOKEN_ROLLUPS.items()
+                 if (end - start) / step <= TOKEN_MAX_POINTS and time.time() - start <= retention),
+                '1d'
+            )
+        step = TOKEN_ROLLUPS[resolution][0]
+        sql = (f'SELECT ts, sum(input), sum(output), sum(total), max(context), sum(sessions) '
+               f'FROM tokens_{resolution} WHERE ts >= ? AND ts < ?')
+        params = [start // step * step, end]
+        if agent:
+            sql += ' AND agent = ?'
+            params.append(agent)
+        sql += ' GROUP BY ts ORDER BY ts LIMIT ?'
+        params.append(TOKEN_MAX_POINTS)
+
+        points = []
+        totals = {"inputTokens": 0, "outputTokens": 0, "totalTokens": 0}
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        for ts, input_tokens, output_tokens, total_tokens, context, sessions in rows:
+            points.append({
+                "ts": ts * 1000,
+                "inputTokens": input_tokens,
+                "outputTokens": output_tokens,
+                "totalTokens": total_tokens,
+                "contextTokens": context,
+                "sessions": sessions
+            })
+            totals['inputTokens'] += input_tokens
+            totals['outputTokens'] += output_tokens
+            totals['totalTokens'] += total_tokens
+        return {"resolution": resolution, "stepMs": step * 1000, "points": points, "totals": totals}
+
+    def stats(self):
+        return {"path": self.path, "samples": self.samples, "pending": self._queue.qsize()}
+
+
+TOKEN_HISTORY = None  # TokenHistory, ativado no arranque (--token-db / --no-token-history)
+
+
+# ==================== USAGE SUMMARY ====================
+
+USAGE_DIMENSIONS = ('agentId', 'channel', 'model')  # Agrupamentos de /api/v1/usage/summary
+USAGE_SORTS = ('totalTokens', 'inputTokens', 'outputTokens', 'sessions')  # Ordenações do top-N
+USAGE_TOP = 10  # Grupos por dimensão (?top=)
+MAX_USAGE_TOP = 100
+UTILIZATION_BUCKETS = 100  # Histograma de totalTokens/contextTokens em passos de 1%
+UTILIZATION_PERCENTILES = (50, 90, 99)
+
+
+class _UsageGroup:
+    """Somas de um grupo (ou do total) e histograma de utilização da janela"""
+    __slots__ = ('sessions', 'inputTokens', 'outputTokens', 'totalTokens', 'utilization')
+
+    def __init__(self):
+        self.sessions = self.inputTokens = self.outputTokens = self.totalTokens = 0
+        self.utilization = [0] * (UTILIZATION_BUCKETS + 1)  # Último balde: ≥ 100%
+
+    def add(self, usage, sign):
+        self.sessions += sign
+        self.inputTokens += sign * usage[3]
+        self.outputTokens += sign * usage[4]
+        self.totalTokens += sign * usage[5]
+        if usage[6] is not None:
+            self.utilization[usage[6]] += sign
+
+    def percentiles(self):
+        """p50/p90/p99 da utilização (fração da janela, resolução de 1%)"""
+        count = sum(self.utilization)
+        if not count:
+            return None
+        result = {"sessions": count}
+        for percentile in UTILIZATION_PERCENTILES:
+            rank = (count * percentile + 99) // 100
+            seen = 0
+            for bucket, bucket_count in enumerate(self.utilization):
+                seen += bucket_count
+                if seen >= rank:
+                    break
+            result[f"p{percentile}"] = min(bucket + 1, UTILIZATION_BUCKETS) / UTILIZATION_BUCKETS
+        return result
+
+    def to_dict(self):
+        return {
+            "sessions": self.sessions,
+            "inputTokens": self.inputTokens,
+            "outputTokens": self.outputTokens,
+            "totalTokens": self.totalTokens,
+            "contextUtilization": self.percentiles()
+        }
+
+
+def usage_contribution(session):
+    """O que uma sessão soma aos agregados: (agentId, channel, model, in, out, total, balde)"""
+    total = session.totalTokens or 0
+    window = session.contextTokens or 0
+    bucket = min(int(total * UTILIZATION_BUCKETS / window), UTILIZATION_BUCKETS) if window > 0 else None
+    return (session.agentId, session.channel, session.model,
+            session.inputTokens or 0, session.outputTokens or 0, total, bucket)
+
+
+class UsageRollup:
+    """Totais de tokens por agentId, canal e modelo, mantidos entre snapshots.
+
+    Cada snapshot de sessions list novo é comparado com a contribuição
+    anterior de cada sessão e só as diferenças são aplicadas; um pedido a
+    /api/v1/usage/summary lê os agregados sem percorrer as sessões.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._source = None  # Último resultado CLI observado
+        self._contributions = {}  # key → usage_contribution
+        self._totals = _UsageGroup()
+        self._groups = tuple({} for _ in USAGE_DIMENSIONS)  # dimensão → valor → _UsageGroup
+        self.updates = 0
+        self.changed = 0
+
+    def on_poll(self, argv, data, as_of):
+        """Listener do poller: agrega ao refresh, fora do caminho dos pedidos"""
+        if tuple(argv) == tuple(POLL_SOURCES['sessions']) and data.get('ok'):
+            self.observe(data, normalize_sessions(data.get('result', {})).get('sessions', []))
+
+    def observe(self, data, sessions):
+        with self._lock:
+            if data is self._source:
+                return
+            started = time.perf_counter()
+            previous = self._contributions
+            contributions = {session.key: usage_contribution(session) for session in sessions}
+            changed = 0
+            for key, usage in contributions.items():
+                before = previous.get(key)
+                if before != usage:
+                    if before is not None:
+                        self._apply(before, -1)
+                    self._apply(usage, 1)
+                    changed += 1
+            for key in previous.keys() - contributions.keys():
+                self._apply(previous[key], -1)
+                changed += 1
+            self._source, self._contributions = data, contributions
+            self.updates += 1
+            self.changed += changed
+            METRICS.observe('usage_rollup_seconds', (), time.perf_counter() - started)
+
+    def _apply(self, usage, sign):
+        self._totals.add(usage, sign)
+        for groups, value in zip(self._groups, usage):
+            group = groups.get(value)
+            if group is None:
+                group = groups[value] = _UsageGroup()
+            group.add(usage, sign)
+            if not group.sessions:
+                del groups[value]
+
+    def summary(self, top=USAGE_TOP, sort='totalTokens'):
+        with self._lock:
+            result = {"totals": self._totals.to_dict(), "groupCounts": {}, "top": {}}
+            for dimension, groups in zip(USAGE_DIMENSIONS, self._groups):
+                ranked = sorted(groups.items(), key=lambda item: (-getattr(item[1], sort), str(item[0])))
+                result["groupCounts"][dimension] = len(groups)
+                result["top"][dimension] = [dict({dimension: value}, **group.to_dict()) for value, group in ranked[:top]]
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._contributions),
+                "groups": {dimension: len(groups) for dimension, groups in zip(USAGE_DIMENSIONS, self._groups)},
+                "updates": self.updates,
+                "changed": self.changed
+            }
+
+
+USAGE_ROLLUP = UsageRollup()
+
+
+# ==================== EVENTS (SSE) ====================
+
+# argv CLI → (secção do evento, formatter)
+EVENT_SECTIONS = {
+    tuple(POLL_SOURCES['status']): ('gateway', format_gateway_status),
+    tuple(POLL_SOURCES['cron']): ('cron', format_cron_list),
+    tuple(POLL_SOURCES['sessions']): ('sessions', format_sessions_list),
+}
+# Secções em lista: campo da lista e chave de cada item
+EVENT_LIST_KEYS = {'cron': ('jobs', 'id'), 'sessions': ('sessions', 'key')}
+# Campos que mudam a cada recolha e não contam como alteração
+VOLATILE_FIELDS = ('ageMs', 'connectLatencyMs')
+HEARTBEAT_INTERVAL = 15  # Segundos
+SEND_TIMEOUT = 2  # Segundos sem progresso na escrita até desistir de um cliente lento
+MAX_CLIENT_BACKLOG = 1024 * 1024  # Bytes ainda por escrever quando chega o evento seguinte
+EVENT_FLUSH_INTERVAL = 0.05  # Segundos entre tentativas de escrita a clientes com backlog
+EVENT_CHECK_INTERVAL = 1  # Segundos entre verificações de clientes que fecharam a ligação
+
+
+def _stable(item):
+    return {k: v for k, v in item.items() if k not in VOLATILE_FIELDS}
+
+
+def diff_section(section, old, new):
+    """Diferença entre dois resultados normalizados de uma secção.
+
+    Listas dão {"upserted": [...], "removed": [chaves], ...resto}; as outras
+    secções vão inteiras em {"result": ...}. Devolve None se nada mudou.
+    """
+    if section not in EVENT_LIST_KEYS:
+        if old is not None and _stable(old) == _stable(new):
+            return None
+        return {"result": new}
+
+    field, key = EVENT_LIST_KEYS[section]
+    old_items = {item[key]: _stable(item) for item in (old or {}).get(field, [])}
+    new_items = {item[key]: item for item in new[field]}
+    upserted = [item for k, item in new_items.items() if old_items.get(k) != _stable(item)]
+    removed = [k for k in old_items if k not in new_items]
+    if old is not None and not upserted and not removed:
+        return None
+    diff = {k: v for k, v in new.items() if k != field}
+    diff.update(upserted=upserted, removed=removed)
+    return diff
+
+
+def encode_event(event, data, event_id):
+    payload = json.dumps(data, separators=(',', ':'), default=encode_record)
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode()
+
+
+class _EventClient:
+    __slots__ = ('sock', 'pending', 'progress_at')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.pending = bytearray()  # Eventos ainda não aceites pelo socket
+        self.progress_at = time.monotonic()
+
+
+class EventHub(threading.Thread):
+    """Distribui por SSE as alterações aos snapshots recolhidos pelo poller.
+
+    Um só thread escreve para todos os clientes: N viewers custam um loop de
+    polling CLI e N writes por alteração, não N subprocessos nem N workers.
+    Cada cliente recebe primeiro um evento `snapshot` com o estado atual e
+    depois só diffs (`gateway`, `cron`, `sessions`).
+
+    Os sockets são não bloqueantes: o que um cliente lento não aceita fica
+    no seu buffer e é escrito depois, sem atrasar os outros; quem passa
+    SEND_TIMEOUT sem progresso ou acumula MAX_CLIENT_BACKLOG é desligado.
+    Quando sai o último cliente, um poller arrancado por /api/v1/events pára.
+    """
+
+    def __init__(self):
+        super().__init__(name='openclaw-events', daemon=True)
+        self.state = {}  # secção → resultado normalizado publicado
+        self.subscribers = 0  # Subscrições ainda não desligadas
+        self._seen = {}  # secção → resultado CLI já processado
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()  # (socket ou None para todos, bytes)
+        self._clients = []  # Só usado pelo thread do hub
+        self._event_id = 0
+
+    def on_poll(self, argv, data, as_of):
+        section, formatter = EVENT_SECTIONS.get(tuple(argv), (None, None))
+        if section is None or as_of is None or self._seen.get(section) is data:
+            return
+        self._seen[section] = data
+        result = formatter(data, {})['result']
+        with self._lock:
+            diff = diff_section(section, self.state.get(section), result)
+            self.state[section] = result
+            if diff is None:
+                return
+            diff['asOf'] = int(as_of * 1000)
+            self._event_id += 1
+            self._queue.put((None, encode_event(section, diff, self._event_id)))
+
+    def reserve(self, count=1):
+        """Conta um cliente que vai subscrever (ou, com -1, um que desistiu)"""
+        with self._lock:
+            self.subscribers += count
+
+    def subscribe(self, sock):
+        """Entrega ao hub o socket de um cliente já contado por reserve()"""
+        with self._lock:
+            snapshot = encode_event('snapshot', self.state, self._event_id)
+            self._queue.put((sock, snapshot))
+
+    def client_count(self):
+        return self.subscribers
+
+    def run(self):
+        heartbeat_at = time.monotonic() + HEARTBEAT_INTERVAL
+        while True:
+            backlog = any(client.pending for client in self._clients)
+            try:
+                sock, data = self._queue.get(timeout=EVENT_FLUSH_INTERVAL if backlog else EVENT_CHECK_INTERVAL)
+            except queue.Empty:
+                sock, data = None, b''
+                self._drop_closed()
+                if time.monotonic() >= heartbeat_at:
+                    data = b": keepalive\n\n"
+                    heartbeat_at = time.monotonic() + HEARTBEAT_INTERVAL
+            if sock is not None:
+                sock.setblocking(False)
+                client = _EventClient(sock)
+                self._clients.append(client)
+                self._write(client, data)
+            else:
+                for client in self._clients:
+                    self._write(client, data)
+            dropped = [client for client in self._clients if client.sock is None]
+            if dropped:
+                self._clients = [client for client in self._clients if client.sock is not None]
+                self.reserve(-len(dropped))
+                stop_idle_poller()
+
+    def _drop_closed(self):
+        """Fecha os clientes que desligaram (um socket SSE legível está em EOF)"""
+        clients = [client for client in self._clients if client.sock is not None]
+        if not clients:
+            return
+        try:
+            readable = set(select.select([client.sock for client in clients], [], [], 0)[0])
+        except (OSError, ValueError):
+            return
+        for client in clients:
+            if client.sock not in readable:
+                continue
+            try:
+                if client.sock.recv(4096):
+                    continue  # Bytes a mais do cliente: ignorados
+            except BlockingIOError:
+                continue
+            except OSError:
+                pass
+            try:
+                client.sock.close()
+            except OSError:
+                pass
+            client.sock = None
+
+    @staticmethod
+    def _write(client, data):
+        """Junta `data` ao buffer do cliente e escreve o que o socket aceitar já.
+
+        Um evento grande pode ficar a meio; o cliente só é desligado se ainda
+        tiver MAX_CLIENT_BACKLOG por escrever quando chega outro, ou se passar
+        SEND_TIMEOUT sem aceitar nada.
+        """
+        now = time.monotonic()
+        if data and len(client.pending) > MAX_CLIENT_BACKLOG:
+            client.pending.clear()
+        else:
+            if not client.pending:
+                client.progress_at = now
+            client.pending += data
+            try:
+                while client.pending:
+                    sent = client.sock.send(client.pending)
+                    del client.pending[:sent]
+                    client.progress_at = now
+                return
+            except BlockingIOError:
+                if now - client.progress_at <= SEND_TIMEOUT:
+                    return
+            except OSError:
+                pass
+        try:
+            client.sock.close()
+        except OSError:
+            pass
+        client.sock = None
+
+
+EVENT_HUB = EventHub()
+_POLLER_LOCK = threading.Lock()
+
+
+def start_poller(intervals=POLL_INTERVALS, on_demand=False):
+    """Arranca o poller (um de cada vez) ligado ao hub de eventos.
+
+    `on_demand` (primeiro cliente de /api/v1/events) deixa-o parar quando
+    sai o último cliente; arrancado com --poll corre sempre.
+    """
+    global POLLER
+    with _POLLER_LOCK:
+        if POLLER is None:
+            POLLER = BackgroundPoller(CLI_CACHE, OpenClawBridgeHandler.exec_openclaw_cli, intervals)
+            POLLER.on_demand = on_demand
+            POLLER.listeners.append(EVENT_HUB.on_poll)
+            POLLER.listeners.append(USAGE_ROLLUP.on_poll)
+            if TOKEN_HISTORY is not None:
+                POLLER.listeners.append(TOKEN_HISTORY.on_poll)
+            POLLER.start()
+        elif not on_demand:
+            POLLER.on_demand = False
+        if EVENT_HUB.ident is None:
+            EVENT_HUB.start()
+    return POLLER
+
+
+def stop_idle_poller():
+    """Pára o poller arrancado pelos clientes SSE quando já não há nenhum"""
+    global POLLER
+    with _POLLER_LOCK:
+        if POLLER is not None and POLLER.on_demand and EVENT_HUB.client_count() == 0:
+            POLLER.stop()
+            POLLER = None
+
+
+def load_snapshot(args):
+    """(dados, marcadores asOf/stale) do snapshot de um argv, pela CLI_CACHE.
+
+    Sem estado do pedido: prioridade e cliente vêm do CLI_CONTEXT de quem chama.
+    """
+    # Uma só leitura: o stop_idle_poller pode pôr POLLER a None a meio
+    poller = POLLER
+    polled = poller is not None and poller.polls_source(args)
+    data, as_of = CLI_CACHE.lookup(
+        args,
+        lambda: OpenClawBridgeHandler.exec_openclaw_cli(args),
+        max_age=float('inf') if polled else None
+    )
+    if as_of is None:
+        return data, {}
+    stale = polled and time.time() - as_of > poller.max_age(args)
+    return data, {"asOf": int(as_of * 1000), "stale": stale}
 
-PORT = 18791  # Porta diferente do gateway (18789)
 
 class OpenClawBridgeHandler(http.server.SimpleHTTPRequestHandler):
+    # HTTP/1.1 permite ao local/server.py reutilizar ligações (keep-alive);
+    # ligações paradas fecham ao fim de `timeout` segundos e libertam o worker
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    disable_nagle_algorithm = True  # Headers e corpo saem em writes separados
+    query = {}  # Query string do pedido atual (parse_qs)
+    timings = {}  # Fase → segundos, para o Server-Timing
+    request_started = None
+    request_id = None  # X-Request-Id (recebido do proxy ou gerado)
+
     def log_message(self, format, *args):
-        # Custom log com timestamp
-        import datetime
-        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        print(f"[{timestamp}] {self.address_string()} - {format % args}")
+        # Erros do http.server (send_error, pedidos inválidos) vão para o log estruturado
+        LOG.event('info', format % args, client=self.client_address[0], rid=self.request_id)
+
+    def log_request(self, code='-', size='-'):
+        # A linha de acesso é escrita em record_request, com duração e bytes
+        pass
 
     def end_headers(self):
         # CORS headers para permitir acesso do Mission Control
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        self.send_header('Timing-Allow-Origin', '*')
+        if self.request_started is not None:
+            self.send_header('Server-Timing', self.server_timing())
+        if self.request_id:
+            self.send_header('X-Request-Id', self.request_id)
         super().end_headers()
 
+    # ---- Métricas e Server-Timing ----
+
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+
+    def parse_request(self):
+        self.request_started = time.perf_counter()
+        self.timings = {}
+        self.status_code = None
+        self.wfile.bytes_written = 0
+        METRICS.inc('http_requests_in_flight')
+        self.request_id = None
+        if not super().parse_request():
+            return False
+        # Vem do local/server.py quando o pedido passa pelo proxy
+        self.request_id = request_id_from(self.headers.get('X-Request-Id'))
+        return True
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente desligou-se a meio (ex.: execução CLI cancelada)
+            self.close_connection = True
+        finally:
+            if self.request_started is not None:
+                self.record_request()
+
+    def send_response(self, code, message=None):
+        self.status_code = code
+        super().send_response(code, message)
+
+    def add_timing(self, name, started):
+        """Acumula o tempo desde `started` (perf_counter) na fase `name`"""
+        self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - started
+
+    def server_timing(self):
+        parts = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.timings.items()]
+        parts.append(f'bridge;dur={(time.perf_counter() - self.request_started) * 1000:.1f}')
+        return ', '.join(parts)
+
+    def record_request(self):
+        elapsed = time.perf_counter() - self.request_started
+        self.request_started = None
+        METRICS.inc('http_requests_in_flight', value=-1)
+        # 404 fica agregado para não criar uma série por URL desconhecido
+        path = urlparse(getattr(self, 'path', '')).path
+        endpoint = path if self.status_code != 404 else 'other'
+        labels = (('endpoint', endpoint),)
+        METRICS.inc('http_requests_total', labels + (('method', self.command or '-'), ('status', str(self.status_code))))
+        METRICS.observe('http_request_duration_seconds', labels, elapsed)
+        METRICS.inc('http_response_bytes_total', labels, self.wfile.bytes_written)
+        for phase, seconds in self.timings.items():
+            METRICS.observe('phase_duration_seconds', (('phase', phase),), seconds)
+
+        record = {
+            "ts": time.time(),
+            "rid": self.request_id,
+            "client": self.client_address[0],
+            "method": self.command,
+            "path": path,
+            "status": self.status_code,
+            "ms": round(elapsed * 1000, 1),
+            "bytes": self.wfile.bytes_written
+        }
+        if self.timings:
+            record['timing'] = {phase: round(seconds * 1000, 1) for phase, seconds in self.timings.items()}
+        LOG.access(record, endpoint, self.status_code or 0, elapsed)
+
     def do_OPTIONS(self):
         self.send_response(200)
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
     def do_GET(self):
         parsed_path = urlparse(self.path)
         path = parsed_path.path
+        query = self.query = parse_qs(parsed_path.query)
 
         # API endpoints
         if path == '/api/v1/status':
@@ -57,219 +3053,426 @@ class OpenClawBridgeHandler(http.server.SimpleHTTPRequestHandler):
         elif path == '/api/v1/gateway/status':
             self.handle_gateway_status()
         elif path == '/api/v1/cron/list':
-            self.handle_cron_list()
+            self.handle_cron_list(query)
         elif path == '/api/v1/sessions/list':
-            self.handle_sessions_list()
+            self.handle_sessions_list(query)
         elif path == '/api/v1/agents/list':
             self.handle_agents_list()
+        elif path == '/api/v1/dashboard':
+            self.handle_dashboard()
+        elif path == '/api/v1/events':
+            self.handle_events()
+        elif path == '/api/v1/cache/stats':
+            self.handle_cache_stats()
+        elif path == '/api/v1/metrics/tokens':
+            self.handle_token_metrics(query)
+        elif path == '/api/v1/usage/summary':
+            self.handle_usage_summary(query)
+        elif path.startswith('/api/v1/fleet/') and path.rsplit('/', 1)[1] in FLEET_ENDPOINTS:
+            self.handle_fleet(path.rsplit('/', 1)[1])
+        elif path == '/metrics':
+            self.handle_metrics()
         elif path == '/':
             self.handle_index()
         else:
             self.send_error(404, "Endpoint not found")
 
-    def run_openclaw_cli(self, args):
-        """Executa comando openclaw CLI e retorna JSON"""
+    def do_POST(self):
+        parsed_path = urlparse(self.path)
+        path = parsed_path.path
+        self.query = parse_qs(parsed_path.query)
+
+        if path.startswith('/api/v1/cron/') and path.rsplit('/', 1)[1] in CRON_METHODS:
+            self.handle_cron_mutation(path.rsplit('/', 1)[1])
+        elif path == '/api/v1/cron/bulk':
+            self.handle_cron_bulk()
+        else:
+            self.send_error(404, "Endpoint not found")
+
+    def read_json_body(self):
+        """Corpo JSON do pedido (Content-Length ou chunked, como o local/server.py
+        reenvia corpos de tamanho desconhecido); envia o erro (e devolve None) se inválido"""
         try:
-            cmd = ['openclaw'] + args
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30,
-                cwd=os.path.expanduser('~')
-            )
+            if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+                body = self.read_chunked_body(MAX_BODY_SIZE)
+            else:
+                length = int(self.headers.get('Content-Length') or 0)
+                if length < 0:
+                    raise ValueError("negative Content-Length")
+                body = self.rfile.read(length) if length <= MAX_BODY_SIZE else None
+        except ValueError as e:
+            self.close_connection = True
+            self.send_json_response({"ok": False, "error": f"Invalid request body: {e}"}, 400)
+            return None
+        if body is None:
+            self.close_connection = True
+            self.send_json_response({"ok": False, "error": f"Body too large (max {MAX_BODY_SIZE} bytes)"}, 413)
+            return None
+        try:
+            return json.loads(body or b'{}')
+        except ValueError as e:
+            self.send_json_response({"ok": False, "error": f"Invalid JSON body: {e}"}, 400)
+            return None
 
-            if result.returncode != 0:
-                return {
-                    "ok": False,
-                    "error": f"CLI error (code {result.returncode})",
-                    "stderr": result.stderr[:500]
-                }
+    def read_chunked_body(self, limit):
+        """Descodifica um corpo chunked; None se passar de `limit` bytes"""
+        body = bytearray()
+        while True:
+            size = int(self.rfile.readline(65537).split(b';', 1)[0].strip() or b'0', 16)
+            if size == 0:
+                # Trailers até à linha vazia
+                while self.rfile.readline(65537) not in (b'\r\n', b'\n', b''):
+                    pass
+                return bytes(body)
+            if len(body) + size > limit:
+                return None
+            chunk = self.rfile.read(size)
+            if len(chunk) < size:
+                raise ValueError("truncated chunked body")
+            body += chunk
+            self.rfile.readline()  # CRLF no fim do chunk
 
-            # Parse JSON output
+    def handle_cron_mutation(self, op):
+        """POST /api/v1/cron/add|remove|update → espera pelo lote da fila de escritas"""
+        body = self.read_json_body()
+        if body is None:
+            return
+        try:
+            params = parse_cron_mutation(op, body)
+        except ValueError as e:
+            self.send_json_response({"ok": False, "error": str(e)}, 400)
+            return
+        started = time.perf_counter()
+        result = CRON_MUTATIONS.submit(op, params).wait()
+        self.add_timing('mutation', started)
+        self.send_json_response(result, 200 if result.get('ok') else 502)
+
+    def handle_cron_bulk(self):
+        """POST /api/v1/cron/bulk {"ops": [{"op": "update", "jobId": …, "patch": …}, …]}
+
+        Todas as alterações entram no mesmo lote (uma passagem e um só refresh);
+        a resposta traz o resultado de cada uma, pela ordem do pedido.
+        """
+        body = self.read_json_body()
+        if body is None:
+            return
+        ops = body.get('ops') if isinstance(body, dict) else None
+        if not isinstance(ops, list) or not ops:
+            self.send_json_response({"ok": False, "error": "'ops' must be a non-empty list"}, 400)
+            return
+        if len(ops) > MAX_BULK_OPS:
+            self.send_json_response({"ok": False, "error": f"Too many ops (max {MAX_BULK_OPS})"}, 400)
+            return
+        changes = []
+        for index, change in enumerate(ops):
             try:
-                data = json.loads(result.stdout)
-                return {"ok": True, "result": data}
-            except json.JSONDecodeError as e:
-                return {
-                    "ok": False,
-                    "error": f"Invalid JSON from CLI: {str(e)}",
-                    "raw": result.stdout[:1000]
-                }
+                changes.append((change.get('op'), parse_cron_mutation(change.get('op'), change)))
+            except (AttributeError, ValueError) as e:
+                self.send_json_response({"ok": False, "error": f"ops[{index}]: {e}"}, 400)
+                return
+        started = time.perf_counter()
+        results = [mutation.wait() for mutation in CRON_MUTATIONS.submit_many(changes)]
+        self.add_timing('mutation', started)
+        applied = sum(1 for result in results if result.get('ok'))
+        self.send_json_response({
+            "ok": applied == len(results),
+            "result": {"applied": applied, "failed": len(results) - applied, "results": results}
+        })
 
-        except subprocess.TimeoutExpired:
-            return {"ok": False, "error": "CLI command timed out"}
-        except FileNotFoundError:
-            return {"ok": False, "error": "openclaw CLI not found. Is OpenClaw installed?"}
-        except Exception as e:
-            return {"ok": False, "error": f"Unexpected error: {str(e)}"}
+    def run_openclaw_cli(self, args, cached=True):
+        """Executa comando openclaw CLI (via cache de snapshots) e retorna JSON"""
+        if cached:
+            return CLI_CACHE.get(args, lambda: self.exec_openclaw_cli(args))
+        return self.exec_openclaw_cli(args)
+
+    def read_snapshot(self, args, purpose='status'):
+        """Lê o snapshot mais recente de um comando CLI.
+
+        Devolve (dados, marcadores) onde os marcadores são `asOf` (epoch ms)
+        e `stale`. Com o poller ativo, responde sempre do último snapshot sem
+        lançar subprocessos (exceto antes da primeira recolha). `purpose`
+        define a prioridade na fila do CLI (CLI_PRIORITIES).
+        """
+        started = time.perf_counter()
+        CLI_CONTEXT.priority = CLI_PRIORITIES[purpose]
+        CLI_CONTEXT.client = self.connection
+        try:
+            return load_snapshot(args)
+        finally:
+            CLI_CONTEXT.priority = CLI_CONTEXT.client = None
+            self.add_timing('snapshot', started)
+
+    @staticmethod
+    def exec_openclaw_cli(args):
+        """Executa comando openclaw (no backend ativo) e retorna JSON.
+
+        Com o cliente nativo ativo, os comandos suportados vão pela ligação
+        WebSocket ao gateway; o backend (CLI por omissão) fica como fallback.
+        """
+        gateway = GATEWAY
+        if gateway is not None:
+            try:
+                data = gateway.fetch(args)
+                if data is not None:
+                    return normalize_snapshot(args, {"ok": True, "result": data})
+            except GatewayError:
+                pass
 
-    def send_json_response(self, data, status_code=200):
-        """Envia resposta JSON"""
+        return normalize_snapshot(args, BACKEND.run(args))
+
+    def send_json_response(self, data, status_code=200, headers=None):
+        """Envia resposta JSON (compacta, ou ?pretty=1), comprimida se o
+        cliente aceitar"""
+        pretty = self.query.get('pretty', ['0'])[0] in ('1', 'true')
+        started = time.perf_counter()
+        body = encode_json(data, pretty)
+        self.add_timing('encode', started)
+        encoding = None
+        if len(body) >= COMPRESS_MIN_SIZE:
+            encoding = choose_encoding(self.headers.get('Accept-Encoding'))
+            if encoding:
+                started = time.perf_counter()
+                body = compress_body(body, encoding)
+                self.add_timing('compress', started)
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
         self.end_headers()
-        self.wfile.write(json.dumps(data, indent=2).encode())
+        self.wfile.write(body)
+
+    def send_json_with_etag(self, data):
+        """Envia JSON com ETag fraca; 304 se o cliente já tem esta versão"""
+        if not data.get('ok'):
+            self.send_json_response(data)
+            return
+        started = time.perf_counter()
+        etag = ETAG_CACHE.get(self.path, data)
+        self.add_timing('etag', started)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(self.headers.get('If-None-Match', ''), etag):
+            self.send_response(304)
+            for header, value in headers.items():
+                self.send_header(header, value)
+            self.end_headers()
+            return
+        self.send_json_response(data, headers=headers)
 
     def handle_status(self):
         """Status completo do OpenClaw"""
-        data = self.run_openclaw_cli(['status', '--json'])
-        self.send_json_response(data)
+        data, freshness = self.read_snapshot(['status', '--json'])
+        self.send_json_response(dict(data, **freshness))
 
     def handle_gateway_status(self):
-        """Status específico do gateway"""
-        full_status = self.run_openclaw_cli(['status', '--json'])
+        self.send_json_response(self.build_gateway_status())
 
-        if not full_status.get('ok'):
-            self.send_json_response(full_status)
-            return
+    def handle_cron_list(self, query):
+        data = self.build_cron_list()
+        if data.get('ok') and wants_list_query('cron', query):
+            try:
+                data = select_list_page('cron', data, query)
+            except ValueError as e:
+                self.send_json_response({"ok": False, "error": f"Invalid list query: {e}"}, 400)
+                return
+        self.send_json_with_etag(data)
 
-        result = full_status.get('result', {})
-        gateway = result.get('gateway', {})
-        service = result.get('gatewayService', {})
-
-        simplified = {
-            "ok": True,
-            "result": {
-                "running": gateway.get('reachable', False) and 'running' in service.get('runtimeShort', ''),
-                "url": gateway.get('url', 'ws://127.0.0.1:18789'),
-                "reachable": gateway.get('reachable', False),
-                "connectLatencyMs": gateway.get('connectLatencyMs', 0),
-                "version": "v2026.2.13",  # Versão atual
-                "model": result.get('sessions', {}).get('defaults', {}).get('model', 'kimi-k2.5:cloud'),
-                "pid": service.get('runtimeShort', '').replace('running (pid ', '').replace(')', '') if 'running' in service.get('runtimeShort', '') else None,
-                "mode": gateway.get('mode', 'local')
-            }
-        }
-        self.send_json_response(simplified)
+    def handle_sessions_list(self, query):
+        data = self.build_sessions_list()
+        since = query.get('since', [None])[0]
+        if since is not None and data.get('ok'):
+            if wants_list_query('sessions', query):
+                self.send_json_response({"ok": False, "error": "'since' cannot be combined with limit/cursor/sort/filters"}, 400)
+                return
+            try:
+                since = int(since)
+            except ValueError:
+                self.send_json_response({"ok": False, "error": "Invalid 'since' (expected epoch ms)"}, 400)
+                return
+            data = select_sessions_since(data, since, SESSION_CHANGES)
+        elif data.get('ok') and wants_list_query('sessions', query):
+            try:
+                data = select_list_page('sessions', data, query)
+            except ValueError as e:
+                self.send_json_response({"ok": False, "error": f"Invalid list query: {e}"}, 400)
+                return
+        self.send_json_with_etag(data)
 
-    def handle_cron_list(self):
-        """Lista de cron jobs"""
-        data = self.run_openclaw_cli(['cron', 'list', '--json'])
+    def handle_agents_list(self):
+        self.send_json_with_etag(self.build_agents_list())
 
-        if not data.get('ok'):
-            self.send_json_response(data)
-            return
+    def handle_dashboard(self):
+        """Gateway, cron, sessões e agentes num só pedido.
 
-        # Formata para o formato esperado pelo Mission Control
-        jobs = data.get('result', {}).get('jobs', [])
-        formatted = {
-            "ok": True,
-            "result": {
-                "jobs": [
-                    {
-                        "id": job.get('id', f"job-{i}"),
-                        "name": job.get('name', job.get('id', f"Job {i}")),
-                        "description": job.get('description', ''),
-                        "enabled": job.get('enabled', True),
-                        "schedule": job.get('schedule', {}),
-                        "payload": job.get('payload', {})
-                    }
-                    for i, job in enumerate(jobs)
-                ],
-                "total": len(jobs),
-                "enabled": sum(1 for j in jobs if j.get('enabled', True))
-            }
+        As secções são recolhidas em paralelo e cada uma tem o mesmo formato
+        do endpoint individual; uma falha fica isolada na sua secção.
+        """
+        futures = {
+            section: DASHBOARD_EXECUTOR.submit(self.build_section, section, getattr(self, builder))
+            for section, builder in DASHBOARD_SECTIONS.items()
         }
-        self.send_json_response(formatted)
+        result = {}
+        for section, future in futures.items():
+            try:
+                result[section] = future.result()
+            except Exception as e:
+                result[section] = {"ok": False, "error": f"Unexpected error: {str(e)}"}
+        # As secções correm em paralelo: no Server-Timing conta o tempo de
+        # cada uma, não a soma das fases
+        self.timings.pop('snapshot', None)
+        self.timings.pop('format', None)
+        self.send_json_response({"ok": True, "result": result})
 
-    def handle_sessions_list(self):
-        """Lista de sessões ativas"""
-        data = self.run_openclaw_cli(['sessions', 'list', '--json'])
+    def build_section(self, section, builder):
+        started = time.perf_counter()
+        try:
+            return builder()
+        finally:
+            self.add_timing(section, started)
 
-        if not data.get('ok'):
-            self.send_json_response(data)
-            return
+    def format_snapshot(self, formatter, args, purpose):
+        data, freshness = self.read_snapshot(args, purpose)
+        started = time.perf_counter()
+        formatted = formatter(data, freshness)
+        self.add_timing('format', started)
+        return formatted
 
-        result = data.get('result', {})
-        sessions = result.get('sessions', [])
-
-        formatted = {
-            "ok": True,
-            "result": {
-                "sessions": [
-                    {
-                        "key": s.get('key', ''),
-                        "kind": s.get('kind', 'direct'),
-                        "agentId": s.get('key', '').split(':')[1] if ':' in s.get('key', '') else 'main',
-                        "channel": s.get('key', '').split(':')[2] if s.get('key', '').count(':') >= 2 else 'main',
-                        "sessionId": s.get('sessionId', ''),
-                        "updatedAt": s.get('updatedAt', 0),
-                        "ageMs": s.get('ageMs', 0),
-                        "model": s.get('model', 'unknown'),
-                        "inputTokens": s.get('inputTokens', 0),
-                        "outputTokens": s.get('outputTokens', 0),
-                        "totalTokens": s.get('totalTokens', 0),
-                        "contextTokens": s.get('contextTokens', 0),
-                        "systemSent": s.get('systemSent', False)
-                    }
-                    for s in sessions
-                ],
-                "count": result.get('count', len(sessions)),
-                "path": result.get('path', '')
-            }
-        }
-        self.send_json_response(formatted)
+    def build_gateway_status(self):
+        return self.format_snapshot(format_gateway_status, ['status', '--json'], 'gateway')
 
-    def handle_agents_list(self):
-        """Lista de agentes configurados"""
-        full_status = self.run_openclaw_cli(['status', '--json'])
+    def build_cron_list(self):
+        return self.format_snapshot(format_cron_list, ['cron', 'list', '--json'], 'cron')
 
-        if not full_status.get('ok'):
-            self.send_json_response(full_status)
-            return
+    def build_sessions_list(self):
+        data, freshness = self.read_snapshot(['sessions', 'list', '--json'], 'sessions')
+        started = time.perf_counter()
+        formatted = format_sessions_list(data, freshness)
+        self.add_timing('format', started)
+        if formatted.get('ok'):
+            SESSION_CHANGES.observe(data, formatted['result']['sessions'], formatted.get('asOf'))
+            USAGE_ROLLUP.observe(data, formatted['result']['sessions'])
+            if TOKEN_HISTORY is not None and 'asOf' in formatted:
+                TOKEN_HISTORY.on_poll(POLL_SOURCES['sessions'], data, formatted['asOf'] / 1000)
+        return formatted
 
-        agents_data = full_status.get('result', {}).get('agents', {})
-        agents_list = agents_data.get('agents', [])
-
-        # Ler SOUL.md e outros ficheiros de configuração para cada agente
-        enriched_agents = []
-        for agent in agents_list:
-            agent_id = agent.get('id', 'main')
-            workspace_dir = agent.get('workspaceDir', os.path.expanduser('~/.openclaw/workspace'))
-
-            agent_info = {
-                "id": agent_id,
-                "workspaceDir": workspace_dir,
-                "sessionsCount": agent.get('sessionsCount', 0),
-                "lastActiveAgeMs": agent.get('lastActiveAgeMs', 0),
-                "bootstrapPending": agent.get('bootstrapPending', False)
-            }
+    def build_agents_list(self):
+        return self.format_snapshot(format_agents_list, ['status', '--json'], 'agents')
 
-            # Tentar ler IDENTITY.md se existir
-            identity_path = os.path.join(workspace_dir, 'IDENTITY.md')
-            if os.path.exists(identity_path):
-                try:
-                    with open(identity_path, 'r') as f:
-                        content = f.read()
-                        # Extrair nome, emoji, tipo
-                        if 'Name:' in content:
-                            agent_info['name'] = content.split('Name:')[1].split('\n')[0].strip()
-                        if 'Emoji:' in content:
-                            agent_info['emoji'] = content.split('Emoji:')[1].split('\n')[0].strip()
-                        if 'Creature:' in content or 'Type:' in content:
-                            agent_info['type'] = content.split('Creature:')[1].split('\n')[0].strip() if 'Creature:' in content else content.split('Type:')[1].split('\n')[0].strip()
-                except:
-                    pass
+    def handle_events(self):
+        """Stream SSE de alterações (arranca o poller se ainda não corre)"""
+        # Conta o cliente antes de arrancar o poller: um hub que acabou de
+        # perder o último cliente já não o pára
+        EVENT_HUB.reserve()
+        start_poller(on_demand=True)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.send_header('X-Accel-Buffering', 'no')
+            self.end_headers()
+        except OSError:
+            EVENT_HUB.reserve(-1)
+            stop_idle_poller()
+            raise
+        self.close_connection = True
+        # A ligação passa para o EventHub; o worker fica livre
+        self.server.detach_request(self.request)
+        EVENT_HUB.subscribe(self.request)
 
-            enriched_agents.append(agent_info)
+    def handle_cache_stats(self):
+        """Contadores da cache de snapshots (e do poller, se ativo)"""
+        stats = CLI_CACHE.stats()
+        stats['identity'] = IDENTITY_INDEX.stats()
+        stats['etags'] = ETAG_CACHE.stats()
+        stats['backend'] = BACKEND.stats()
+        if GATEWAY is not None:
+            stats['gateway'] = GATEWAY.stats()
+        if TOKEN_HISTORY is not None:
+            stats['tokenHistory'] = TOKEN_HISTORY.stats()
+        stats['cronMutations'] = CRON_MUTATIONS.stats()
+        stats['cliScheduler'] = CLI_SCHEDULER.stats()
+        stats['usage'] = USAGE_ROLLUP.stats()
+        if len(FLEET) > 1:
+            stats['fleet'] = {target.name: target.stats() for target in FLEET}
+        poller = POLLER
+        if poller is not None:
+            stats['poller'] = poller.stats()
+            stats['eventClients'] = EVENT_HUB.client_count()
+        self.send_json_response({"ok": True, "result": stats})
 
-        formatted = {
-            "ok": True,
-            "result": {
-                "agents": enriched_agents,
-                "totalSessions": agents_data.get('totalSessions', 0),
-                "defaultId": agents_data.get('defaultId', 'main')
-            }
-        }
-        self.send_json_response(formatted)
+    def handle_fleet(self, section):
+        """Secção agregada de todos os hosts (este e os --target), com `host`
+        em cada item; hosts lentos ou em baixo não bloqueiam a resposta"""
+        started = time.perf_counter()
+        results, hosts = gather_fleet(section)
+        self.add_timing('fleet', started)
+        self.send_json_response({
+            "ok": any(status['ok'] for status in hosts.values()),
+            "partial": not all(status['ok'] for status in hosts.values()),
+            "result": merge_fleet(section, results),
+            "hosts": hosts
+        })
 
-    def handle_index(self):
-        """Página inicial com documentação da API"""
+    def handle_token_metrics(self, query):
+        """Série temporal de tokens (?from=&to= em epoch ms, &agentId=, &resolution=1m|1h|1d)"""
+        if TOKEN_HISTORY is None:
+            self.send_json_response({"ok": False, "error": "Token history disabled"}, 503)
+            return
+        now_ms = int(time.time() * 1000)
+        try:
+            end = int(query.get('to', [now_ms])[0])
+            start = int(query.get('from', [end - 86400 * 1000])[0])
+        except ValueError:
+            self.send_json_response({"ok": False, "error": "Invalid 'from'/'to' (expected epoch ms)"}, 400)
+            return
+        resolution = query.get('resolution', [None])[0]
+        if start >= end or (resolution is not None and resolution not in TOKEN_ROLLUPS):
+            self.send_json_response({"ok": False, "error": "Invalid range or resolution (1m, 1h, 1d)"}, 400)
+            return
+        agent = query.get('agentId', [None])[0]
+        result = TOKEN_HISTORY.query(start // 1000, end // 1000, agent, resolution)
+        result.update({"from": start, "to": end, "agentId": agent})
+        self.send_json_response({"ok": True, "result": result})
+
+    def handle_usage_summary(self, query):
+        """Totais e top-N de tokens por agentId, canal e modelo (?top=&sort=),
+        com percentis de utilização da janela de contexto"""
+        try:
+            top = int(query.get('top', [USAGE_TOP])[0])
+        except ValueError:
+            top = 0
+        sort = query.get('sort', ['totalTokens'])[0]
+        if not 1 <= top <= MAX_USAGE_TOP or sort not in USAGE_SORTS:
+            self.send_json_response({
+                "ok": False,
+                "error": f"Invalid usage query (top: 1-{MAX_USAGE_TOP}, sort: {', '.join(USAGE_SORTS)})"
+            }, 400)
+            return
+        # Lê o snapshot pelo caminho normal: um refresh atualiza os agregados
+        data = self.build_sessions_list()
+        if not data.get('ok'):
+            self.send_json_response(data)
+            return
+        result = USAGE_ROLLUP.summary(top, sort)
+        result['sort'] = sort
+        freshness = {key: data[key] for key in ('asOf', 'stale') if key in data}
+        self.send_json_with_etag({"ok": True, "result": result, **freshness})
+
+    def handle_metrics(self):
+        """Métricas no formato de texto do Prometheus"""
+        body = METRICS.render().encode()
         self.send_response(200)
-        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
+        self.wfile.write(body)
 
+    def handle_index(self):
+        """Página inicial com documentação da API"""
         html = """<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -309,12 +3512,25 @@ class OpenClawBridgeHandler(http.server.SimpleHTTPRequestHandler):
 
     <div class="endpoint">
         <span class="method">GET</span> <span class="url">/api/v1/cron/list</span>
-        <p>Lista de cron jobs configurados</p>
+        <p>Lista de cron jobs configurados. Aceita <code>?enabled=true</code>, <code>sort=[-]name|id</code>, <code>limit</code> e <code>cursor</code> (o valor de <code>nextCursor</code> da página anterior)</p>
+    </div>
+
+    <div class="endpoint">
+        <span class="method">POST</span> <span class="url">/api/v1/cron/add</span> · <span class="url">/api/v1/cron/remove</span> · <span class="url">/api/v1/cron/update</span>
+        <p>Cria (<code>{"job": {...}}</code>), remove (<code>{"jobId"}</code>) ou altera (<code>{"jobId", "patch"}</code>) um cron job.
+        As escritas passam por uma fila única; edições seguidas ao mesmo job juntam-se numa só</p>
+    </div>
+
+    <div class="endpoint">
+        <span class="method">POST</span> <span class="url">/api/v1/cron/bulk</span>
+        <p>Várias alterações num só lote: <code>{"ops": [{"op": "update", "jobId": "...", "patch": {"enabled": false}}, ...]}</code></p>
     </div>
 
     <div class="endpoint">
         <span class="method">GET</span> <span class="url">/api/v1/sessions/list</span>
-        <p>Sessões ativas com metadados (tokens, modelo, etc.)</p>
+        <p>Sessões ativas com metadados (tokens, modelo, etc.). Com <code>?since=&lt;cursor&gt;</code> devolve só as sessões alteradas e as removidas.
+        Paginação: <code>?limit=50&amp;cursor=&lt;nextCursor&gt;</code>; filtros <code>agentId</code>, <code>channel</code>, <code>model</code>, <code>kind</code> (valores separados por vírgula), <code>maxAgeMs</code>/<code>minAgeMs</code>;
+        ordenação <code>sort=[-]updatedAt|totalTokens|inputTokens|outputTokens|contextTokens|key|ageMs</code></p>
     </div>
 
     <div class="endpoint">
@@ -322,6 +3538,43 @@ class OpenClawBridgeHandler(http.server.SimpleHTTPRequestHandler):
         <p>Agentes configurados com info de IDENTITY.md</p>
     </div>
 
+    <div class="endpoint">
+        <span class="method">GET</span> <span class="url">/api/v1/dashboard</span>
+        <p>Gateway, cron, sessões e agentes num só pedido (recolhidos em paralelo)</p>
+    </div>
+
+    <div class="endpoint">
+        <span class="method">GET</span> <span class="url">/api/v1/events</span>
+        <p>Server-Sent Events: <code>snapshot</code> inicial e depois só as alterações de gateway, cron e sessões</p>
+    </div>
+
+    <div class="endpoint">
+        <span class="method">GET</span> <span class="url">/api/v1/cache/stats</span>
+        <p>Contadores da cache de snapshots CLI (hits, misses, coalesced)</p>
+    </div>
+
+    <div class="endpoint">
+        <span class="method">GET</span> <span class="url">/api/v1/metrics/tokens</span>
+        <p>Consumo de tokens ao longo do tempo (<code>?from=&amp;to=</code> em epoch ms, <code>&amp;agentId=</code>, <code>&amp;resolution=1m|1h|1d</code>). Amostrado de cada snapshot de sessões; com <code>--poll</code> é contínuo</p>
+    </div>
+
+    <div class="endpoint">
+        <span class="method">GET</span> <span class="url">/api/v1/usage/summary</span>
+        <p>Totais de tokens e top-N por <code>agentId</code>, canal e modelo (<code>?top=10&amp;sort=totalTokens|inputTokens|outputTokens|sessions</code>),
+        com percentis p50/p90/p99 de <code>totalTokens/contextTokens</code>. Os agregados são atualizados a cada snapshot, não a cada pedido</p>
+    </div>
+
+    <div class="endpoint">
+        <span class="method">GET</span> <span class="url">/api/v1/fleet/gateway</span> · <span class="url">/cron</span> · <span class="url">/sessions</span> · <span class="url">/agents</span>
+        <p>A mesma secção de todos os hosts configurados com <code>--target nome=url</code> (outros bridges ou gateways), pedida em paralelo.
+        Cada item traz <code>host</code>; <code>hosts</code> diz o estado de cada um e <code>partial</code> fica a true se algum não respondeu a tempo</p>
+    </div>
+
+    <div class="endpoint">
+        <span class="method">GET</span> <span class="url">/metrics</span>
+        <p>Métricas Prometheus: latência por endpoint, subprocessos CLI, cache, bytes enviados. Todas as respostas trazem <code>Server-Timing</code></p>
+    </div>
+
     <h2>Integração NIA OS</h2>
     <p>Para usar com o Mission Control, atualiza a configuração da API:</p>
     <pre style="background: #1a1a1a; padding: 15px; border-radius: 8px; overflow-x: auto;">
@@ -337,19 +3590,154 @@ const OPENCLAW_CONFIG = {
     </p>
 </body>
 </html>"""
-        self.wfile.write(html.encode())
+        body = html.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ==================== MAIN ====================
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="OpenClaw API Bridge")
+    parser.add_argument('--cache-ttl', type=float, default=CACHE_TTL,
+                        help="segundos em que um snapshot CLI é reutilizado (0 desativa)")
+    parser.add_argument('--poll', action='store_true',
+                        help="atualiza status/cron/sessions em background e responde do último snapshot")
+    for source, interval in POLL_INTERVALS.items():
+        parser.add_argument(f'--poll-{source}', type=float, default=interval, metavar='SEC',
+                            help=f"intervalo de polling de '{' '.join(POLL_SOURCES[source])}' (default: {interval})")
+    parser.add_argument('--server', choices=SERVER_MODES, default='threads',
+                        help="modo do servidor HTTP (default: threads)")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help=f"pedidos servidos em simultâneo (default: {WORKERS})")
+    parser.add_argument('--queue', type=int, default=QUEUE_SIZE,
+                        help=f"pedidos em espera antes de responder 503 (default: {QUEUE_SIZE})")
+    parser.add_argument('--cli-concurrency', type=int, default=CLI_CONCURRENCY,
+                        help=f"subprocessos openclaw em simultâneo (default: {CLI_CONCURRENCY})")
+    parser.add_argument('--gateway', action='store_true',
+                        help="pede status/cron/sessions diretamente ao gateway por WebSocket (CLI como fallback)")
+    parser.add_argument('--gateway-url', default=GATEWAY_URL,
+                        help=f"URL WebSocket do gateway (default: {GATEWAY_URL})")
+    parser.add_argument('--backend', choices=BACKENDS, default='cli',
+                        help="origem dos dados: cli, replay (outputs gravados) ou synthetic (default: cli)")
+    parser.add_argument('--record', metavar='DIR',
+                        help="com --backend cli, grava os outputs --json em DIR para o replay")
+    parser.add_argument('--replay-dir', metavar='DIR', default='fixtures',
+                        help="pasta dos outputs gravados para --backend replay (default: fixtures)")
+    parser.add_argument('--latency', type=float, default=0, metavar='MS',
+                        help="latência injetada em cada chamada ao backend")
+    parser.add_argument('--jitter', type=float, default=0, metavar='MS',
+                        help="variação aleatória (±) da latência injetada")
+    parser.add_argument('--synthetic-sessions', type=int, default=50, metavar='N')
+    parser.add_argument('--synthetic-jobs', type=int, default=10, metavar='N')
+    parser.add_argument('--synthetic-agents', type=int, default=5, metavar='N')
+    parser.add_argument('--log-file', metavar='PATH',
+                        help="log JSON-lines de acessos/erros (default: stdout)")
+    parser.add_argument('--log-max-mb', type=float, default=LOG_MAX_BYTES / 1024 / 1024,
+                        help="roda o log ao atingir este tamanho (default: %(default)g)")
+    parser.add_argument('--log-backups', type=int, default=LOG_BACKUPS,
+                        help="ficheiros rodados mantidos (default: %(default)s)")
+    parser.add_argument('--log-rotate-hours', type=float, default=LOG_ROTATE_INTERVAL / 3600,
+                        help="roda o log a cada N horas, 0 desativa (default: %(default)g)")
+    parser.add_argument('--log-sample', action='append', metavar='ROUTE=RATE',
+                        help="fração de respostas 2xx/3xx registadas para a rota (ex.: /api/v1/status=0.1)")
+    parser.add_argument('--token-db', default=TOKEN_DB, metavar='PATH',
+                        help=f"base SQLite do histórico de tokens (default: {TOKEN_DB})")
+    parser.add_argument('--no-token-history', action='store_true',
+                        help="não guarda o histórico de tokens")
+    parser.add_argument('--cron-coalesce-ms', type=float, default=COALESCE_WINDOW * 1000, metavar='MS',
+                        help=f"janela para juntar escritas de cron num lote (default: {COALESCE_WINDOW * 1000:g})")
+    parser.add_argument('--ready-file', metavar='PATH',
+                        help="escreve o PID neste ficheiro quando o servidor já aceita ligações")
+    parser.add_argument('--port', type=int, default=PORT,
+                        help=f"porta HTTP (default: {PORT})")
+    parser.add_argument('--target', action='append', type=parse_target, default=[], metavar='NAME=URL',
+                        help="host agregado em /api/v1/fleet/*: bridge http(s):// ou gateway ws(s):// (repetível)")
+    parser.add_argument('--target-timeout', type=float, default=FLEET_TIMEOUT, metavar='SEC',
+                        help=f"espera máxima por cada host na agregação (default: {FLEET_TIMEOUT:g})")
+    parser.add_argument('--host-name', default=FLEET[0].name,
+                        help="nome deste host no campo `host` da agregação (default: %(default)s)")
+    return parser
+
+
+def configure(options):
+    """Aplica as opções ao processo (cache, backend, gateway, histórico,
+    fila de escritas, poller). Também usado pelo local/server.py com
+    --bridge inprocess, que serve a API sem arrancar o servidor HTTP daqui.
+    """
+    global BACKEND, GATEWAY, TOKEN_HISTORY, PORT
+    PORT = options.port
+    CLI_CACHE.ttl = options.cache_ttl
+    CLI_SCHEDULER.limit = max(options.cli_concurrency, 1)
+    LOG.path = options.log_file
+    LOG.max_bytes = int(options.log_max_mb * 1024 * 1024)
+    LOG.backups = options.log_backups
+    LOG.rotate_interval = options.log_rotate_hours * 3600
+    LOG.sample_rates.update(parse_sample_rates(options.log_sample))
+    delays = {"latency_ms": options.latency, "jitter_ms": options.jitter}
+    if options.backend == 'replay':
+        BACKEND = ReplayBackend(options.replay_dir, **delays)
+    elif options.backend == 'synthetic':
+        BACKEND = SyntheticBackend(options.synthetic_sessions, options.synthetic_jobs,
+                                   options.synthetic_agents, **delays)
+    else:
+        BACKEND = CliBackend(options.record, **delays)
+    if options.gateway:
+        GATEWAY = GatewayClient(options.gateway_url, GATEWAY_TOKEN)
+
+    if not options.no_token_history:
+        try:
+            TOKEN_HISTORY = TokenHistory(options.token_db)
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️  Histórico de tokens desativado: {e}")
+
+    FLEET[0].name = options.host_name
+    FLEET[0].timeout = options.target_timeout
+    for name, url in options.target:
+        FLEET.append(FleetTarget(name, url, options.target_timeout, options.cache_ttl))
+
+    CRON_MUTATIONS.window = max(options.cron_coalesce_ms, 0) / 1000
+    CRON_MUTATIONS.start()
+
+    # Também usados se o poller arrancar com o primeiro cliente de /api/v1/events
+    POLL_INTERVALS.update({source: getattr(options, f'poll_{source}') for source in POLL_SOURCES})
+    if options.poll:
+        start_poller()
+
+
+def write_ready_file(path):
+    """Sinal de arranque para o start.sh: escrito (atomicamente) depois do bind"""
+    with open(path + '.tmp', 'w') as f:
+        f.write(f"{os.getpid()}\n")
+    os.replace(path + '.tmp', path)
 
 
 if __name__ == '__main__':
+    options = build_arg_parser().parse_args()
+    configure(options)
+
     print(f"🦞 OpenClaw API Bridge")
     print(f"🔗 API URL: http://localhost:{PORT}")
     print(f"📖 Docs: http://localhost:{PORT}/")
     print(f"\n💡 Para usar com NIA OS Mission Control:")
     print(f"   Atualiza a porta de 18789 para {PORT} no ficheiro index.html")
     print(f"\n⚠️  Certifica-te que o servidor local (local/server.py) está a correr em :8080")
+    print(f"⚙️  Modo: {options.server} ({options.workers} workers, fila {options.queue}, {CLI_SCHEDULER.limit} CLIs)")
+    print(f"🧩 Backend: {BACKEND.name}" + (f" (latência {options.latency:g}±{options.jitter:g} ms)" if options.latency or options.jitter else ""))
+    if GATEWAY is not None:
+        print(f"🔌 Gateway nativo: {GATEWAY.url} (fallback: openclaw CLI)")
+    if len(FLEET) > 1:
+        hosts = ', '.join(f"{target.name} ({target.url or 'local'})" for target in FLEET)
+        print(f"🛰️  Hosts agregados: {hosts}")
     print(f"=" * 50)
 
-    with socketserver.TCPServer(("", PORT), OpenClawBridgeHandler) as httpd:
+    with make_server(options.server, PORT, OpenClawBridgeHandler, options.workers, options.queue,
+                     METRICS, 'bridge') as httpd:
+        if options.ready_file:
+            write_ready_file(options.ready_file)
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
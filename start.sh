@@ -1,7 +1,8 @@
 #!/bin/bash
 #
 # Start NIA OS Mission Control with OpenClaw Bridge
-# Este script inicia ambos os servidores necessários para sincronização completa
+# Este script inicia o Mission Control com o Bridge no mesmo processo
+# (./start.sh --split inicia os dois servidores separados, com proxy HTTP)
 #
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
@@ -45,38 +46,67 @@ trap cleanup INT TERM
 
 BRIDGE_PORT=18791
 SERVER_PORT=8888
+READY_TIMEOUT=10  # Segundos à espera do sinal de arranque de cada servidor
+
+# Por omissão, um só processo (local/server.py com o Bridge em memória);
+# --split mantém os dois processos com o proxy HTTP entre eles
+MODE=unified
+if [ "$1" = "--split" ]; then
+    MODE=split
+fi
+
+# Espera que o servidor escreva o ficheiro de arranque (já aceita ligações)
+wait_ready() {
+    local ready_file=$1 pid=$2
+    local deadline=$((SECONDS + READY_TIMEOUT))
+    while [ ! -s "$ready_file" ]; do
+        if ! kill -0 "$pid" 2>/dev/null || [ $SECONDS -ge $deadline ]; then
+            return 1
+        fi
+        sleep 0.05
+    done
+}
 
 echo "📋 Arquitetura:"
-echo "   1. OpenClaw Bridge (porta $BRIDGE_PORT) ← CLI → OpenClaw"
-echo "   2. Mission Control Server (porta $SERVER_PORT) ← Proxy → Bridge"
+if [ "$MODE" = "split" ]; then
+    echo "   1. OpenClaw Bridge (porta $BRIDGE_PORT) ← CLI → OpenClaw"
+    echo "   2. Mission Control Server (porta $SERVER_PORT) ← Proxy → Bridge"
+else
+    echo "   Mission Control Server (porta $SERVER_PORT) com o Bridge no mesmo processo ← CLI → OpenClaw"
+fi
 echo ""
 
-# Inicia o Bridge em background
-echo "🦞 A iniciar OpenClaw Bridge na porta $BRIDGE_PORT..."
-python3 openclaw-bridge.py > /tmp/openclaw-bridge.log 2>&1 &
-BRIDGE_PID=$!
+if [ "$MODE" = "split" ]; then
+    # Inicia o Bridge em background
+    echo "🦞 A iniciar OpenClaw Bridge na porta $BRIDGE_PORT..."
+    rm -f /tmp/openclaw-bridge.ready
+    python3 openclaw-bridge.py --log-file /tmp/openclaw-bridge.access.log --ready-file /tmp/openclaw-bridge.ready > /tmp/openclaw-bridge.log 2>&1 &
+    BRIDGE_PID=$!
 
-# Espera um pouco e verifica se iniciou
-sleep 2
-if ! kill -0 $BRIDGE_PID 2>/dev/null; then
-    echo "❌ Erro: Bridge não conseguiu iniciar"
-    echo "   Verifica: cat /tmp/openclaw-bridge.log"
-    exit 1
-fi
+    if ! wait_ready /tmp/openclaw-bridge.ready $BRIDGE_PID; then
+        echo "❌ Erro: Bridge não conseguiu iniciar"
+        echo "   Verifica: cat /tmp/openclaw-bridge.log"
+        kill $BRIDGE_PID 2>/dev/null
+        exit 1
+    fi
 
-echo "   ✅ Bridge iniciado (PID: $BRIDGE_PID)"
-echo ""
+    echo "   ✅ Bridge iniciado (PID: $BRIDGE_PID)"
+    echo ""
+    SERVER_ARGS=""
+else
+    SERVER_ARGS="--bridge inprocess"
+fi
 
 # Inicia o Mission Control Server em background
 echo "🌐 A iniciar Mission Control Server na porta $SERVER_PORT..."
-python3 local/server.py > /tmp/mission-control-server.log 2>&1 &
+rm -f /tmp/mission-control-server.ready
+python3 local/server.py $SERVER_ARGS --log-file /tmp/mission-control-server.access.log --ready-file /tmp/mission-control-server.ready > /tmp/mission-control-server.log 2>&1 &
 SERVER_PID=$!
 
-# Espera e verifica
-sleep 2
-if ! kill -0 $SERVER_PID 2>/dev/null; then
+if ! wait_ready /tmp/mission-control-server.ready $SERVER_PID; then
     echo "❌ Erro: Server não conseguiu iniciar"
     echo "   Verifica: cat /tmp/mission-control-server.log"
+    kill $SERVER_PID 2>/dev/null
     kill $BRIDGE_PID 2>/dev/null
     exit 1
 fi
@@ -88,8 +118,15 @@ echo "=========================================="
 echo "🎉 NIA OS está pronto!"
 echo ""
 echo "🔗 Acede em: http://localhost:$SERVER_PORT"
-echo "📖 Documentação API: http://localhost:$BRIDGE_PORT/"
-echo ""
+if [ "$MODE" = "split" ]; then
+    echo "📖 Documentação API: http://localhost:$BRIDGE_PORT/"
+    echo ""
+    echo "📜 Logs JSON: /tmp/openclaw-bridge.access.log, /tmp/mission-control-server.access.log"
+else
+    echo "📖 Documentação API: http://localhost:$SERVER_PORT/api/"
+    echo ""
+    echo "📜 Log JSON: /tmp/mission-control-server.access.log"
+fi
 echo "⚠️  Para parar, prime Ctrl+C"
 echo "=========================================="
 echo ""
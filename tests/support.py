@@ -0,0 +1,57 @@
+"""Apoio aos testes: carrega o openclaw-bridge.py (nome com hífen) e o
+local/server.py como módulos e arranca servidores HTTP de teste em portas livres."""
+
+import http.server
+import importlib.util
+import itertools
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # mission_core.py, importado pelo Bridge
+BRIDGE_SCRIPT = os.path.join(ROOT, 'openclaw-bridge.py')
+SERVER_SCRIPT = os.path.join(ROOT, 'local', 'server.py')
+_loads = itertools.count()
+
+
+def load_bridge(*argv):
+    """Instância nova do módulo (estado global próprio), configurada com `argv`"""
+    spec = importlib.util.spec_from_file_location(f'openclaw_bridge_test_{next(_loads)}', BRIDGE_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.configure(module.build_arg_parser().parse_args(list(argv)))
+    return module
+
+
+def load_server():
+    """Instância nova do local/server.py (sem arrancar o servidor)"""
+    spec = importlib.util.spec_from_file_location(f'local_server_test_{next(_loads)}', SERVER_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class StubServer:
+    """Servidor HTTP em 127.0.0.1:<porta livre> numa thread, com `handler_class`"""
+
+    def __init__(self, handler_class):
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.port = self.httpd.server_address[1]
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def free_port():
+    """Porta sem ninguém a ouvir (para simular um host em baixo)"""
+    server = http.server.HTTPServer(('127.0.0.1', 0), http.server.BaseHTTPRequestHandler)
+    port = server.server_address[1]
+    server.server_close()
+    return port
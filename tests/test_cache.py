@@ -0,0 +1,74 @@
+"""SnapshotCache: single-flight de pedidos concorrentes e expiração pelo TTL."""
+
+import threading
+import time
+import unittest
+
+from support import load_bridge
+
+
+class SnapshotCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bridge = load_bridge('--backend', 'synthetic', '--no-token-history')
+        self.calls = 0
+
+    def loader(self, delay=0.0, ok=True):
+        def load():
+            self.calls += 1
+            time.sleep(delay)
+            return {"ok": ok, "result": {"call": self.calls}}
+        return load
+
+    def test_concurrent_lookups_share_one_execution(self):
+        cache = self.bridge.SnapshotCache(ttl=10)
+        results = []
+        start = threading.Barrier(8)
+
+        def read():
+            start.wait()
+            results.append(cache.lookup(['status'], self.loader(delay=0.2)))
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual({id(data) for data, _ in results}, {id(results[0][0])})
+        self.assertEqual({as_of for _, as_of in results}, {results[0][1]})
+        stats = cache.stats()
+        self.assertEqual((stats['misses'], stats['coalesced'], stats['inflight']), (1, 7, 0))
+
+    def test_entry_is_reused_until_the_ttl_expires(self):
+        cache = self.bridge.SnapshotCache(ttl=0.2)
+        first, as_of = cache.lookup(['status'], self.loader())
+        again, again_as_of = cache.lookup(['status'], self.loader())
+        self.assertIs(again, first)
+        self.assertEqual(again_as_of, as_of)
+        self.assertEqual(cache.hits, 1)
+
+        time.sleep(0.25)
+        fresh, fresh_as_of = cache.lookup(['status'], self.loader())
+        self.assertEqual(fresh['result']['call'], 2)
+        self.assertGreater(fresh_as_of, as_of)
+
+    def test_as_of_is_when_the_load_started(self):
+        cache = self.bridge.SnapshotCache(ttl=10)
+        before = time.time()
+        _, as_of = cache.lookup(['status'], self.loader(delay=0.2))
+        self.assertLess(as_of - before, 0.1)
+
+    def test_errors_are_shared_but_not_cached(self):
+        cache = self.bridge.SnapshotCache(ttl=10)
+        data, as_of = cache.lookup(['status'], self.loader(ok=False))
+        self.assertFalse(data['ok'])
+        self.assertIsNone(as_of)
+        cache.lookup(['status'], self.loader(ok=False))
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(cache.stats()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""mission_core: admissão do PooledServer/AsyncioServer sob saturação."""
+
+import http.client
+import http.server
+import socket
+import threading
+import time
+import unittest
+
+import support  # noqa: F401 (põe o mission_core.py no sys.path)
+import mission_core
+
+
+class SlowHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        time.sleep(0.5)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SaturationTest(unittest.TestCase):
+
+    def check_mode(self, mode):
+        server = mission_core.make_server(mode, 0, SlowHandler, 1, 1)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        port = server.server_address[1]
+
+        # Ocupa o worker e a fila
+        busy = [socket.create_connection(('127.0.0.1', port)) for _ in range(2)]
+        for sock in busy:
+            sock.sendall(b'GET / HTTP/1.0\r\n\r\n')
+            self.addCleanup(sock.close)
+        time.sleep(0.1)
+        # Clientes que ligam e nada enviam não podem atrasar a recusa dos seguintes
+        idle = [socket.create_connection(('127.0.0.1', port)) for _ in range(10)]
+        for sock in idle:
+            self.addCleanup(sock.close)
+
+        started = time.monotonic()
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        conn.request('GET', '/')
+        response = conn.getresponse()
+        conn.close()
+        self.assertEqual(response.status, 503)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertGreaterEqual(server.rejected, 11)
+
+    def test_threads_rejects_without_blocking_accept(self):
+        self.check_mode('threads')
+
+    def test_asyncio_rejects_without_blocking_the_loop(self):
+        self.check_mode('asyncio')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""Fila de escritas de cron: coalescência por job e resultado próprio de cada alteração."""
+
+import threading
+import unittest
+
+from support import load_bridge
+
+
+class CronMutationQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bridge = load_bridge('--backend', 'synthetic', '--no-token-history')
+        self.calls = []
+        self.refreshes = 0
+        self.failing = {}  # jobId → resultado (dict) ou exceção a devolver
+        self.bridge.run_cron_mutation = self.run_mutation
+        self.bridge.refresh_cron_snapshot = self.refresh
+        self.queue = self.bridge.CronMutationQueue(window=0)
+
+    def run_mutation(self, op, params):
+        self.calls.append((op, params))
+        job_id = params.get('jobId') or params['job'].get('id')
+        outcome = self.failing.get(job_id)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome or {"ok": True, "result": {"op": op, "jobId": job_id}}
+
+    def refresh(self):
+        self.refreshes += 1
+
+    def apply_pending(self):
+        """Aplica o que está na fila como o worker faria (sem a thread)"""
+        batch, self.queue._pending = self.queue._pending, []
+        self.queue.apply(batch)
+
+    def test_updates_to_same_job_merge_patches(self):
+        mutations = [
+            self.queue.submit('update', {"jobId": 'a', "patch": {"enabled": False, "name": 'x'}}),
+            self.queue.submit('update', {"jobId": 'b', "patch": {"enabled": True}}),
+            self.queue.submit('update', {"jobId": 'a', "patch": {"name": 'y'}}),
+        ]
+        self.assertIs(mutations[0], mutations[2])
+        self.apply_pending()
+        self.assertEqual(self.calls, [
+            ('update', {"jobId": 'a', "patch": {"enabled": False, "name": 'y'}}),
+            ('update', {"jobId": 'b', "patch": {"enabled": True}}),
+        ])
+        self.assertEqual(mutations[0].wait(0), mutations[2].wait(0))
+        self.assertEqual(mutations[0].requests, 2)
+        self.assertEqual(self.refreshes, 1)
+        self.assertEqual(self.queue.stats()['coalesced'], 1)
+
+    def test_remove_replaces_pending_update(self):
+        update = self.queue.submit('update', {"jobId": 'a', "patch": {"enabled": False}})
+        remove = self.queue.submit('remove', {"jobId": 'a'})
+        self.assertIs(update, remove)
+        self.apply_pending()
+        self.assertEqual(self.calls, [('remove', {"jobId": 'a'})])
+
+    def test_nothing_merges_into_remove_or_add(self):
+        self.queue.submit('remove', {"jobId": 'a'})
+        self.queue.submit('update', {"jobId": 'a', "patch": {"enabled": True}})
+        self.queue.submit('add', {"job": {"id": 'b', "schedule": {}, "payload": {}}})
+        self.queue.submit('update', {"jobId": 'b', "patch": {"enabled": True}})
+        self.apply_pending()
+        self.assertEqual([op for op, _ in self.calls], ['remove', 'update', 'add', 'update'])
+
+    def test_errors_stay_with_their_mutation(self):
+        self.failing['bad'] = {"ok": False, "error": "job not found"}
+        self.failing['boom'] = RuntimeError("gateway exploded")
+        ok, bad, boom = self.queue.submit_many([
+            ('update', {"jobId": 'ok', "patch": {"enabled": True}}),
+            ('update', {"jobId": 'bad', "patch": {"enabled": True}}),
+            ('remove', {"jobId": 'boom'}),
+        ])
+        self.apply_pending()
+        self.assertTrue(ok.wait(0)['ok'])
+        self.assertEqual(bad.wait(0), {"ok": False, "error": "job not found"})
+        self.assertEqual(boom.wait(0), {"ok": False, "error": "Unexpected error: gateway exploded"})
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(self.refreshes, 1)
+        stats = self.queue.stats()
+        self.assertEqual((stats['applied'], stats['failed'], stats['batches']), (1, 2, 1))
+
+    def test_failed_batch_skips_refresh(self):
+        self.failing['a'] = {"ok": False, "error": "nope"}
+        mutation = self.queue.submit('remove', {"jobId": 'a'})
+        self.apply_pending()
+        self.assertFalse(mutation.wait(0)['ok'])
+        self.assertEqual(self.refreshes, 0)
+
+    def test_worker_answers_concurrent_submitters(self):
+        self.queue.window = 0.05
+        self.queue.start()
+        results = [None] * 8
+
+        def submit(index):
+            patch = {"name": f'n{index}'}
+            results[index] = self.queue.submit('update', {"jobId": 'a', "patch": patch}).wait(5)
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(results))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(result and result['ok'] for result in results))
+        # Edições dentro da mesma janela → menos chamadas do que pedidos
+        self.assertLess(len(self.calls), len(results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""Agregação /api/v1/fleet/* contra bridges de teste (um rápido, um lento, um em baixo)."""
+
+import http.server
+import json
+import time
+import unittest
+
+from support import StubServer, free_port, load_bridge
+
+TARGET_TIMEOUT = 0.3
+
+
+class StubBridge(http.server.BaseHTTPRequestHandler):
+    """Responde a /api/v1/sessions/list com as sessões do stub, após `delay` segundos"""
+
+    def do_GET(self):
+        stub = self.server.stub
+        time.sleep(stub.delay)
+        body = json.dumps({
+            "ok": True,
+            "result": {"sessions": stub.sessions, "count": len(stub.sessions)},
+            "asOf": stub.as_of,
+            "stale": False
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(sessions, delay=0.0):
+    stub = StubServer(StubBridge)
+    stub.sessions, stub.delay, stub.as_of = sessions, delay, int(time.time() * 1000)
+    return stub
+
+
+class FleetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fast = start_stub([{"key": 'agent:main:discord:1', "updatedAt": 2_000_000_000_000}])
+        self.slow = start_stub([{"key": 'agent:main:telegram:2', "updatedAt": 1}], delay=1.0)
+        self.bridge = load_bridge(
+            '--backend', 'synthetic', '--synthetic-sessions', '5', '--no-token-history',
+            '--host-name', 'here', '--target-timeout', str(TARGET_TIMEOUT),
+            '--target', f'fast={self.fast.url}',
+            '--target', f'slow={self.slow.url}',
+            '--target', f'down=http://127.0.0.1:{free_port()}',
+        )
+
+    def tearDown(self):
+        self.fast.close()
+        self.slow.close()
+
+    def test_merges_reachable_hosts_and_reports_the_others(self):
+        results, hosts = self.bridge.gather_fleet('sessions')
+        merged = self.bridge.merge_fleet('sessions', results)
+
+        self.assertEqual(sorted(results), ['fast', 'here'])
+        self.assertEqual(merged['count'], 6)
+        self.assertEqual(merged['sessions'][0]['host'], 'fast')  # Mais recente primeiro
+        self.assertEqual({item['host'] for item in merged['sessions']}, {'here', 'fast'})
+
+        self.assertTrue(hosts['here']['ok'])
+        self.assertTrue(hosts['fast']['ok'])
+        self.assertFalse(hosts['slow']['ok'])
+        self.assertIn('timed out', hosts['slow']['error'])
+        self.assertFalse(hosts['slow']['stale'])  # Ainda sem resultado anterior
+        self.assertFalse(hosts['down']['ok'])
+        self.assertIn('Cannot reach', hosts['down']['error'])
+        self.assertFalse(hosts['down']['stale'])
+
+    def test_slow_host_falls_back_to_its_last_result_as_stale(self):
+        self.slow.delay = 0.0
+        _, hosts = self.bridge.gather_fleet('sessions')
+        self.assertTrue(hosts['slow']['ok'])
+
+        self.slow.delay = 1.0
+        slow_target = next(target for target in self.bridge.FLEET if target.name == 'slow')
+        slow_target.cache.invalidate()
+        results, hosts = self.bridge.gather_fleet('sessions')
+
+        self.assertFalse(hosts['slow']['ok'])
+        self.assertTrue(hosts['slow']['stale'])
+        self.assertIn('timed out', hosts['slow']['error'])
+        self.assertEqual(hosts['slow']['asOf'], self.slow.as_of)
+        merged = self.bridge.merge_fleet('sessions', results)
+        self.assertIn('agent:main:telegram:2', [item['key'] for item in merged['sessions'] if item['host'] == 'slow'])
+
+    def test_local_target_does_not_need_a_request_handler(self):
+        result, _ = self.bridge.FLEET[0].timed_fetch('gateway')
+        self.assertTrue(result['ok'])
+        self.assertIn('asOf', result)
+
+
+if __name__ == '__main__':
+    unittest.main()
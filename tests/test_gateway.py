@@ -0,0 +1,145 @@
+"""GatewayClient contra um gateway WebSocket de teste no mesmo processo."""
+
+import base64
+import hashlib
+import json
+import socketserver
+import threading
+import time
+import unittest
+
+from support import load_bridge
+
+STUB_STATUS = {"sessions": {"defaults": {"model": 'stub-model'}}, "agents": {"agents": []}}
+
+
+def server_frame(payload):
+    """Frame de texto do servidor (sem máscara)"""
+    header = bytearray([0x81])
+    if len(payload) < 126:
+        header.append(len(payload))
+    else:
+        header.append(126)
+        header += len(payload).to_bytes(2, 'big')
+    return bytes(header) + payload
+
+
+class StubGatewayHandler(socketserver.StreamRequestHandler):
+    """Handshake WebSocket e respostas {"type":"res"} aos pedidos do cliente"""
+
+    def handle(self):
+        gateway = self.server.gateway
+        request_line = self.rfile.readline()
+        headers = {}
+        while True:
+            line = self.rfile.readline().decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        with gateway.lock:
+            gateway.handshakes += 1
+            reject = gateway.reject_handshake
+        if reject or not request_line.startswith(b'GET '):
+            self.wfile.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+            return
+        accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + gateway.ws_guid).encode()).digest())
+        self.wfile.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n'
+                         b'Connection: Upgrade\r\nSec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        while True:
+            try:
+                _, opcode, payload = gateway.read_frame(self.rfile)
+            except Exception:
+                return
+            if opcode == 0x8:
+                return
+            request = json.loads(payload)
+            with gateway.lock:
+                gateway.methods.append(request['method'])
+                drop = gateway.drop_next and request['method'] != 'connect'
+                gateway.drop_next = gateway.drop_next and not drop
+            if drop:
+                return  # Fecha o socket sem responder
+            result = STUB_STATUS if request['method'] == 'status' else {}
+            response = {"type": 'res', "id": request['id'], "ok": True, "payload": result}
+            self.wfile.write(server_frame(json.dumps(response).encode()))
+
+
+class StubGateway:
+
+    def __init__(self, bridge):
+        self.lock = threading.Lock()
+        self.handshakes = 0
+        self.methods = []
+        self.reject_handshake = False
+        self.drop_next = False
+        self.ws_guid = bridge.WS_GUID
+        self.read_frame = bridge.read_ws_frame  # Também desmascara frames de cliente
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), StubGatewayHandler)
+        self.server.daemon_threads = True
+        self.server.gateway = self
+        self.url = f'ws://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class GatewayClientTest(unittest.TestCase):
+
+    def setUp(self):
+        # Sem --gateway: o cliente global é criado abaixo, já com o URL do stub
+        self.bridge = load_bridge('--backend', 'synthetic', '--no-token-history')
+        self.gateway = StubGateway(self.bridge)
+        self.client = self.bridge.GatewayClient(self.gateway.url, timeout=2, retry_delay=0.3)
+
+    def tearDown(self):
+        self.gateway.close()
+
+    def test_handshake_and_status_request(self):
+        data = self.client.fetch(['status', '--json'])
+
+        self.assertEqual(self.gateway.methods, ['connect', 'status'])
+        self.assertEqual(data['sessions']['defaults']['model'], 'stub-model')
+        # A sonda ao gateway é a própria ligação
+        self.assertTrue(data['gateway']['reachable'])
+        self.assertEqual(data['gateway']['url'], self.gateway.url)
+        self.assertTrue(self.client.stats()['connected'])
+        self.assertIsNone(self.client.fetch(['agents', 'list']))  # Sem método no gateway
+
+    def test_dropped_socket_falls_back_to_cli_and_reconnects(self):
+        self.bridge.GATEWAY = self.client
+        handler = self.bridge.OpenClawBridgeHandler
+        first = handler.exec_openclaw_cli(['status', '--json'])
+        self.assertEqual(first['result'].gateway.model, 'stub-model')
+
+        self.gateway.drop_next = True
+        fallback = handler.exec_openclaw_cli(['status', '--json'])
+        self.assertTrue(fallback['ok'])
+        self.assertNotEqual(fallback['result'].gateway.model, 'stub-model')  # Veio do backend
+        self.assertEqual(self.client.failures, 1)
+        self.assertEqual(self.bridge.BACKEND.calls, 1)
+
+        # Uma ligação perdida não atrasa a seguinte
+        again = handler.exec_openclaw_cli(['status', '--json'])
+        self.assertEqual(again['result'].gateway.model, 'stub-model')
+        self.assertEqual(self.gateway.handshakes, 2)
+        self.assertEqual(self.client.connects, 2)
+
+    def test_failed_connect_throttles_reconnects(self):
+        self.gateway.reject_handshake = True
+        with self.assertRaisesRegex(self.bridge.GatewayError, 'handshake failed'):
+            self.client.call('status')
+        with self.assertRaisesRegex(self.bridge.GatewayError, 'unavailable'):
+            self.client.call('status')
+        self.assertEqual(self.gateway.handshakes, 1)  # A segunda nem tentou ligar
+
+        self.gateway.reject_handshake = False
+        time.sleep(0.35)
+        self.assertEqual(self.client.call('status'), STUB_STATUS)
+        self.assertEqual(self.gateway.handshakes, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
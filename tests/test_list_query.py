@@ -0,0 +1,108 @@
+"""Paginação por cursor: estável quando o snapshot seguinte traz itens novos."""
+
+import random
+import unittest
+
+from support import load_bridge
+
+PAGE = 7
+
+
+class ListQueryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bridge = load_bridge('--backend', 'synthetic', '--no-token-history')
+        self.random = random.Random(7)
+        self.as_of = 1000
+
+    def make_session(self, index):
+        tokens = self.random.choice([None, 0, 10, 500, 500, 9000])
+        return {
+            "key": f'agent:main:discord:{index:04d}',
+            "agentId": self.random.choice(['main', 'ops']),
+            "updatedAt": self.random.choice([None, 1000, 2000, 2000, 3000 + index]),
+            "totalTokens": tokens, "inputTokens": tokens, "outputTokens": tokens,
+            "contextTokens": self.random.choice([None, 200000]),
+        }
+
+    def make_job(self, index):
+        return {"id": f'job-{index:04d}', "name": self.random.choice(['backup', 'digest', 'sync', None]),
+                "enabled": self.random.choice([True, False])}
+
+    def payload(self, section, items):
+        self.as_of += 1  # Snapshot novo → índice novo
+        return {"ok": True, "result": {self.bridge.LIST_SPECS[section]['items']: items}, "asOf": self.as_of}
+
+    def page(self, section, payload, sort, cursor=None, **extra):
+        query = {'sort': [sort], 'limit': [str(PAGE)], **{k: [v] for k, v in extra.items()}}
+        if cursor:
+            query['cursor'] = [cursor]
+        result = self.bridge.select_list_page(section, payload, query)['result']
+        return result[self.bridge.LIST_SPECS[section]['items']], result['nextCursor']
+
+    def ordered(self, section, items, field, descending):
+        spec = self.bridge.LIST_SPECS[section]
+        default = spec['sorts'][field]
+
+        def sort_key(item):
+            value = item.get(field)
+            return (default if value is None else value, item[spec['key']])
+        return sorted(items, key=sort_key, reverse=descending)
+
+    def check_stable_across_inserts(self, section, make):
+        spec = self.bridge.LIST_SPECS[section]
+        key = spec['key']
+        before = [make(i) for i in range(0, 60, 2)]
+        inserted = [make(i) for i in range(1, 60, 2)]
+        for field in spec['sorts']:
+            for descending in (False, True):
+                with self.subTest(sort=field, descending=descending):
+                    sort = ('-' if descending else '') + field
+                    first, cursor = self.page(section, self.payload(section, before), sort)
+                    self.assertEqual([i[key] for i in first],
+                                     [i[key] for i in self.ordered(section, before, field, descending)[:PAGE]])
+
+                    # O snapshot seguinte tem os itens novos; o cursor continua onde ficou
+                    after = self.payload(section, before + inserted)
+                    expected = self.ordered(section, before + inserted, field, descending)
+                    last = first[-1]
+                    start = next(i for i, item in enumerate(expected) if item[key] == last[key]) + 1
+                    seen = []
+                    while cursor:
+                        items, cursor = self.page(section, after, sort, cursor)
+                        seen.extend(item[key] for item in items)
+                    self.assertEqual(seen, [item[key] for item in expected[start:]])
+                    self.assertFalse({i[key] for i in first} & set(seen))
+
+    def test_sessions_cursor_is_stable_for_every_sort(self):
+        self.check_stable_across_inserts('sessions', self.make_session)
+
+    def test_cron_cursor_is_stable_for_every_sort(self):
+        self.check_stable_across_inserts('cron', self.make_job)
+
+    def test_filters_apply_before_paging(self):
+        sessions = [self.make_session(i) for i in range(50)]
+        payload = self.payload('sessions', sessions)
+        seen, cursor = self.page('sessions', payload, 'key', agentId='ops')
+        while cursor:
+            items, cursor = self.page('sessions', payload, 'key', cursor, agentId='ops')
+            seen.extend(items)
+        self.assertEqual([s['key'] for s in seen], sorted(s['key'] for s in sessions if s['agentId'] == 'ops'))
+
+    def test_invalid_queries_are_rejected(self):
+        payload = self.payload('sessions', [self.make_session(i) for i in range(20)])
+        _, text_cursor = self.page('sessions', payload, 'key')
+        cases = {
+            'limit': ({'limit': ['abc']}, "Invalid limit"),
+            'sort': ({'sort': ['nope']}, "Invalid sort"),
+            'cursor type': ({'sort': ['totalTokens'], 'cursor': [text_cursor]}, "cursor does not match the sort"),
+            'age': ({'maxAgeMs': ['x']}, "Invalid 'maxAgeMs'"),
+        }
+        for name, (query, message) in cases.items():
+            with self.subTest(name):
+                with self.assertRaisesRegex(ValueError, message):
+                    self.bridge.select_list_page('sessions', payload, query)
+
+
+if __name__ == '__main__':
+    unittest.main()
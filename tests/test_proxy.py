@@ -0,0 +1,98 @@
+"""Proxy do local/server.py: circuit breaker do Bridge (falhas, timeouts, teste half-open)."""
+
+import http.client
+import http.server
+import time
+import unittest
+
+from support import StubServer, free_port, load_server
+
+BRIDGE_TIMEOUT = 0.3
+
+
+class StubBridge(http.server.BaseHTTPRequestHandler):
+    """Responde {"ok": true} após `delay` segundos"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(self.server.stub.delay)
+        body = b'{"ok":true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ProxyBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = load_server()
+        self.bridge = StubServer(StubBridge)
+        self.bridge.delay = 0.0
+        self.front = StubServer(self.server.CORSRequestHandler)
+        self.point_at(self.bridge.port)
+
+    def tearDown(self):
+        self.front.close()
+        self.bridge.close()
+
+    def point_at(self, port):
+        self.server.BRIDGE_PORT = port
+        self.server.BRIDGE_POOL = self.server.BridgeConnectionPool('127.0.0.1', port, timeout=BRIDGE_TIMEOUT)
+
+    def request(self, method='GET', headers=None):
+        conn = http.client.HTTPConnection('127.0.0.1', self.front.port, timeout=5)
+        conn.request(method, '/api/v1/status', headers=headers or {})
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        return response.status
+
+    def open_breaker(self):
+        health = self.server.BRIDGE_HEALTH
+        health.record_failure()
+        health.record_failure()
+        health._opened_at -= health.reset_timeout
+        self.assertEqual(health.state, health.OPEN)
+
+    def test_refused_connections_open_the_breaker(self):
+        self.point_at(free_port())
+        self.assertEqual(self.request(), 503)
+        self.assertEqual(self.request(), 503)
+        self.assertEqual(self.server.BRIDGE_HEALTH.state, self.server.BridgeHealth.OPEN)
+
+    def test_slow_bridge_does_not_open_the_breaker(self):
+        self.bridge.delay = BRIDGE_TIMEOUT * 2
+        for _ in range(3):
+            self.assertEqual(self.request(), 504)
+        self.assertEqual(self.server.BRIDGE_HEALTH.state, self.server.BridgeHealth.CLOSED)
+        self.bridge.delay = 0.0
+        self.assertEqual(self.request(), 200)
+
+    def test_bad_content_length_is_rejected_before_the_half_open_trial(self):
+        self.open_breaker()
+        self.assertEqual(self.request('POST', {'Content-Length': 'abc'}), 400)
+        self.assertEqual(self.server.BRIDGE_HEALTH.state, self.server.BridgeHealth.OPEN)
+        self.assertEqual(self.request(), 200)
+        self.assertEqual(self.server.BRIDGE_HEALTH.state, self.server.BridgeHealth.CLOSED)
+
+    def test_inconclusive_trial_does_not_leave_the_breaker_half_open(self):
+        self.open_breaker()
+        self.bridge.delay = BRIDGE_TIMEOUT * 2
+        self.assertEqual(self.request(), 504)
+        health = self.server.BRIDGE_HEALTH
+        self.assertEqual(health.state, health.OPEN)
+        self.bridge.delay = 0.0
+        health._opened_at -= health.reset_timeout
+        self.assertEqual(self.request(), 200)
+        self.assertEqual(health.state, health.CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""Listas com ETag (304 com If-None-Match) e modo incremental ?since= das sessões."""
+
+import http.client
+import json
+import unittest
+
+from support import StubServer, load_bridge
+
+
+def session(key, updated_at):
+    return {"key": key, "updatedAt": updated_at}
+
+
+def payload(sessions, as_of):
+    return {"ok": True, "result": {"sessions": sessions, "count": len(sessions)}, "asOf": as_of}
+
+
+class EtagTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bridge = load_bridge('--backend', 'synthetic', '--synthetic-sessions', '20', '--no-token-history')
+        self.server = StubServer(self.bridge.OpenClawBridgeHandler)
+
+    def tearDown(self):
+        self.server.close()
+
+    def get(self, path, headers=None):
+        conn = http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=5)
+        conn.request('GET', path, headers=headers or {})
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return response, body
+
+    def test_matching_if_none_match_gets_304(self):
+        for path in ('/api/v1/sessions/list', '/api/v1/cron/list', '/api/v1/agents/list'):
+            response, body = self.get(path)
+            self.assertEqual(response.status, 200)
+            etag = response.getheader('ETag')
+            self.assertTrue(etag.startswith('W/"'), etag)
+
+            response, body = self.get(path, {'If-None-Match': etag})
+            self.assertEqual(response.status, 304, path)
+            self.assertEqual(body, b'')
+            self.assertEqual(response.getheader('ETag'), etag)
+            # Comparação fraca: a mesma tag sem W/ também serve
+            response, _ = self.get(path, {'If-None-Match': f'"other", {etag[2:]}'})
+            self.assertEqual(response.status, 304, path)
+
+    def test_other_etag_gets_the_full_list(self):
+        response, body = self.get('/api/v1/sessions/list', {'If-None-Match': 'W/"stale"'})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(len(json.loads(body)['result']['sessions']), 20)
+
+    def test_pages_have_their_own_etag(self):
+        first, _ = self.get('/api/v1/sessions/list?limit=5')
+        second, _ = self.get('/api/v1/sessions/list?limit=10')
+        self.assertNotEqual(first.getheader('ETag'), second.getheader('ETag'))
+
+    def test_volatile_fields_do_not_change_the_etag(self):
+        result = {"sessions": [{"key": 'a', "updatedAt": 1, "ageMs": 10}]}
+        moved = {"sessions": [{"key": 'a', "updatedAt": 1, "ageMs": 99}]}
+        changed = {"sessions": [{"key": 'a', "updatedAt": 2, "ageMs": 10}]}
+        self.assertEqual(self.bridge.compute_etag(result), self.bridge.compute_etag(moved))
+        self.assertNotEqual(self.bridge.compute_etag(result), self.bridge.compute_etag(changed))
+
+
+class SinceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bridge = load_bridge('--backend', 'synthetic', '--no-token-history')
+        self.changes = self.bridge.SessionChangeLog(retention=10_000)
+
+    def snapshot(self, sessions, as_of):
+        data = payload(sessions, as_of)
+        self.changes.observe(object(), sessions, as_of)
+        return data
+
+    def since(self, data, since):
+        return self.bridge.select_sessions_since(data, since, self.changes)['result']
+
+    def test_added_updated_and_removed_sessions(self):
+        self.snapshot([session('a', 500), session('b', 600)], 1000)
+        data = self.snapshot([session('a', 500), session('c', 100), session('d', 1500)], 2000)
+
+        result = self.since(data, 1000)
+        self.assertFalse(result['reset'])
+        # c é nova (mesmo com updatedAt antigo), d foi atualizada, a não mudou
+        self.assertEqual(sorted(s['key'] for s in result['sessions']), ['c', 'd'])
+        self.assertEqual(result['removed'], [{"key": 'b', "removedAt": 2000}])
+        self.assertEqual(result['cursor'], 2000)
+
+        # Com o cursor devolvido não há mais nada
+        result = self.since(data, result['cursor'])
+        self.assertEqual((result['sessions'], result['removed'], result['reset']), ([], [], False))
+
+    def test_session_that_comes_back_is_no_longer_a_tombstone(self):
+        self.snapshot([session('a', 1), session('b', 1)], 1000)
+        self.snapshot([session('a', 1)], 2000)
+        data = self.snapshot([session('a', 1), session('b', 1)], 3000)
+        result = self.since(data, 1000)
+        self.assertEqual([s['key'] for s in result['sessions']], ['b'])
+        self.assertEqual(result['removed'], [])
+
+    def test_since_before_the_log_starts_resets(self):
+        data = self.snapshot([session('a', 1), session('b', 1)], 1000)
+        result = self.since(data, 999)
+        self.assertTrue(result['reset'])
+        self.assertEqual(len(result['sessions']), 2)
+
+    def test_expired_tombstones_force_a_reset(self):
+        self.snapshot([session('a', 1), session('b', 1)], 1000)
+        self.snapshot([session('a', 1)], 2000)
+        data = self.snapshot([session('a', 1)], 20_000)
+        # O tombstone de b (2000) saiu da retenção: o registo já não chega a 1500
+        self.assertTrue(self.since(data, 1500)['reset'])
+        self.assertFalse(self.since(data, 15_000)['reset'])
+
+
+if __name__ == '__main__':
+    unittest.main()
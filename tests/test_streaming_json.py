@@ -0,0 +1,89 @@
+"""StreamingObjectParser: o mesmo resultado que json.loads, seja qual for o corte dos chunks."""
+
+import json
+import random
+import unittest
+
+from support import load_bridge
+
+DOCUMENTS = [
+    {"sessions": [], "count": 0},
+    {
+        "path": "C:\\Users\\op\\.openclaw\\sessions.json",
+        "count": 3,
+        "sessions": [
+            {"key": "agent:main:discord:ação", "totalTokens": 123456789, "ratio": -1.5e-3, "flag": True},
+            {"key": "esc \"aspas\" \\ barra \n\t\u0000", "emoji": "😀", "nested": {"a": [1, [2, {}]]}},
+            {"key": "null-ish", "updatedAt": None, "tags": []},
+        ],
+        "trailing": [10, 20, 30],
+        "big": 12345678901234567890,
+    },
+    {"count": 7, "sessions": [1, 22, 333], "sessions2": "não é uma lista projetada"},
+]
+# Escapes como o CLI os pode escrever (par surrogate em \\uXXXX, barras, controlo)
+RAW_DOCUMENT = rb'{"sessions": [{"key": "\ud83d\ude00 \u00e7 \"x\" \\ \/ \b\f\n\r\t"}, 5.0e+2], "n": -0}'
+
+
+class StreamingObjectParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bridge = load_bridge('--backend', 'synthetic', '--no-token-history')
+
+    def parse(self, data, cuts, projections=None):
+        parser = self.bridge.StreamingObjectParser(projections or {'sessions': lambda item: item})
+        start = 0
+        for cut in cuts + [len(data)]:
+            parser.feed(data[start:cut])
+            start = cut
+        return parser.close()
+
+    def test_every_split_point_matches_json_loads(self):
+        for document in DOCUMENTS:
+            for indent in (None, 2):
+                data = json.dumps(document, ensure_ascii=False, indent=indent).encode()
+                expected = json.loads(data)
+                for cut in range(len(data) + 1):
+                    with self.subTest(document=document.get('count'), indent=indent, cut=cut):
+                        self.assertEqual(self.parse(data, [cut]), expected)
+
+    def test_escapes_split_anywhere(self):
+        expected = json.loads(RAW_DOCUMENT)
+        self.assertEqual(expected['sessions'][0]['key'][0], '\U0001F600')
+        for cut in range(len(RAW_DOCUMENT) + 1):
+            with self.subTest(cut=cut):
+                self.assertEqual(self.parse(RAW_DOCUMENT, [cut]), expected)
+        self.assertEqual(self.parse(RAW_DOCUMENT, list(range(len(RAW_DOCUMENT)))), expected)
+
+    def test_random_chunking_matches_json_loads(self):
+        rng = random.Random(23)
+        for document in DOCUMENTS:
+            data = json.dumps(document, ensure_ascii=rng.random() < 0.5).encode()
+            expected = json.loads(data)
+            for _ in range(50):
+                cuts = sorted(rng.sample(range(len(data)), min(len(data), rng.randint(1, 40))))
+                self.assertEqual(self.parse(data, cuts), expected)
+            # Byte a byte: parte todos os caracteres UTF-8 e escapes \uXXXX
+            self.assertEqual(self.parse(data, list(range(len(data)))), expected)
+
+    def test_items_are_projected(self):
+        data = json.dumps(DOCUMENTS[1]).encode()
+        result = self.parse(data, list(range(0, len(data), 5)), {'sessions': lambda item: item['key']})
+        self.assertEqual(result['sessions'], [item['key'] for item in DOCUMENTS[1]['sessions']])
+        self.assertEqual(result['trailing'], [10, 20, 30])
+
+    def test_non_object_document_falls_back_to_json_loads(self):
+        for document in ([{"key": "a"}, 1], "texto", 42):
+            data = json.dumps(document).encode()
+            self.assertEqual(self.parse(data, [1]), document)
+
+    def test_invalid_or_truncated_input_raises(self):
+        data = json.dumps(DOCUMENTS[1]).encode()
+        for bad in (data[:-1], data[:len(data) // 2], b'{"sessions": [1, }', b'{"a" 1}', b''):
+            with self.subTest(bad=bad[-20:]):
+                with self.assertRaises(ValueError):
+                    self.parse(bad, [len(bad) // 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""UsageRollup: os totais mantidos por diferenças batem com um recálculo completo."""
+
+import random
+import unittest
+
+from support import load_bridge
+
+ROUNDS = 40
+
+
+class UsageRollupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bridge = load_bridge('--backend', 'synthetic', '--no-token-history')
+        self.random = random.Random(25)
+        self.next_id = 0
+
+    def new_session(self):
+        self.next_id += 1
+        session = {"key": f"agent:{self.random.choice(['main', 'ops', 'qa'])}:"
+                          f"{self.random.choice(['discord', 'telegram', 'main'])}:{self.next_id}"}
+        return self.touch(session)
+
+    def touch(self, session):
+        """Tokens, modelo e janela novos (às vezes em falta ou a null)"""
+        tokens = self.random.choice([None, 0, self.random.randint(1, 300000)])
+        session.update(
+            model=self.random.choice(['gpt-5', 'claude', None]),
+            inputTokens=tokens and tokens // 3, outputTokens=tokens and tokens // 5, totalTokens=tokens,
+            contextTokens=self.random.choice([None, 0, 128000, 200000]))
+        if self.random.random() < 0.2:
+            del session['contextTokens']
+        return session
+
+    def evolve(self, raw):
+        """Snapshot seguinte: sessões novas, removidas, alteradas e iguais"""
+        raw = [dict(session) for session in raw if self.random.random() > 0.15]
+        for session in raw:
+            if self.random.random() < 0.3:
+                self.touch(session)
+        raw += [self.new_session() for _ in range(self.random.randint(0, 12))]
+        self.random.shuffle(raw)
+        return raw
+
+    def observe(self, rollup, raw):
+        data = {"ok": True, "result": {"sessions": raw}}
+        sessions = self.bridge.normalize_sessions(data['result'])['sessions']
+        rollup.observe(data, sessions)
+        return data, sessions
+
+    def test_incremental_matches_full_recompute(self):
+        rollup = self.bridge.UsageRollup()
+        raw = [self.new_session() for _ in range(30)]
+        for round_ in range(ROUNDS):
+            data, sessions = self.observe(rollup, raw)
+            fresh = self.bridge.UsageRollup()
+            fresh.observe(data, sessions)
+            for sort in self.bridge.USAGE_SORTS:
+                with self.subTest(round=round_, sort=sort):
+                    self.assertEqual(rollup.summary(top=self.bridge.MAX_USAGE_TOP, sort=sort),
+                                     fresh.summary(top=self.bridge.MAX_USAGE_TOP, sort=sort))
+            self.assertEqual(rollup.stats()['groups'], fresh.stats()['groups'])
+            raw = self.evolve(raw)
+
+    def test_totals_match_plain_sums(self):
+        rollup = self.bridge.UsageRollup()
+        raw = [self.new_session() for _ in range(20)]
+        for _ in range(10):
+            raw = self.evolve(raw)
+            _, sessions = self.observe(rollup, raw)
+        summary = rollup.summary(top=self.bridge.MAX_USAGE_TOP)
+        totals = summary['totals']
+        self.assertEqual(totals['sessions'], len(sessions))
+        self.assertEqual(totals['totalTokens'], sum(s.totalTokens or 0 for s in sessions))
+        self.assertEqual(totals['inputTokens'], sum(s.inputTokens or 0 for s in sessions))
+        for group in summary['top']['agentId']:
+            members = [s for s in sessions if s.agentId == group['agentId']]
+            self.assertEqual((group['sessions'], group['totalTokens']),
+                             (len(members), sum(s.totalTokens or 0 for s in members)))
+        self.assertEqual({g['agentId'] for g in summary['top']['agentId']}, {s.agentId for s in sessions})
+
+    def test_removing_every_session_clears_groups(self):
+        rollup = self.bridge.UsageRollup()
+        self.observe(rollup, [self.new_session() for _ in range(15)])
+        self.observe(rollup, [])
+        summary = rollup.summary()
+        self.assertEqual(summary['totals']['sessions'], 0)
+        self.assertEqual(summary['totals']['totalTokens'], 0)
+        self.assertIsNone(summary['totals']['contextUtilization'])
+        self.assertEqual(summary['groupCounts'], {dimension: 0 for dimension in self.bridge.USAGE_DIMENSIONS})
+
+    def test_same_snapshot_is_observed_once(self):
+        rollup = self.bridge.UsageRollup()
+        data, sessions = self.observe(rollup, [self.new_session() for _ in range(5)])
+        rollup.observe(data, sessions)
+        self.assertEqual(rollup.stats()['updates'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()